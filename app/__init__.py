@@ -1,7 +1,10 @@
-from flask import Flask, send_from_directory
+from flask import Flask, Response, g, request, send_from_directory
 from flask_cors import CORS
 from app.config import config
+from app.utils import metrics, request_timing
+import atexit
 import os
+import time
 
 def create_app(config_name='default'):
     """Factory function để tạo Flask app"""
@@ -20,6 +23,10 @@ def create_app(config_name='default'):
         }
     })
     
+    metrics.REGISTRY.configure(app.config.get('METRICS_DIR'), app.config.get('METRICS_SYNC_INTERVAL', 5))
+    _register_metrics_hooks(app)
+    _register_timing_hooks(app)
+    
     # Register blueprints
     from app.routes.prediction import prediction_bp, init_predictor
     from app.routes.training import training_bp
@@ -36,6 +43,11 @@ def create_app(config_name='default'):
     def health():
         return {'status': 'healthy', 'service': 'Disease Prediction API'}, 200
     
+    @app.route('/metrics')
+    def prometheus_metrics():
+        """Metrics theo định dạng Prometheus"""
+        return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+    
     @app.route('/')
     def index():
         return {
@@ -43,8 +55,13 @@ def create_app(config_name='default'):
             'version': '1.0.0',
             'endpoints': {
                 'predict': '/api/predict',
+                'predict_batch': '/api/predict/batch',
                 'train': '/api/train',
+                'feedback': '/api/feedback',
                 'symptoms': '/api/symptoms',
+                'symptom_search': '/api/symptoms/search?q=',
+                'cache_stats': '/api/cache/stats',
+                'metrics': '/metrics',
                 'test': '/test'
             }
         }, 200
@@ -55,4 +72,86 @@ def create_app(config_name='default'):
         """Serve test.html page"""
         return send_from_directory('.', 'test.html')
     
-    return app
\ No newline at end of file
+    return app
+
+
+def _register_metrics_hooks(app):
+    """Đếm request và đo thời gian theo endpoint (blueprint.tên hàm) cho /metrics"""
+
+    @app.before_request
+    def _start_timer():
+        metrics.REGISTRY.ensure_sync()
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            endpoint = request.endpoint or 'unmatched'
+            metrics.HTTP_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - start)
+            metrics.HTTP_REQUESTS.labels(endpoint, request.method, response.status_code).inc()
+            if response.status_code >= 500:
+                metrics.HTTP_ERRORS.labels(endpoint, request.method).inc()
+        return response
+
+    @app.teardown_request
+    def _record_exception(exc):
+        # Exception không được route bắt: after_request không chạy
+        start = g.pop('metrics_start', None)
+        if exc is not None and start is not None:
+            endpoint = request.endpoint or 'unmatched'
+            metrics.HTTP_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - start)
+            metrics.HTTP_REQUESTS.labels(endpoint, request.method, 500).inc()
+            metrics.HTTP_ERRORS.labels(endpoint, request.method).inc()
+
+
+def _register_timing_hooks(app):
+    """Header Server-Timing theo từng bước (SERVER_TIMING) và profile mẫu (PROFILE_SAMPLE_RATE)"""
+    mode = app.config.get('SERVER_TIMING', 'off')
+    header = app.config.get('SERVER_TIMING_HEADER', 'X-Server-Timing')
+    profiler = request_timing.RequestProfiler(
+        app.config.get('PROFILE_SAMPLE_RATE', 0),
+        app.config.get('PROFILE_DIR', 'profiles'),
+        app.config.get('PROFILE_DUMP_INTERVAL', 60)
+    )
+    if mode not in ('header', 'always'):
+        mode = 'off'
+    if mode == 'off' and not profiler.enabled:
+        # Tắt hết: không đăng ký hook nào, request không tốn thêm gì
+        return
+    if profiler.enabled:
+        atexit.register(profiler.dump)
+
+    @app.before_request
+    def _start_timing():
+        if mode == 'always' or (mode == 'header' and request.headers.get(header)):
+            g.timing_token = request_timing.start()
+            g.timing_start = time.perf_counter()
+        if profiler.enabled:
+            profile = profiler.maybe_start()
+            if profile is not None:
+                g.profile = profile
+
+    @app.after_request
+    def _finish_timing(response):
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profiler.finish(profile, request.endpoint or 'unmatched')
+        token = g.pop('timing_token', None)
+        if token is not None:
+            timings = request_timing.stop(token)
+            timings.append(('total', time.perf_counter() - g.pop('timing_start')))
+            response.headers['Server-Timing'] = request_timing.server_timing_header(timings)
+            # Cho phép trang khác origin (CORS "*") đọc Server-Timing trong DevTools/Resource Timing
+            response.headers['Timing-Allow-Origin'] = '*'
+        return response
+
+    @app.teardown_request
+    def _cleanup_timing(exc):
+        # Exception không được route bắt: after_request không chạy
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profiler.finish(profile, request.endpoint or 'unmatched')
+        token = g.pop('timing_token', None)
+        if token is not None:
+            request_timing.stop(token)
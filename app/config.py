@@ -12,26 +12,130 @@ class Config:
     DEBUG = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
     
     # Model config
-    MODEL_DIR = BASE_DIR / 'models' / 'saved'
+    MODEL_DIR = Path(os.environ.get('MODEL_DIR') or BASE_DIR / 'models' / 'saved')
     MODEL_PATH = MODEL_DIR / 'disease_model.pkl'
     VECTORIZER_PATH = MODEL_DIR / 'vectorizer.pkl'
     LABEL_ENCODER_PATH = MODEL_DIR / 'label_encoder.pkl'
+    # 'pickle': load model sklearn; 'mmap': mở artifact dạng .npy bằng mmap, các worker dùng chung page
+    MODEL_ARTIFACT_FORMAT = os.environ.get('MODEL_ARTIFACT_FORMAT', 'pickle')
+    MODEL_BUNDLE_VERIFY = True  # Kiểm tra SHA-256 của model.bundle trước khi unpickle
+    MODEL_KEEP_VERSIONS = 5  # Số phiên bản model giữ lại trong MODEL_DIR/versions
+    MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', 5))  # Giây, 0 = không tự load model mới
     
     # Data config
     DATA_DIR = BASE_DIR / 'data'
     RAW_DATA_DIR = DATA_DIR / 'raw'
-    PROCESSED_DATA_DIR = DATA_DIR / 'processed'
-    DATASET_PATH = RAW_DATA_DIR / 'disease_symptoms.csv'
+    PROCESSED_DATA_DIR = Path(os.environ.get('PROCESSED_DATA_DIR') or DATA_DIR / 'processed')
+    DATASET_PATH = Path(os.environ.get('DATASET_PATH') or RAW_DATA_DIR / 'disease_symptoms.csv')
+    # Cache dataset đã parse (.npz trong PROCESSED_DATA_DIR), key = hash CSV + feedback + cách tiền xử lý
+    DATASET_CACHE = os.environ.get('DATASET_CACHE', 'True').lower() == 'true'
+    DATASET_CACHE_KEEP = 3  # Số phiên bản cache giữ lại
     
     # Training config
     TEST_SIZE = 0.2
     RANDOM_STATE = 42
     N_ESTIMATORS = 100
+    # Tăng cường dữ liệu khi train batch: mỗi biến thể lấy ngẫu nhiên ratio số triệu chứng
+    # (tối thiểu AUGMENT_MIN_SUBSET), copies bản cho các dòng có ít nhất min_symptoms triệu chứng.
+    # () = không tăng cường. Seed là RANDOM_STATE.
+    AUGMENT_VARIANTS = (
+        {'ratio': 0.8, 'copies': 3, 'min_symptoms': 4},
+        {'ratio': 0.6, 'copies': 2, 'min_symptoms': 5}
+    )
+    AUGMENT_MIN_SUBSET = 3
+    TRAINING_WORKERS = 1  # Số process train chạy nền đồng thời
+    TRAINING_JOB_HISTORY = 50  # Số job đã kết thúc được giữ lại để tra cứu
+    # 'batch': TF-IDF + LogisticRegression trên toàn bộ dataset trong bộ nhớ
+    # 'streaming': đọc CSV theo chunk, HashingVectorizer + SGDClassifier.partial_fit
+    # 'search': grid search SEARCH_GRID + k-fold cross-validation rồi train lại cấu hình tốt nhất
+    # 'incremental': chỉ cập nhật model đang active bằng các ca feedback mới
+    TRAINING_MODE = os.environ.get('TRAINING_MODE', 'batch')
+    STREAMING_CHUNK_SIZE = int(os.environ.get('STREAMING_CHUNK_SIZE', 10000))  # Số dòng CSV mỗi chunk
+    STREAMING_N_FEATURES = int(os.environ.get('STREAMING_N_FEATURES', 2 ** 16))  # Số chiều của HashingVectorizer
+    STREAMING_EPOCHS = 5  # Số lượt đọc lại dataset
+    STREAMING_ALPHA = 1e-5  # Hệ số regularization của SGDClassifier
+    # Tham số TfidfVectorizer (ngram_range, min_df, max_df, sublinear_tf, max_features), còn lại cho LogisticRegression
+    SEARCH_GRID = {
+        'ngram_range': [(1, 1), (1, 2)],
+        'min_df': [1, 2],
+        'C': [0.5, 1.0, 4.0],
+        'max_iter': [300]
+    }
+    SEARCH_CV_FOLDS = 3
+    SEARCH_WORKERS = int(os.environ.get('SEARCH_WORKERS', 0)) or os.cpu_count()  # Mặc định dùng tất cả core
+    # Feedback: log JSONL các ca đã xác nhận, train đầy đủ đọc cả log, mode incremental chỉ đọc ca mới
+    FEEDBACK_LOG_PATH = Path(os.environ.get('FEEDBACK_LOG_PATH') or DATA_DIR / 'feedback' / 'feedback.jsonl')
+    FEEDBACK_MAX_CASES = 500  # Số ca tối đa mỗi request /api/feedback
+    FEEDBACK_EPOCHS = 50  # Số bước gradient descent trên các ca mới
+    FEEDBACK_LEARNING_RATE = 2.0
+    FEEDBACK_L2 = 1e-2  # Giữ trọng số gần model cũ (regularization quanh trọng số trước khi cập nhật)
+    FEEDBACK_REFIT_AFTER = 20  # Sau số lần cập nhật incremental này thì train lại toàn bộ
+    # Compaction sau khi train batch/search: trọng số |w| nhỏ hơn ngưỡng về 0, feature không còn
+    # trọng số nào bị bỏ khỏi vocabulary; chỉ dùng bản thu gọn nếu chất lượng giảm không quá ngưỡng.
+    # Mặc định tắt (COMPACT_MODEL=true để bật): cần tập test có tín hiệu thì kiểm tra mới có ý nghĩa
+    COMPACT_MODEL = os.environ.get('COMPACT_MODEL', 'false').lower() == 'true'
+    COMPACT_WEIGHT_THRESHOLD = float(os.environ.get('COMPACT_WEIGHT_THRESHOLD', 0.05))
+    COMPACT_DTYPE = 'float32'
+    COMPACT_SPARSE_MAX_DENSITY = 0.05  # coef_ dạng CSR chỉ khi tỉ lệ trọng số khác 0 không quá mức này
+    COMPACT_MAX_ACCURACY_DROP = 0.005
+    COMPACT_MAX_F1_DROP = 0.005
+    
+    # Inference config
+    USE_LINEAR_ENGINE = True  # Gộp các estimator OvR thành một ma trận trọng số
+    LINEAR_ENGINE_TOLERANCE = 1e-6  # Sai số tối đa so với predict_proba của sklearn
+    USE_SYMPTOM_INDEX = True  # Lấy feature TF-IDF của triệu chứng đã biết từ bảng tính sẵn lúc train
+    PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 10000))  # 0 = tắt cache
+    PREDICTION_CACHE_TTL = int(os.environ.get('PREDICTION_CACHE_TTL', 3600))  # Giây, 0 = không hết hạn
+    # Gom các request /api/predict đến gần nhau (nhiều thread) thành một lần predict_proba
+    MICRO_BATCH = os.environ.get('MICRO_BATCH', 'false').lower() == 'true'
+    MICRO_BATCH_WINDOW_MS = float(os.environ.get('MICRO_BATCH_WINDOW_MS', 2))  # Thời gian chờ tối đa để gom thêm request
+    MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE', 32))
+    MICRO_BATCH_TIMEOUT_MS = float(os.environ.get('MICRO_BATCH_TIMEOUT_MS', 1000))  # Quá hạn thì request tự tính, không chờ batch
+    # Encoder cho response dự đoán: 'json' (thư viện chuẩn, giống hệt jsonify) hoặc 'orjson' (nếu đã cài)
+    JSON_ENCODER = os.environ.get('JSON_ENCODER', 'json')
     
     # API config
     ADMIN_KEY = os.environ.get('ADMIN_KEY') or 'admin-secret-key-2024'
     MAX_PREDICTIONS = 3  # Số lượng dự đoán trả về
-    MIN_CONFIDENCE = 0.3  # Độ tin cậy tối thiểu
+    MIN_CONFIDENCE = 0.3  # Độ tin cậy tối thiểu (trần, khi có ít bệnh)
+    # Xác suất one-vs-rest giảm theo số bệnh: ngưỡng thực tế là min(MIN_CONFIDENCE,
+    # MIN_CONFIDENCE_LIFT / số bệnh), tức bệnh phải cao hơn mức đều (1 / số bệnh) ít nhất chừng này lần
+    MIN_CONFIDENCE_LIFT = 4.0
+    MAX_BATCH_SIZE = 500  # Số bộ triệu chứng tối đa mỗi request /api/predict/batch
+    SYMPTOM_SEARCH_LIMIT = 10  # Số gợi ý mặc định của /api/symptoms/search
+    SYMPTOM_SEARCH_MAX_LIMIT = 50
+    SYMPTOM_SEARCH_MAX_EDITS = 2  # Số lỗi gõ tối đa được sửa (0 = chỉ tìm theo tiền tố)
+    
+    # Metrics config (/metrics)
+    # Thư mục để các worker gunicorn ghi snapshot metrics, /metrics cộng số liệu của tất cả worker.
+    # Không đặt = chỉ số liệu của process đang trả lời (một process, ví dụ python run.py)
+    METRICS_DIR = os.environ.get('METRICS_DIR') or None
+    METRICS_SYNC_INTERVAL = 5  # Giây giữa hai lần ghi snapshot
+
+    # Đo từng bước của một request (header Server-Timing)
+    # 'off': tắt; 'header': chỉ request gửi header SERVER_TIMING_HEADER; 'always': mọi request
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', 'header')
+    SERVER_TIMING_HEADER = 'X-Server-Timing'
+    # Profile cProfile một phần request (0 = tắt, 0.01 = 1%), gộp theo endpoint vào PROFILE_DIR
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+    PROFILE_DIR = Path(os.environ.get('PROFILE_DIR') or BASE_DIR / 'profiles')
+    PROFILE_DUMP_INTERVAL = 60  # Giây giữa hai lần ghi file .prof
+
+    # Log audit các lần dự đoán (JSONL, ghi ở thread nền, không chặn request)
+    PREDICTION_LOG = os.environ.get('PREDICTION_LOG', 'true').lower() == 'true'
+    PREDICTION_LOG_DIR = Path(os.environ.get('PREDICTION_LOG_DIR') or DATA_DIR / 'prediction_logs')
+    PREDICTION_LOG_QUEUE_SIZE = 10000  # Số record tối đa đang chờ ghi
+    # Hàng đợi đầy: 'drop' bỏ record ngay, 'block' chờ tối đa PREDICTION_LOG_BLOCK_TIMEOUT giây
+    PREDICTION_LOG_FULL_POLICY = os.environ.get('PREDICTION_LOG_FULL_POLICY', 'drop')
+    PREDICTION_LOG_BLOCK_TIMEOUT = 1.0
+    PREDICTION_LOG_BATCH_SIZE = 500  # Số record tối đa mỗi lần ghi
+    PREDICTION_LOG_FLUSH_INTERVAL = 1.0  # Giây tối đa một record nằm trong hàng đợi trước khi được ghi
+    PREDICTION_LOG_MAX_BYTES = 50 * 1024 * 1024  # Sang file mới khi file hiện tại vượt kích thước này
+    PREDICTION_LOG_BACKUP_COUNT = 20  # Số file log giữ lại
+
+    # HTTP cache config (/api/symptoms, /api/diseases)
+    ENABLE_GZIP = True
+    GZIP_MIN_SIZE = 1024  # Chỉ gzip payload lớn hơn số byte này
     
     # CORS config
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
@@ -1,3 +1,4 @@
+from .micro_batching import MicroBatcher
 from .ml_model import DiseasePredictor
 
-__all__ = ['DiseasePredictor']
\ No newline at end of file
+__all__ = ['DiseasePredictor', 'MicroBatcher']
\ No newline at end of file
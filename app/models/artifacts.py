@@ -0,0 +1,181 @@
+import json
+
+import numpy as np
+import scipy.sparse as sp
+
+from app.models.linear_engine import LinearInferenceEngine
+from app.models.text_features import CompiledTfidfVectorizer, TermIndex
+
+# Thư mục con trong mỗi phiên bản model chứa artifact dạng mảng phẳng (.npy)
+ARRAYS_DIR = 'arrays'
+ARRAYS_FORMAT_VERSION = 1
+ARRAYS_META_FILE = 'meta.json'
+COMPILED_VECTORIZER_TOLERANCE = 1e-9
+
+
+def _vectorizer_params(vectorizer):
+    """Tham số của vectorizer dạng JSON, None nếu có tham số không serialize được"""
+    params = {}
+    for key, value in vectorizer.get_params().items():
+        if key == 'dtype':
+            params[key] = np.dtype(value).name
+        elif isinstance(value, tuple):
+            params[key] = list(value)
+        elif value is None or isinstance(value, (str, int, float, bool, list)):
+            params[key] = value
+        else:
+            return None
+    return params
+
+
+def _load_vectorizer_params(params):
+    params = dict(params)
+    params['dtype'] = np.dtype(params['dtype']).type
+    params['ngram_range'] = tuple(params['ngram_range'])
+    return params
+
+
+def _check_compiled_vectorizer(vectorizer, params, terms, idf, n_samples=64):
+    """So CompiledTfidfVectorizer với vectorizer gốc trên các câu ghép ngẫu nhiên từ vocabulary"""
+    compiled = CompiledTfidfVectorizer.from_params(
+        _load_vectorizer_params(params),
+        TermIndex.from_terms(terms),
+        idf
+    )
+    if compiled is None or not terms:
+        return False
+
+    rng = np.random.default_rng(0)
+    samples = [
+        " ; ".join(rng.choice(terms, size=rng.integers(1, 8)).tolist())
+        for _ in range(n_samples)
+    ]
+    samples.append("")
+    diff = abs(compiled.transform(samples) - vectorizer.transform(samples))
+    return diff.max() <= COMPILED_VECTORIZER_TOLERANCE if diff.nnz else True
+
+
+def write_array_artifact(directory, engine, vectorizer, labels, model_classes):
+    """
+    Ghi model dạng mảng phẳng để các worker mở bằng mmap và dùng chung page.
+
+    Gồm ma trận trọng số (dense hoặc CSR), intercept, vocabulary (mảng term
+    đã sắp xếp + chỉ số feature, xem TermIndex) + idf của TF-IDF
+    (HashingVectorizer chỉ cần tham số) và nhãn bệnh. Trả về False
+    nếu model không biểu diễn được ở dạng này.
+    """
+    params = _vectorizer_params(vectorizer)
+    # HashingVectorizer (train streaming) không có vocabulary, chỉ cần lưu tham số
+    hashing = type(vectorizer).__name__ == 'HashingVectorizer'
+    if engine is None or params is None or not (hashing or hasattr(vectorizer, 'vocabulary_')):
+        return False
+
+    directory.mkdir(parents=True, exist_ok=True)
+
+    weights = engine.weights
+    if sp.issparse(weights):
+        weights = weights.tocsr()
+        np.save(directory / 'weights_data.npy', weights.data)
+        np.save(directory / 'weights_indices.npy', weights.indices)
+        np.save(directory / 'weights_indptr.npy', weights.indptr)
+    else:
+        np.save(directory / 'weights.npy', np.ascontiguousarray(weights))
+    np.save(directory / 'intercept.npy', engine.intercept)
+    np.save(directory / 'fixed_idx.npy', engine.fixed_idx)
+    np.save(directory / 'fixed_values.npy', engine.fixed_values)
+    np.save(directory / 'labels.npy', np.array(list(labels), dtype=str))
+    np.save(directory / 'model_classes.npy', np.asarray(model_classes))
+
+    compiled = False
+    if not hashing:
+        terms = [None] * len(vectorizer.vocabulary_)
+        for term, idx in vectorizer.vocabulary_.items():
+            terms[idx] = term
+
+        idf = getattr(vectorizer, 'idf_', None)
+        if idf is None:
+            idf = np.ones(len(terms))
+
+        term_index = TermIndex.from_terms(terms)
+        np.save(directory / 'vocabulary_terms.npy', term_index.sorted_terms)
+        np.save(directory / 'vocabulary_idx.npy', term_index.feature_idx)
+        np.save(directory / 'idf.npy', idf)
+        compiled = _check_compiled_vectorizer(vectorizer, params, terms, idf)
+
+    meta = {
+        'format_version': ARRAYS_FORMAT_VERSION,
+        'multilabel': engine.multilabel,
+        'weights': {
+            'format': 'csr' if sp.issparse(weights) else 'dense',
+            'shape': list(weights.shape)
+        },
+        'vectorizer': {
+            'type': type(vectorizer).__name__,
+            'params': params,
+            # True: lúc phục vụ dùng CompiledTfidfVectorizer, không cần import sklearn
+            'compiled': compiled
+        }
+    }
+    with open(directory / ARRAYS_META_FILE, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return True
+
+
+def read_array_artifact(directory, mmap_mode='r'):
+    """Đọc artifact dạng mảng, trả về (engine, vectorizer, labels, model_classes)"""
+    with open(directory / ARRAYS_META_FILE, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format_version') != ARRAYS_FORMAT_VERSION:
+        raise ValueError(f"Không hỗ trợ phiên bản artifact {meta.get('format_version')}")
+
+    def load(name):
+        return np.load(directory / name, mmap_mode=mmap_mode)
+
+    if meta.get('weights', {}).get('format') == 'csr':
+        weights = sp.csr_matrix(
+            (load('weights_data.npy'), load('weights_indices.npy'), load('weights_indptr.npy')),
+            shape=tuple(meta['weights']['shape'])
+        )
+    else:
+        weights = load('weights.npy')
+
+    fixed_idx = np.load(directory / 'fixed_idx.npy')
+    fixed_values = np.load(directory / 'fixed_values.npy')
+    engine = LinearInferenceEngine(
+        weights,
+        load('intercept.npy'),
+        dict(zip(fixed_idx.tolist(), fixed_values.tolist())),
+        multilabel=meta['multilabel']
+    )
+
+    params = _load_vectorizer_params(meta['vectorizer']['params'])
+    if meta['vectorizer']['type'] == 'HashingVectorizer':
+        from sklearn.feature_extraction.text import HashingVectorizer
+        vectorizer = HashingVectorizer(**params)
+    else:
+        vectorizer = _read_tfidf_vectorizer(load, meta, params)
+
+    labels = load('labels.npy').tolist()
+    model_classes = load('model_classes.npy')
+
+    return engine, vectorizer, labels, model_classes
+
+
+def _read_tfidf_vectorizer(load, meta, params):
+    idf = np.asarray(load('idf.npy'))
+    try:
+        # Vocabulary đọc bằng mmap, dùng chung giữa các worker như ma trận trọng số
+        vocabulary = TermIndex(load('vocabulary_terms.npy'), load('vocabulary_idx.npy'))
+    except FileNotFoundError:
+        # Artifact cũ: mảng term theo chỉ số feature, phải dựng dict riêng trong mỗi worker
+        vocabulary = {term: idx for idx, term in enumerate(load('vocabulary.npy').tolist())}
+
+    vectorizer = None
+    if meta['vectorizer'].get('compiled'):
+        vectorizer = CompiledTfidfVectorizer.from_params(params, vocabulary, idf)
+    if vectorizer is None:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        vectorizer = TfidfVectorizer(**params)
+        vectorizer.vocabulary_ = dict(vocabulary.items())
+        vectorizer.idf_ = idf
+    return vectorizer
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import pickle
+import struct
+import time
+from pathlib import Path
+
+BUNDLE_FILE = 'model.bundle'
+BUNDLE_MAGIC = b'DPBUNDLE'
+BUNDLE_SCHEMA_VERSION = 1
+# magic + độ dài manifest (uint32 little-endian)
+_HEADER = struct.Struct('<8sI')
+_MAX_MANIFEST_BYTES = 1 << 20
+
+
+def library_versions():
+    """Phiên bản các thư viện ảnh hưởng tới việc unpickle model"""
+    import numpy
+    import scipy
+    import sklearn
+    return {'numpy': numpy.__version__, 'scipy': scipy.__version__, 'sklearn': sklearn.__version__}
+
+
+def write_bundle(path, objects, manifest):
+    """
+    Ghi model thành một file: header (magic, độ dài manifest), manifest JSON,
+    rồi payload pickle của objects. Manifest được bổ sung schema_version, kích
+    thước và SHA-256 của payload. Ghi ra file tạm rồi os.replace nên người đọc
+    không thấy file ghi dở. Trả về manifest đã ghi.
+    """
+    path = Path(path)
+    payload = pickle.dumps(objects, protocol=pickle.HIGHEST_PROTOCOL)
+    manifest = dict(
+        manifest,
+        schema_version=BUNDLE_SCHEMA_VERSION,
+        created_at=time.strftime('%Y-%m-%dT%H:%M:%S'),
+        libraries=library_versions(),
+        payload_bytes=len(payload),
+        payload_sha256=hashlib.sha256(payload).hexdigest()
+    )
+    encoded = json.dumps(manifest, ensure_ascii=False).encode('utf-8')
+
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(BUNDLE_MAGIC, len(encoded)))
+        f.write(encoded)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return manifest
+
+
+def _read_manifest(f, file_size):
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ValueError("File bundle bị cắt cụt")
+    magic, manifest_bytes = _HEADER.unpack(header)
+    if magic != BUNDLE_MAGIC:
+        raise ValueError("Không phải file bundle model")
+    if manifest_bytes > _MAX_MANIFEST_BYTES:
+        raise ValueError("Manifest của bundle quá lớn")
+
+    manifest = json.loads(f.read(manifest_bytes).decode('utf-8'))
+    if manifest.get('schema_version') != BUNDLE_SCHEMA_VERSION:
+        raise ValueError(f"Không hỗ trợ phiên bản bundle {manifest.get('schema_version')}")
+    # Kiểm tra kích thước trước khi đọc payload: phát hiện file copy dở mà không cần hash
+    if file_size != _HEADER.size + manifest_bytes + manifest.get('payload_bytes', -1):
+        raise ValueError("Kích thước file bundle không khớp manifest")
+    return manifest
+
+
+def read_manifest(path):
+    """Đọc và kiểm tra manifest (magic, schema_version, kích thước file), không đọc payload"""
+    with open(path, 'rb') as f:
+        return _read_manifest(f, os.fstat(f.fileno()).st_size)
+
+
+def read_bundle(path, verify_hash=True):
+    """
+    Đọc bundle: kiểm tra manifest trước, rồi đọc payload một lần, so SHA-256
+    (verify_hash) và unpickle. Trả về (manifest, objects).
+    """
+    with open(path, 'rb') as f:
+        manifest = _read_manifest(f, os.fstat(f.fileno()).st_size)
+        payload = f.read(manifest['payload_bytes'])
+
+    if verify_hash and hashlib.sha256(payload).hexdigest() != manifest['payload_sha256']:
+        raise ValueError("SHA-256 của bundle không khớp manifest")
+
+    saved = manifest.get('libraries', {})
+    current = library_versions()
+    changed = [f"{name} {saved[name]} -> {version}" for name, version in current.items()
+               if saved.get(name) not in (None, version)]
+    if changed:
+        print(f"WARNING: Bundle được tạo với phiên bản thư viện khác ({', '.join(changed)})")
+
+    return manifest, pickle.loads(payload)
@@ -0,0 +1,126 @@
+import copy
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.base import clone
+
+from app.models.artifacts import write_array_artifact, read_array_artifact
+
+
+def compact_ovr(model, vectorizer, weight_threshold, dtype=np.float32, sparse_max_density=0.05):
+    """
+    Bản thu gọn của OneVsRestClassifier tuyến tính + TfidfVectorizer đã train:
+    trọng số |w| < weight_threshold được đặt về 0, coef_ đổi sang kiểu dtype
+    (vectorizer cũng trả về ma trận kiểu dtype); feature không còn trọng số nào
+    ở mọi lớp bị bỏ khỏi vocabulary (cùng idf). coef_ chỉ lưu dạng CSR khi tỉ lệ
+    trọng số khác 0 không quá sparse_max_density: với một dòng, nhân sparse x
+    sparse chậm hơn nhiều so với sparse x dense. Model và vectorizer gốc không
+    bị sửa.
+
+    Trả về (model, vectorizer, thống kê), None nếu model không hỗ trợ hoặc
+    ngưỡng bỏ hết mọi feature.
+    """
+    estimators = getattr(model, 'estimators_', None)
+    vocabulary = getattr(vectorizer, 'vocabulary_', None)
+    if not estimators or vocabulary is None or getattr(vectorizer, 'idf_', None) is None:
+        return None
+    n_features = len(vocabulary)
+    linear = [est for est in estimators if hasattr(est, 'coef_')]
+    if not linear or any(est.coef_.shape != (1, n_features) for est in linear):
+        return None
+
+    # (số lớp tuyến tính, n_features), bỏ trọng số nhỏ rồi giữ các cột còn trọng số
+    coefs = sp.vstack([sp.csr_matrix(est.coef_, dtype=np.float64) for est in linear]).tocsr()
+    n_weights = coefs.shape[0] * n_features
+    coefs.data[np.abs(coefs.data) < weight_threshold] = 0
+    coefs.eliminate_zeros()
+    kept = np.unique(coefs.indices)
+    if kept.size == 0:
+        return None
+    coefs = coefs[:, kept].astype(dtype).tocsr()
+    density = coefs.nnz / (coefs.shape[0] * kept.size)
+    sparse = density <= sparse_max_density
+
+    compact_model = copy.deepcopy(model)
+    rows = iter(range(coefs.shape[0]))
+    for est in compact_model.estimators_:
+        if hasattr(est, 'coef_'):
+            row = coefs[next(rows)]
+            est.coef_ = row if sparse else row.toarray()
+            est.n_features_in_ = kept.size
+    if hasattr(compact_model, 'n_features_in_'):
+        compact_model.n_features_in_ = kept.size
+
+    terms = [None] * n_features
+    for term, idx in vocabulary.items():
+        terms[idx] = term
+    # Vectorizer mới cùng tham số, chỉ gán vocabulary/idf (như khi đọc artifact mảng); ma trận
+    # TF-IDF cùng kiểu số với coef_ vì sklearn không nhân hai ma trận sparse khác kiểu
+    compact_vectorizer = clone(vectorizer).set_params(dtype=dtype)
+    compact_vectorizer.vocabulary_ = {terms[old]: new for new, old in enumerate(kept.tolist())}
+    compact_vectorizer.idf_ = np.asarray(vectorizer.idf_)[kept]
+
+    stats = {
+        "features_before": n_features,
+        "features_after": int(kept.size),
+        "weights_before": int(n_weights),
+        "weights_after": int(coefs.nnz),
+        "dtype": np.dtype(dtype).name,
+        "sparse": sparse
+    }
+    return compact_model, compact_vectorizer, stats
+
+
+def measure_model(model, vectorizer, engine, labels, texts, n_latency=200, repeat=3):
+    """
+    Kích thước và thời gian load của model khi lưu (pickle và artifact mảng),
+    độ trễ predict_proba một dòng đã vector hóa (p50, µs) trên tối đa
+    n_latency câu của texts.
+    """
+    import joblib
+
+    directory = Path(tempfile.mkdtemp(prefix='disease-compact-'))
+    try:
+        joblib.dump(model, directory / 'model.pkl')
+        joblib.dump(vectorizer, directory / 'vectorizer.pkl')
+        pickle_bytes = sum(p.stat().st_size for p in directory.glob('*.pkl'))
+        pickle_load = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            joblib.load(directory / 'model.pkl')
+            joblib.load(directory / 'vectorizer.pkl')
+            pickle_load.append(time.perf_counter() - start)
+
+        report = {
+            "pickle_bytes": pickle_bytes,
+            "pickle_load_ms": round(statistics.median(pickle_load) * 1000, 3)
+        }
+
+        arrays = directory / 'arrays'
+        if write_array_artifact(arrays, engine, vectorizer, labels, model.classes_):
+            arrays_load = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                read_array_artifact(arrays, mmap_mode=None)
+                arrays_load.append(time.perf_counter() - start)
+            report["arrays_bytes"] = sum(p.stat().st_size for p in arrays.iterdir())
+            report["arrays_load_ms"] = round(statistics.median(arrays_load) * 1000, 3)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    predict_proba = engine.predict_proba if engine is not None else model.predict_proba
+    X = vectorizer.transform(texts[:n_latency])
+    rows = [X[i] for i in range(X.shape[0])]
+    latency = []
+    for _ in range(repeat):
+        for row in rows:
+            start = time.perf_counter()
+            predict_proba(row)
+            latency.append(time.perf_counter() - start)
+    report["predict_p50_us"] = round(statistics.median(latency) * 1e6, 2) if latency else None
+    return report
@@ -0,0 +1,207 @@
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from app.models.linear_engine import top1_indicator
+
+# Tham số của grid thuộc TfidfVectorizer, còn lại truyền cho LogisticRegression
+VECTORIZER_PARAMS = ('ngram_range', 'min_df', 'max_df', 'sublinear_tf', 'max_features')
+
+# Ma trận đã load trong mỗi process worker: đường dẫn -> mảng/ma trận mmap
+_shared = {}
+
+
+def expand_grid(grid):
+    """{'C': [1, 4], 'min_df': [1, 2]} -> danh sách 4 tổ hợp tham số"""
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def split_params(params):
+    """Tách tham số thành (vectorizer_params, classifier_params)"""
+    vectorizer_params = {k: v for k, v in params.items() if k in VECTORIZER_PARAMS}
+    classifier_params = {k: v for k, v in params.items() if k not in VECTORIZER_PARAMS}
+    if 'ngram_range' in vectorizer_params:
+        vectorizer_params['ngram_range'] = tuple(vectorizer_params['ngram_range'])
+    return vectorizer_params, classifier_params
+
+
+def _load_shared(path):
+    # Mỗi worker chỉ mở file một lần, các mảng là mmap nên các worker dùng chung page
+    if path not in _shared:
+        import joblib
+        _shared[path] = joblib.load(path, mmap_mode='r')
+    return _shared[path]
+
+
+def _score_fold(matrix_path, labels_path, folds_path, fold, classifier_params):
+    """Chạy trong process worker: fit trên các fold khác, chấm F1 (weighted, bệnh xác suất cao nhất) trên fold này"""
+    import warnings
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import f1_score
+    from sklearn.multiclass import OneVsRestClassifier
+
+    X = _load_shared(matrix_path)
+    y = _load_shared(labels_path)
+    folds = _load_shared(folds_path)
+
+    val_mask = np.asarray(folds) == fold
+    train_idx = np.flatnonzero(~val_mask)
+    val_idx = np.flatnonzero(val_mask)
+
+    start = time.perf_counter()
+    model = OneVsRestClassifier(LogisticRegression(**classifier_params))
+    with warnings.catch_warnings():
+        # Nhãn chỉ có một giá trị trong fold -> _ConstantPredictor, không cần cảnh báo
+        warnings.simplefilter('ignore', UserWarning)
+        model.fit(X[train_idx], y[train_idx])
+    fit_time = time.perf_counter() - start
+
+    y_pred = top1_indicator(model.predict_proba(X[val_idx]))
+    score = f1_score(y[val_idx], y_pred, average='weighted', zero_division=0)
+    return {'score': float(score), 'fit_time': fit_time}
+
+
+class HyperparameterSearch:
+    """
+    Grid search + k-fold cross-validation cho TF-IDF + OvR LogisticRegression.
+    Fold được chia sao cho phần train của mỗi fold có đủ các bệnh (xem
+    _assign_folds).
+
+    Với mỗi cấu hình vectorizer và mỗi fold, vectorizer chỉ được fit trên phần
+    train của fold (vocabulary, min_df, idf không nhìn thấy fold kiểm tra) và
+    vector hóa một lần; ma trận, nhãn và chỉ số fold được ghi bằng joblib vào
+    thư mục tạm và các worker mở bằng mmap, nên chỉ có (tên file, fold, tham
+    số classifier) đi qua process pool.
+    Tất cả (ứng viên, fold) chạy song song trên n_workers process.
+    """
+
+    def __init__(self, grid, n_folds=3, n_workers=None, random_state=42):
+        self.candidates = expand_grid(grid)
+        self.n_folds = n_folds
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.random_state = random_state
+
+    def _assign_folds(self, groups, labels):
+        """
+        Fold của từng dòng sao cho phần train của mọi fold có đủ các bệnh. Bệnh có
+        từ 2 dòng gốc trở lên: chia theo dòng gốc (biến thể của một dòng gốc cùng
+        fold, không rò rỉ). Bệnh chỉ có một dòng gốc: chia các biến thể của dòng
+        đó vào các fold; nếu chỉ có đúng một dòng thì dòng đó luôn nằm trong phần
+        train (fold -1, không được chấm).
+        """
+        rng = np.random.default_rng(self.random_state)
+        folds = np.full(len(groups), -1, dtype=np.int32)
+        offset = 0
+        for label in np.unique(labels):
+            rows = np.flatnonzero(labels == label)
+            label_groups = np.unique(groups[rows])
+            if label_groups.size >= 2:
+                units = [rows[groups[rows] == g] for g in rng.permutation(label_groups)]
+            elif rows.size >= 2:
+                units = [[r] for r in rng.permutation(rows)]
+            else:
+                continue
+            # Xoay vòng fold bắt đầu theo từng bệnh để các fold có kích thước gần nhau
+            for i, unit in enumerate(units):
+                folds[unit] = (offset + i) % self.n_folds
+            offset += len(units)
+        return folds
+
+    def run(self, X_text, y, groups):
+        """Trả về (tham số tốt nhất, bảng kết quả từng ứng viên sắp theo điểm)"""
+        import joblib
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        if not self.candidates:
+            raise ValueError("Grid tìm kiếm rỗng")
+
+        work_dir = Path(tempfile.mkdtemp(prefix='disease-search-'))
+        try:
+            y = np.asarray(y)
+            folds = self._assign_folds(np.asarray(groups), y.argmax(axis=1))
+            n_folds = int(folds.max()) + 1
+            if n_folds < 1:
+                raise ValueError("Không đủ dữ liệu để chia fold cross-validation")
+            labels_path = str(work_dir / 'labels.joblib')
+            folds_path = str(work_dir / 'folds.joblib')
+            joblib.dump(y, labels_path)
+            joblib.dump(folds, folds_path)
+
+            # Mỗi cấu hình vectorizer khác nhau: một ma trận cho mỗi fold, vectorizer fit
+            # trên các dòng train của fold rồi transform toàn bộ các dòng
+            matrices = {}
+            featurize_times = {}
+            for params in self.candidates:
+                vectorizer_params, _ = split_params(params)
+                key = repr(sorted(vectorizer_params.items()))
+                if key in matrices:
+                    continue
+                start = time.perf_counter()
+                paths = []
+                for fold in range(n_folds):
+                    vectorizer = TfidfVectorizer(analyzer="word", **vectorizer_params)
+                    vectorizer.fit([text for text, f in zip(X_text, folds) if f != fold])
+                    path = str(work_dir / f'matrix-{len(matrices)}-{fold}.joblib')
+                    joblib.dump(vectorizer.transform(X_text), path)
+                    paths.append(path)
+                matrices[key] = paths
+                featurize_times[key] = time.perf_counter() - start
+
+            print(f"Grid search: {len(self.candidates)} ứng viên x {n_folds} fold "
+                  f"trên {self.n_workers} process")
+            start = time.perf_counter()
+            executor = ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            with executor:
+                futures = []
+                for i, params in enumerate(self.candidates):
+                    vectorizer_params, classifier_params = split_params(params)
+                    key = repr(sorted(vectorizer_params.items()))
+                    for fold in range(n_folds):
+                        future = executor.submit(
+                            _score_fold, matrices[key][fold], labels_path, folds_path,
+                            fold, classifier_params
+                        )
+                        futures.append((i, key, future))
+
+                results = {}
+                for i, key, future in futures:
+                    results.setdefault(i, {'key': key, 'folds': []})['folds'].append(future.result())
+            search_time = time.perf_counter() - start
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        table = []
+        for i, params in enumerate(self.candidates):
+            fold_results = results[i]['folds']
+            scores = np.array([r['score'] for r in fold_results])
+            fit_times = np.array([r['fit_time'] for r in fold_results])
+            table.append({
+                'params': {k: list(v) if isinstance(v, tuple) else v for k, v in params.items()},
+                'mean_score': round(float(scores.mean()), 4),
+                'std_score': round(float(scores.std()), 4),
+                'fold_scores': [round(float(s), 4) for s in scores],
+                'mean_fit_time': round(float(fit_times.mean()), 4),
+                'total_fit_time': round(float(fit_times.sum()), 4),
+                'featurize_time': round(featurize_times[results[i]['key']], 4)
+            })
+
+        if all(row['mean_score'] == 0 for row in table):
+            # Xếp hạng khi đó chỉ còn theo thời gian fit, không phải chất lượng
+            raise ValueError("Mọi ứng viên đều có F1 cross-validation bằng 0, không chọn được tham số")
+
+        order = sorted(range(len(table)), key=lambda i: (-table[i]['mean_score'], table[i]['mean_fit_time']))
+        table = [dict(table[i], rank=rank) for rank, i in enumerate(order, 1)]
+        print(f"Grid search xong sau {search_time:.2f}s, "
+              f"tốt nhất F1 {table[0]['mean_score']}: {table[0]['params']}")
+        return self.candidates[order[0]], table
@@ -0,0 +1,39 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+def _sigmoid(z):
+    with np.errstate(over='ignore'):
+        return 1.0 / (1.0 + np.exp(-z))
+
+
+def proximal_logistic_update(weights, intercept, X, Y, epochs=50, learning_rate=2.0, l2=1e-2):
+    """
+    Cập nhật các model logistic one-vs-rest bằng các ca mới mà không train lại.
+
+    Gradient descent trên log-loss trung bình của (X, Y) cộng l2/2 * ||W - W_cũ||²,
+    nên model chỉ dịch khỏi trọng số cũ vừa đủ để khớp các ca mới. Gradient chỉ
+    khác 0 ở các feature có trong X, các feature khác giữ nguyên trọng số.
+
+    weights: (n_features, n_lớp) dense hoặc sparse, intercept: (n_lớp,),
+    Y: ma trận nhãn 0/1 (n_ca, n_lớp). Trả về (chỉ số feature đã cập nhật,
+    trọng số mới của các feature đó (k, n_lớp), intercept mới).
+    """
+    X = sp.csr_matrix(X)
+    features = np.unique(X.indices)
+    X_sub = X[:, features]
+
+    W_old = weights[features]
+    W_old = W_old.toarray() if sp.issparse(W_old) else np.array(W_old, dtype=np.float64)
+    b_old = np.asarray(intercept, dtype=np.float64)
+    W = W_old.copy()
+    b = b_old.copy()
+    Y = np.asarray(Y, dtype=np.float64)
+    n = max(1, X.shape[0])
+
+    for _ in range(epochs):
+        residual = (_sigmoid(np.asarray(X_sub @ W) + b) - Y) / n
+        W -= learning_rate * (np.asarray(X_sub.T @ residual) + l2 * (W - W_old))
+        b -= learning_rate * (residual.sum(axis=0) + l2 * (b - b_old))
+
+    return features, W, b
@@ -0,0 +1,158 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+def top_k_indices(scores, k):
+    """Lấy chỉ số của k giá trị lớn nhất (giảm dần) bằng partial sort"""
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= n:
+        return np.argsort(scores)[::-1]
+
+    top = np.argpartition(scores, n - k)[n - k:]
+    return top[np.argsort(scores[top])[::-1]]
+
+
+def top1_indicator(probs):
+    """Ma trận 0/1 chỉ đánh dấu lớp có xác suất cao nhất mỗi dòng (bệnh trả về ở "du_doan")"""
+    probs = np.asarray(probs)
+    indicator = np.zeros(probs.shape, dtype=np.int64)
+    if probs.size:
+        indicator[np.arange(probs.shape[0]), probs.argmax(axis=1)] = 1
+    return indicator
+
+
+class LinearInferenceEngine:
+    """
+    Engine suy luận cho OneVsRestClassifier gồm các model tuyến tính.
+
+    Gộp coef_/intercept_ của tất cả estimator thành một ma trận trọng số
+    (n_features, n_classes) để tính xác suất bằng một phép nhân
+    sparse x dense (hoặc sparse x sparse nếu coef_ đã sparsify) và một lần
+    sigmoid, thay vì lặp từng estimator.
+    """
+
+    def __init__(self, weights, intercept, fixed_probs=None, multilabel=True):
+        self.weights = weights
+        self.intercept = intercept
+        # Các lớp chỉ có một nhãn khi train (_ConstantPredictor): xác suất cố định
+        self.fixed_probs = fixed_probs or {}
+        self.fixed_idx = np.array(sorted(self.fixed_probs), dtype=np.intp)
+        self.fixed_values = np.array(
+            [self.fixed_probs[i] for i in self.fixed_idx], dtype=np.float64
+        )
+        self.multilabel = multilabel
+
+    @property
+    def n_features(self):
+        return self.weights.shape[0]
+
+    @property
+    def n_classes(self):
+        return self.weights.shape[1]
+
+    @classmethod
+    def from_model(cls, model):
+        """Tạo engine từ OneVsRestClassifier hoặc SGDClassifier nhiều lớp, None nếu không hỗ trợ"""
+        if hasattr(model, 'estimators_'):
+            return cls.from_ovr(model)
+        return cls.from_linear(model)
+
+    @classmethod
+    def from_linear(cls, model):
+        """
+        Tạo engine từ SGDClassifier(loss='log_loss') nhiều lớp (one-vs-rest):
+        predict_proba = sigmoid rồi chuẩn hóa từng dòng (multilabel=False).
+        LogisticRegression nhiều lớp dùng softmax nên không hỗ trợ.
+        """
+        coef = getattr(model, 'coef_', None)
+        if getattr(model, 'loss', None) != 'log_loss' or coef is None:
+            return None
+        if coef.shape[0] < 3 or coef.shape[0] != len(model.classes_):
+            return None
+
+        # Ma trận trọng số (n_features, n_classes), giữ dạng sparse nếu coef_ đã sparsify()
+        weights = coef.T.tocsr() if sp.issparse(coef) else np.ascontiguousarray(coef.T, dtype=np.float64)
+        intercept = np.asarray(model.intercept_, dtype=np.float64).copy()
+        return cls(weights, intercept, multilabel=False)
+
+    @classmethod
+    def from_ovr(cls, model):
+        """Tạo engine từ OneVsRestClassifier, trả về None nếu không hỗ trợ"""
+        estimators = getattr(model, 'estimators_', None)
+        if not estimators or len(estimators) < 2:
+            return None
+
+        n_features = None
+        for est in estimators:
+            if hasattr(est, 'coef_'):
+                if est.coef_.shape[0] != 1:
+                    return None
+                n_features = est.coef_.shape[1]
+                break
+        if n_features is None:
+            return None
+
+        coefs = [None] * len(estimators)
+        intercept = np.zeros(len(estimators), dtype=np.float64)
+        fixed_probs = {}
+
+        for j, est in enumerate(estimators):
+            if hasattr(est, 'coef_'):
+                if est.coef_.shape != (1, n_features):
+                    return None
+                coefs[j] = est.coef_
+                intercept[j] = np.ravel(est.intercept_)[0]
+            elif hasattr(est, 'y_'):
+                fixed_probs[j] = float(np.ravel(est.y_)[0])
+            else:
+                return None
+
+        # Ma trận trọng số cùng kiểu số với coef_ (float32 sau compaction)
+        dtype = np.result_type(*[c.dtype for c in coefs if c is not None])
+        if any(sp.issparse(c) for c in coefs):
+            # Estimator đã sparsify() (train streaming, compaction): giữ ma trận trọng số dạng sparse
+            weights = sp.vstack([
+                sp.csr_matrix((1, n_features), dtype=dtype) if c is None else sp.csr_matrix(c)
+                for c in coefs
+            ]).T.tocsr()
+        else:
+            weights = np.zeros((n_features, len(estimators)), dtype=dtype)
+            for j, c in enumerate(coefs):
+                if c is not None:
+                    weights[:, j] = c[0]
+
+        return cls(weights, intercept, fixed_probs, multilabel=model.multilabel_)
+
+    def predict_proba(self, X):
+        """Xác suất cho từng lớp, cùng thứ tự với model.predict_proba"""
+        scores = X @ self.weights
+        if sp.issparse(scores):
+            scores = scores.toarray()
+        scores = np.asarray(scores, dtype=np.float64)
+        scores += self.intercept
+
+        # Sigmoid tại chỗ: 1 / (1 + exp(-z)), exp tràn số cho z rất âm vẫn cho 0
+        with np.errstate(over='ignore'):
+            np.negative(scores, out=scores)
+            np.exp(scores, out=scores)
+            scores += 1
+            probs = np.reciprocal(scores, out=scores)
+
+        if self.fixed_idx.size:
+            probs[:, self.fixed_idx] = self.fixed_values
+
+        if not self.multilabel:
+            row_sums = probs.sum(axis=1)[:, np.newaxis]
+            np.divide(probs, row_sums, out=probs, where=row_sums != 0)
+
+        return probs
+
+    def verify(self, model, X):
+        """So sánh kết quả với sklearn, trả về sai số tuyệt đối lớn nhất"""
+        expected = model.predict_proba(X)
+        actual = self.predict_proba(X)
+        if expected.shape != actual.shape:
+            return float('inf')
+        return float(np.max(np.abs(expected - actual))) if expected.size else 0.0
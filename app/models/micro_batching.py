@@ -0,0 +1,124 @@
+import os
+import queue
+import threading
+import time
+
+from app.utils import metrics, request_timing
+
+
+class _PendingPrediction:
+    __slots__ = ('predictor', 'symptoms', 'enqueued', 'started', 'finished', 'result', 'error', 'done')
+
+    def __init__(self, predictor, symptoms):
+        self.predictor = predictor
+        self.symptoms = symptoms
+        self.enqueued = time.perf_counter()
+        self.started = self.finished = self.enqueued
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Gom các lần dự đoán một bộ triệu chứng từ nhiều thread (gunicorn gthread)
+    thành một lần DiseasePredictor.score_normalized(): thread nền lấy request
+    đầu tiên trong hàng đợi, chờ thêm tối đa window giây (tính từ lúc request đó
+    vào hàng đợi) hoặc đến khi đủ max_batch_size request, tính cả batch bằng
+    một lần transform + predict_proba rồi trả kết quả cho từng thread đang chờ.
+
+    Bộ triệu chứng trùng nhau trong một batch chỉ được tính một lần; request
+    của các predictor khác nhau (đang chuyển sang model mới) được tính riêng.
+
+    Thread chờ kết quả tối đa timeout giây, quá hạn thì tự tính bộ triệu chứng
+    của mình, nên request không bị treo nếu thread nền bị kẹt.
+    """
+
+    def __init__(self, window=0.002, max_batch_size=32, timeout=1.0):
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        """Tạo hàng đợi và thread tính batch trong process hiện tại (mỗi worker sau khi fork một thread)"""
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+            # Thread nền đã dừng thì chạy lại trên cùng hàng đợi để không bỏ sót request đang chờ
+            self._thread = threading.Thread(target=self._run, args=(self._queue,), name='micro-batcher', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def predict(self, predictor, normalized):
+        """Kết quả dự đoán cho bộ triệu chứng đã chuẩn hóa, chờ đến khi batch chứa nó được tính xong"""
+        self._ensure_worker()
+        pending = _PendingPrediction(predictor, normalized)
+        self._queue.put(pending)
+        if not pending.done.wait(self.timeout):
+            print(f"WARNING: Micro-batch không trả kết quả sau {self.timeout}s, tự tính request")
+            return predictor.score_normalized([normalized])[0]
+
+        metrics.STAGE_QUEUE_WAIT.observe(pending.started - pending.enqueued)
+        request_timing.record('batch_predict', pending.finished - pending.started)
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _run(self, q):
+        while True:
+            batch = [q.get()]
+            try:
+                deadline = batch[0].enqueued + self.window
+                while len(batch) < self.max_batch_size:
+                    # Hết cửa sổ thì vẫn lấy nốt các request đã nằm sẵn trong hàng đợi
+                    remaining = deadline - time.perf_counter()
+                    try:
+                        batch.append(q.get(timeout=remaining) if remaining > 0 else q.get_nowait())
+                    except queue.Empty:
+                        break
+                metrics.MICRO_BATCH_SIZE.observe(len(batch))
+                self._score(batch)
+            except Exception as e:
+                # Lỗi ngoài phần tính từng nhóm không được làm chết thread: trả lỗi cho mọi request còn chờ
+                print(f"WARNING: Lỗi khi tính micro-batch: {e}")
+                finished = time.perf_counter()
+                for pending in batch:
+                    if not pending.done.is_set():
+                        pending.error = e
+                        pending.finished = finished
+                        pending.done.set()
+
+    def _score(self, batch):
+        started = time.perf_counter()
+        groups = {}
+        for pending in batch:
+            pending.started = started
+            groups.setdefault(id(pending.predictor), []).append(pending)
+
+        for items in groups.values():
+            unique = {}
+            for pending in items:
+                unique.setdefault(tuple(pending.symptoms), []).append(pending)
+            try:
+                scored = items[0].predictor.score_normalized([list(k) for k in unique])
+            except Exception as e:
+                for pending in items:
+                    pending.error = e
+            else:
+                for waiting, predictions in zip(unique.values(), scored):
+                    waiting[0].result = predictions
+                    for pending in waiting[1:]:
+                        pending.result = [dict(r) for r in predictions]
+
+            finished = time.perf_counter()
+            for pending in items:
+                pending.finished = finished
+                pending.done.set()
@@ -1,14 +1,24 @@
-import joblib
+import time
 import numpy as np
+import scipy.sparse as sp
 from pathlib import Path
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import MultiLabelBinarizer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics import classification_report, f1_score, accuracy_score
-from sklearn.multiclass import OneVsRestClassifier
-from sklearn.linear_model import LogisticRegression
 
+# Chỉ import những gì cần cho dự đoán. sklearn (train) và joblib (artifact pickle)
+# được import khi dùng tới, để process phục vụ với MODEL_ARTIFACT_FORMAT='mmap'
+# không phải import sklearn/pandas.
 from app.utils.data_processor import DataProcessor
+from app.utils.feedback_log import FeedbackLog
+from app.utils.prediction_cache import PredictionCache
+from app.utils import metrics
+from app.models.linear_engine import LinearInferenceEngine, top_k_indices, top1_indicator
+from app.models.model_store import ModelStore
+from app.models.symptom_index import SymptomFeatureIndex, SYMPTOM_INDEX_DIR
+from app.models.artifacts import ARRAYS_DIR, ARRAYS_META_FILE, write_array_artifact, read_array_artifact
+from app.models.bundle import BUNDLE_FILE, write_bundle, read_bundle
+
+# Cách mã hóa nhãn, lưu trong metadata: 'disease' = mỗi bệnh một lớp. Model cũ hơn
+# (không có khóa này) tách tên bệnh thành từng ký tự, mode incremental sẽ train lại toàn bộ.
+LABEL_ENCODING = 'disease'
 
 
 class DiseasePredictor:
@@ -16,73 +26,693 @@ class DiseasePredictor:
 
     def __init__(self, config):
         self.config = config
-        self.data_processor = DataProcessor(config.DATASET_PATH)
+        self.data_processor = DataProcessor(
+            config.DATASET_PATH,
+            augment_variants=getattr(config, 'AUGMENT_VARIANTS', None),
+            min_subset=getattr(config, 'AUGMENT_MIN_SUBSET', 3),
+            seed=config.RANDOM_STATE,
+            feedback_log=FeedbackLog(config.FEEDBACK_LOG_PATH) if getattr(config, 'FEEDBACK_LOG_PATH', None) else None,
+            cache_dir=config.PROCESSED_DATA_DIR if getattr(config, 'DATASET_CACHE', False) else None,
+            cache_keep=getattr(config, 'DATASET_CACHE_KEEP', 3)
+        )
         self.vectorizer = None
         self.label_binarizer = None
+        self.labels = None
         self.model = None
+        self.engine = None
+        self.symptom_index = None
+        self.model_version = None
+        self.model_path = None
+        self.metadata = {}
+        self.load_stats = {}
+        self._model_classes = None
+        self.store = ModelStore(config.MODEL_DIR)
+        self.cache = None
+        if config.PREDICTION_CACHE_SIZE > 0:
+            self.cache = PredictionCache(
+                config.PREDICTION_CACHE_SIZE,
+                config.PREDICTION_CACHE_TTL
+            )
+
+    @property
+    def is_loaded(self):
+        """Model đã sẵn sàng dự đoán (sklearn hoặc chỉ engine khi load dạng mmap)"""
+        return self.model is not None or self.engine is not None
+
+    @property
+    def model_classes(self):
+        if self.model is not None:
+            return self.model.classes_
+        return self._model_classes
+
+    def train(self, mode=None):
+        """Train model theo mode ('batch', 'streaming', 'search' hoặc 'incremental', mặc định TRAINING_MODE)"""
+        mode = mode or getattr(self.config, 'TRAINING_MODE', 'batch')
+        if mode == 'streaming':
+            return self.train_streaming()
+        if mode == 'search':
+            return self.train_search()
+        if mode == 'incremental':
+            return self.train_incremental()
+        if mode != 'batch':
+            raise ValueError(f"Không hỗ trợ training mode: {mode}")
 
-    def train(self):
         print("Đang load & xử lý dữ liệu...")
-        X_text, y_labels = self.data_processor.prepare_data_text_format()
+        data = self.data_processor.prepare_data_text_format(return_groups=True)
+        return self._train_batch(
+            data,
+            vectorizer_params={"ngram_range": (1, 2), "min_df": 2},
+            classifier_params={"max_iter": 300}
+        )
 
-        # TF-IDF cho danh sách triệu chứng
-        print("Đang vector hóa triệu chứng bằng TF-IDF...")
-        self.vectorizer = TfidfVectorizer(
-            analyzer="word",
-            ngram_range=(1, 2),
-            min_df=2
+    def train_search(self):
+        """
+        Chọn tham số TF-IDF + LogisticRegression bằng grid search (SEARCH_GRID)
+        và k-fold cross-validation chạy song song, rồi train lại cấu hình tốt
+        nhất trên toàn bộ tập train. Bảng kết quả từng ứng viên lưu trong metadata.
+        """
+        from app.models.hyperparameter_search import HyperparameterSearch, split_params
+
+        print("Đang load & xử lý dữ liệu...")
+        X_text, y_labels, groups = self.data_processor.prepare_data_text_format(return_groups=True)
+        y = self._label_matrix(self._label_binarizer(sorted(set(y_labels))), y_labels)
+
+        # Chỉ tìm trên phần train, tập test giữ nguyên như mode batch
+        train_idx, _ = self._split_indices(groups)
+        search = HyperparameterSearch(
+            self.config.SEARCH_GRID,
+            n_folds=self.config.SEARCH_CV_FOLDS,
+            n_workers=self.config.SEARCH_WORKERS,
+            random_state=self.config.RANDOM_STATE
+        )
+        best_params, table = search.run(
+            [X_text[i] for i in train_idx], y[train_idx], groups[train_idx]
         )
-        X = self.vectorizer.fit_transform(X_text)
 
-        # MultiLabel binarizer
-        print("Mã hóa nhãn bệnh...")
-        self.label_binarizer = MultiLabelBinarizer()
-        y = self.label_binarizer.fit_transform(y_labels)
+        vectorizer_params, classifier_params = split_params(best_params)
+        return self._train_batch(
+            (X_text, y_labels, groups),
+            vectorizer_params=vectorizer_params,
+            classifier_params=classifier_params,
+            n_jobs=search.n_workers,
+            search={"best_params": table[0]["params"], "cv_folds": search.n_folds, "candidates": table}
+        )
+
+    @staticmethod
+    def _label_binarizer(classes):
+        """
+        Bộ mã hóa nhãn dùng chung cho mọi mode train: mỗi bệnh một lớp, theo thứ
+        tự classes. Nhãn là tên bệnh dạng chuỗi nên luôn mã hóa qua _label_matrix,
+        fit MultiLabelBinarizer thẳng trên chuỗi sẽ tách tên bệnh thành từng ký tự.
+        """
+        from sklearn.preprocessing import MultiLabelBinarizer
+        return MultiLabelBinarizer(classes=list(classes)).fit([])
+
+    @staticmethod
+    def _label_matrix(label_binarizer, y_labels):
+        """Ma trận 0/1 (số dòng, số bệnh) của danh sách tên bệnh"""
+        return label_binarizer.transform([[label] for label in y_labels])
 
-        # Train/test split
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y,
+    def _split_indices(self, groups):
+        """
+        Train/test split theo dòng gốc: các biến thể tăng cường của cùng một
+        dòng nằm cùng phía, metrics không bị thổi phồng. Split chỉ dùng để
+        đánh giá, model được lưu train lại trên mọi dòng (xem _train_batch).
+        """
+        from sklearn.model_selection import GroupShuffleSplit
+
+        splitter = GroupShuffleSplit(
+            n_splits=1,
             test_size=self.config.TEST_SIZE,
             random_state=self.config.RANDOM_STATE
         )
+        return next(splitter.split(groups, groups=groups))
+
+    def _train_batch(self, data, vectorizer_params, classifier_params, n_jobs=None, search=None):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.metrics import classification_report, f1_score, accuracy_score
+        from sklearn.multiclass import OneVsRestClassifier
+        from sklearn.linear_model import LogisticRegression
+
+        X_text, y_labels, groups = data
+
+        # Mỗi bệnh một lớp
+        print("Mã hóa nhãn bệnh...")
+        self.label_binarizer = self._label_binarizer(sorted(set(y_labels)))
+        y = self._label_matrix(self.label_binarizer, y_labels)
+        self.labels = self.label_binarizer.classes_
+
+        # Model đánh giá: TF-IDF và model chỉ fit trên phần train của split theo dòng gốc
+        train_idx, test_idx = self._split_indices(groups)
+        print("Đang vector hóa triệu chứng bằng TF-IDF...")
+        self.vectorizer = TfidfVectorizer(
+            analyzer="word",
+            **vectorizer_params
+        )
+        X_train = self.vectorizer.fit_transform([X_text[i] for i in train_idx])
+        X_test = self.vectorizer.transform([X_text[i] for i in test_idx])
+        y_train, y_test = y[train_idx], y[test_idx]
 
         # Logistic Regression phù hợp multi-label + sparse
         print("Đang train model Logistic Regression...")
         self.model = OneVsRestClassifier(
-            LogisticRegression(max_iter=300)
+            LogisticRegression(**classifier_params),
+            n_jobs=n_jobs
         )
         self.model.fit(X_train, y_train)
+        self._build_engine()
 
         # Evaluate
         print("Đang đánh giá model...")
-        y_pred = self.model.predict(X_test)
+        # Mỗi ca có một bệnh: chấm bệnh có xác suất cao nhất, như "du_doan" của API
+        y_pred = top1_indicator(self.model.predict_proba(X_test))
 
         acc = accuracy_score(y_test, y_pred)
-        f1 = f1_score(y_test, y_pred, average='weighted')
+        f1 = f1_score(y_test, y_pred, average='weighted', zero_division=0)
+        # Bệnh chỉ có trong tập test: model đánh giá không thể đoán đúng các ca này
+        unseen = int((y_test.any(axis=0) & ~y_train.any(axis=0)).sum())
 
         print("\n===== EVALUATION =====")
         print("Accuracy:", round(acc, 4))
         print("F1-score:", round(f1, 4))
         print(classification_report(y_test, y_pred, zero_division=0))
+        if unseen:
+            print(f"WARNING: {unseen} bệnh trong tập test không có dòng nào trong tập train, "
+                  f"accuracy/F1 của các ca này luôn là 0")
+
+        metrics = {"accuracy": float(acc), "f1": float(f1), "unseen_test_classes": unseen}
+        compaction = None
+        if getattr(self.config, 'COMPACT_MODEL', False):
+            compaction = self._compact([X_text[i] for i in test_idx], y_test, metrics)
+            if compaction.get("promoted"):
+                metrics = dict(metrics, accuracy=compaction["accuracy"], f1=compaction["f1"])
+
+        # Model phục vụ: train lại trên mọi dòng để bệnh nào cũng có trong model
+        # (metrics ở trên vẫn là của model đánh giá, không thấy tập test)
+        print("Đang train lại model trên toàn bộ dữ liệu...")
+        self.vectorizer = TfidfVectorizer(analyzer="word", **vectorizer_params)
+        X = self.vectorizer.fit_transform(X_text)
+        self.model = OneVsRestClassifier(
+            LogisticRegression(**classifier_params),
+            n_jobs=n_jobs
+        )
+        self.model.fit(X, y)
+        if compaction is not None and compaction.get("promoted"):
+            # Thu gọn model phục vụ với cùng ngưỡng đã qua kiểm tra chất lượng
+            self.model, self.vectorizer, _ = self._compact_model(self.model, self.vectorizer)
+        self._build_symptom_index()
+        self._build_engine()
+        self._set_model_version(f"train-{time.time_ns()}")
+
+        self.metadata = {
+            "trained_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "mode": "search" if search else "batch",
+            "label_encoding": LABEL_ENCODING,
+            "metrics": metrics,
+            "feedback_offset": self.data_processor.feedback_offset
+        }
+        if compaction is not None:
+            self.metadata["compaction"] = compaction
+            metrics = dict(metrics, compaction=compaction)
+        if search:
+            self.metadata["search"] = search
+            metrics = dict(metrics, best_params=search["best_params"], candidates=search["candidates"])
+
+        return metrics
+
+    def _compact(self, X_text_test, y_test, baseline):
+        """
+        Thu gọn model vừa train (bỏ trọng số nhỏ, bỏ feature không còn trọng số
+        khỏi vocabulary, coef_ float32, dạng CSR nếu đủ thưa) và so với model
+        gốc trên tập test. Bản thu gọn chỉ được dùng (cho model train lại trên
+        toàn bộ dữ liệu) nếu tập test đánh giá được model gốc và accuracy/F1
+        giảm không quá COMPACT_MAX_ACCURACY_DROP / COMPACT_MAX_F1_DROP. Trả về
+        báo cáo.
+        """
+        from sklearn.metrics import accuracy_score, f1_score
+        from app.models.compaction import measure_model
+
+        threshold = self.config.COMPACT_WEIGHT_THRESHOLD
+        result = self._compact_model(self.model, self.vectorizer)
+        if result is None:
+            print("WARNING: Model không hỗ trợ compaction, giữ nguyên model gốc")
+            return {"promoted": False, "reason": "unsupported"}
+        model, vectorizer, stats = result
+
+        print("Đang đánh giá model đã thu gọn...")
+        y_pred = top1_indicator(model.predict_proba(vectorizer.transform(X_text_test)))
+        acc = float(accuracy_score(y_test, y_pred))
+        f1 = float(f1_score(y_test, y_pred, average='weighted', zero_division=0))
+        engine = LinearInferenceEngine.from_model(model) if self.engine is not None else None
+        before = measure_model(self.model, self.vectorizer, self.engine, self.labels, X_text_test)
+        after = measure_model(model, vectorizer, engine, self.labels, X_text_test)
+
+        accuracy_drop = baseline["accuracy"] - acc
+        f1_drop = baseline["f1"] - f1
+        # Model gốc có F1 bằng 0 hoặc tập test có bệnh không có trong tập train: mức giảm
+        # accuracy/F1 không nói lên gì về các trọng số bị bỏ, không thu gọn
+        no_signal = baseline["f1"] == 0 or baseline.get("unseen_test_classes", 0) > 0
+        promoted = (not no_signal
+                    and accuracy_drop <= self.config.COMPACT_MAX_ACCURACY_DROP
+                    and f1_drop <= self.config.COMPACT_MAX_F1_DROP)
+        report = dict(
+            stats,
+            weight_threshold=threshold,
+            accuracy=acc,
+            f1=f1,
+            baseline=dict(baseline),
+            before=before,
+            after=after,
+            promoted=promoted
+        )
+        if no_signal:
+            report["reason"] = "no_signal"
+
+        print("\n===== COMPACTION =====")
+        print(f"Feature: {stats['features_before']} -> {stats['features_after']}, "
+              f"trọng số khác 0: {stats['weights_before']} -> {stats['weights_after']} "
+              f"({stats['dtype']}, {'CSR' if stats['sparse'] else 'dense'})")
+        print(f"Accuracy: {baseline['accuracy']:.4f} -> {acc:.4f}, F1-score: {baseline['f1']:.4f} -> {f1:.4f}")
+        for key in ("pickle_bytes", "pickle_load_ms", "arrays_bytes", "arrays_load_ms", "predict_p50_us"):
+            if key in before and key in after:
+                print(f"{key}: {before[key]} -> {after[key]}")
+
+        if no_signal:
+            print("WARNING: Tập test không đánh giá được model gốc (F1 bằng 0 hoặc có bệnh không có "
+                  "trong tập train), không kiểm tra được model thu gọn, giữ model gốc")
+        elif not promoted:
+            print(f"WARNING: Model thu gọn giảm chất lượng quá ngưỡng (accuracy -{accuracy_drop:.4f}, "
+                  f"F1 -{f1_drop:.4f}), giữ model gốc")
+        return report
+
+    def _compact_model(self, model, vectorizer):
+        """compact_ovr với tham số COMPACT_*, None nếu model không hỗ trợ"""
+        from app.models.compaction import compact_ovr
+
+        return compact_ovr(
+            model, vectorizer, self.config.COMPACT_WEIGHT_THRESHOLD,
+            dtype=np.dtype(self.config.COMPACT_DTYPE),
+            sparse_max_density=self.config.COMPACT_SPARSE_MAX_DENSITY
+        )
+
+    def train_streaming(self):
+        """
+        Train out-of-core: đọc CSV theo chunk, HashingVectorizer (không cần fit)
+        + SGDClassifier (log_loss, one-vs-rest) học dần bằng partial_fit.
+
+        Bộ nhớ phụ thuộc STREAMING_CHUNK_SIZE, STREAMING_N_FEATURES và số bệnh,
+        không phụ thuộc kích thước file. Cứ 1/TEST_SIZE dòng lấy một dòng làm
+        tập test, metrics được cộng dồn theo từng chunk.
+        """
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.linear_model import SGDClassifier
+
+        chunk_size = self.config.STREAMING_CHUNK_SIZE
+
+        # partial_fit cần biết trước tất cả các lớp
+        print("Đang quét danh sách bệnh...")
+        labels = self.data_processor.scan_labels(chunk_size)
+        if len(labels) < 2:
+            raise ValueError("Dataset cần ít nhất 2 bệnh để train")
+        # Cùng cách mã hóa nhãn với batch/search (mỗi bệnh một lớp), SGDClassifier nhận chỉ số lớp
+        self.label_binarizer = self._label_binarizer(labels)
+        self.labels = self.label_binarizer.classes_
+        label_idx = {label: i for i, label in enumerate(self.labels)}
+        classes = np.arange(len(labels))
+
+        self.vectorizer = HashingVectorizer(
+            analyzer="word",
+            ngram_range=(1, 2),
+            n_features=self.config.STREAMING_N_FEATURES,
+            alternate_sign=False
+        )
+        # SGDClassifier tự train one-vs-rest cho nhiều lớp, predict_proba
+        # chuẩn hóa giống OneVsRestClassifier
+        self.model = SGDClassifier(
+            loss="log_loss",
+            alpha=self.config.STREAMING_ALPHA,
+            random_state=self.config.RANDOM_STATE
+        )
+        test_every = round(1 / self.config.TEST_SIZE) if self.config.TEST_SIZE > 0 else 0
+
+        rng = np.random.default_rng(self.config.RANDOM_STATE)
+        for epoch in range(self.config.STREAMING_EPOCHS):
+            n_rows = 0
+            for X_text, y, test_mask in self._iter_stream_chunks(chunk_size, label_idx, test_every):
+                train_rows = np.flatnonzero(~test_mask)
+                if train_rows.size == 0:
+                    continue
+                # Xáo trộn trong chunk, dataset thường được sắp theo bệnh
+                train_rows = rng.permutation(train_rows)
+                X = self.vectorizer.transform([X_text[i] for i in train_rows])
+                self.model.partial_fit(X, y[train_rows], classes=classes)
+                n_rows += train_rows.size
+            print(f"Epoch {epoch + 1}/{self.config.STREAMING_EPOCHS}: {n_rows} dòng train")
+
+        # Chỉ giữ các trọng số khác 0 (feature băm đã xuất hiện khi train)
+        self.model.sparsify()
+        self.symptom_index = None
+        self._build_engine()
+        self._set_model_version(f"train-{time.time_ns()}")
+
+        print("Đang đánh giá model...")
+        metrics = self._evaluate_stream(chunk_size, label_idx, test_every)
+        print("\n===== EVALUATION =====")
+        print("Accuracy:", round(metrics["accuracy"], 4))
+        print("F1-score:", round(metrics["f1"], 4))
+
+        self.metadata = {
+            "trained_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "mode": "streaming",
+            "label_encoding": LABEL_ENCODING,
+            "metrics": metrics,
+            "feedback_offset": self.data_processor.feedback_offset
+        }
+        return metrics
 
-        return {"accuracy": float(acc), "f1": float(f1)}
+    def train_incremental(self):
+        """
+        Cập nhật model đang active bằng các ca feedback ghi sau feedback_offset
+        của model, không train lại từ đầu: vectorizer giữ nguyên (từ mới chỉ
+        được học khi train lại toàn bộ), trọng số của các feature có trong ca
+        mới được cập nhật quanh trọng số cũ (proximal_logistic_update), bệnh
+        mới được thêm lớp. Sau FEEDBACK_REFIT_AFTER lần cập nhật liên tiếp,
+        hoặc khi chưa có model, train lại toàn bộ theo mode của lần train đầy đủ.
+        """
+        from sklearn.metrics import accuracy_score, f1_score
+        from app.models.incremental import proximal_logistic_update
+
+        try:
+            self.load_model(artifact_format='pickle')
+        except FileNotFoundError:
+            print("Chưa có model, train lại toàn bộ...")
+            return self.train(self._refit_mode())
+
+        base = self.metadata
+        if base.get("label_encoding") != LABEL_ENCODING:
+            # Model cũ mã hóa nhãn theo từng ký tự của tên bệnh, không cập nhật tiếp được
+            print("Model được train với cách mã hóa nhãn cũ, train lại toàn bộ...")
+            return self.train(self._refit_mode())
+        updates = base.get("incremental", {}).get("updates_since_refit", 0)
+        if updates >= self.config.FEEDBACK_REFIT_AFTER:
+            print(f"Đã cập nhật incremental {updates} lần, train lại toàn bộ...")
+            return self.train(self._refit_mode())
+
+        start_offset = base.get("feedback_offset", 0)
+        records, offset = self.data_processor.feedback_log.read(start_offset)
+        if not records:
+            raise ValueError(f"Không có feedback mới kể từ phiên bản {self.model_version}")
+        print(f"Đang cập nhật model {self.model_version} với {len(records)} ca feedback mới...")
+
+        X = self._vectorize([DataProcessor.normalize_symptoms(r["trieu_chung"]) for r in records])
+        n_old = len(self.labels)
+        y_before = self._predict_indicator(X)
+        Y, new_labels = self._feedback_targets([r["benh"] for r in records])
+        y_before = np.hstack([y_before, np.zeros((len(records), len(new_labels)), dtype=y_before.dtype)])
+
+        engine = LinearInferenceEngine.from_model(self.model)
+        if engine is None:
+            raise ValueError("Model không phải model tuyến tính, không cập nhật incremental được")
+        weights, intercept = engine.weights, engine.intercept
+        # Lớp mới bắt đầu với trọng số 0 và intercept trung vị của các lớp đã train
+        trained = np.setdiff1d(np.arange(n_old), engine.fixed_idx)
+        prior = float(np.median(intercept[trained])) if trained.size else 0.0
+        if new_labels:
+            pad = (weights.shape[0], len(new_labels))
+            weights = sp.hstack([weights, sp.csr_matrix(pad)]).tocsr() if sp.issparse(weights) else np.hstack([weights, np.zeros(pad)])
+            intercept = np.concatenate([intercept, np.full(len(new_labels), prior)])
+        intercept = intercept.copy()
+        # Lớp xác suất cố định (_ConstantPredictor) chỉ thành model tuyến tính khi có ca dương tính
+        fixed = set(engine.fixed_idx.tolist())
+        for j in fixed:
+            if Y[:, j].any():
+                intercept[j] = prior
+
+        features, W, b = proximal_logistic_update(
+            weights, intercept, X, Y,
+            epochs=self.config.FEEDBACK_EPOCHS,
+            learning_rate=self.config.FEEDBACK_LEARNING_RATE,
+            l2=self.config.FEEDBACK_L2
+        )
+        active = [j for j in range(len(self.labels)) if j not in fixed or Y[:, j].any()]
+        self._apply_linear_update(features, W, b, active, n_old)
+
+        self._build_engine()
+        self._set_model_version(f"train-{time.time_ns()}")
+
+        y_after = self._predict_indicator(X)
+        metrics = {
+            "accuracy": float(accuracy_score(Y, y_after)),
+            "f1": float(f1_score(Y, y_after, average='weighted', zero_division=0)),
+            "accuracy_before": float(accuracy_score(Y, y_before)),
+            "f1_before": float(f1_score(Y, y_before, average='weighted', zero_division=0)),
+            "n_cases": len(records),
+            "new_classes": [str(label) for label in new_labels]
+        }
+        print("\n===== FEEDBACK =====")
+        print(f"Accuracy trên {len(records)} ca mới: {metrics['accuracy_before']:.4f} -> {metrics['accuracy']:.4f}")
+        print(f"F1-score: {metrics['f1_before']:.4f} -> {metrics['f1']:.4f}")
+
+        # metrics của model vẫn là metrics trên tập test của lần train đầy đủ gần nhất
+        self.metadata = {
+            "trained_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "mode": "incremental",
+            "label_encoding": LABEL_ENCODING,
+            "metrics": base.get("metrics"),
+            "base_version": base.get("base_version", base.get("version")),
+            "base_mode": self._refit_mode(),
+            "feedback_offset": offset,
+            "incremental": dict(
+                metrics,
+                from_version=base.get("version"),
+                feedback_start=start_offset,
+                updates_since_refit=updates + 1
+            )
+        }
+        return metrics
+
+    def _refit_mode(self):
+        """Mode của lần train đầy đủ gần nhất (để train lại toàn bộ từ mode incremental)"""
+        mode = self.metadata.get("base_mode", self.metadata.get("mode"))
+        if mode not in ("batch", "streaming", "search"):
+            mode = getattr(self.config, 'TRAINING_MODE', 'batch')
+        return mode if mode in ("batch", "streaming", "search") else "batch"
+
+    def _predict_indicator(self, X):
+        """Bệnh có xác suất cao nhất của model dạng ma trận 0/1 (n, số lớp của model)"""
+        return top1_indicator(self.model.predict_proba(X))
+
+    def _feedback_targets(self, y_labels):
+        """
+        Ma trận nhãn 0/1 của các ca feedback (mỗi bệnh một lớp như lúc train),
+        thêm lớp (ở cuối) cho các bệnh chưa có. Trả về (Y, nhãn mới).
+        """
+        known = set(self.labels)
+        new_labels = sorted({label for label in y_labels if label not in known})
+
+        self.label_binarizer = self._label_binarizer(list(self.labels) + new_labels)
+        self.labels = self.label_binarizer.classes_
+        return self._label_matrix(self.label_binarizer, y_labels), new_labels
+
+    def _apply_linear_update(self, features, W, b, active, n_old):
+        """Ghi trọng số đã cập nhật (các feature features, các lớp active) vào model sklearn"""
+        n_features = self.model.n_features_in_
+        n_classes = W.shape[1]
+
+        if not hasattr(self.model, 'estimators_'):
+            # SGDClassifier: coef_ (n_lớp, n_features), dense hoặc đã sparsify()
+            coef = self.model.coef_
+            if n_classes > n_old:
+                pad = (n_classes - n_old, n_features)
+                coef = sp.vstack([coef, sp.csr_matrix(pad)]).tocsr() if sp.issparse(coef) else np.vstack([coef, np.zeros(pad)])
+            if sp.issparse(coef):
+                coef = coef.tolil()
+                coef[:, features] = W.T
+                coef = coef.tocsr()
+                coef.eliminate_zeros()
+            else:
+                coef[:, features] = W.T
+            self.model.coef_ = coef
+            self.model.intercept_ = b
+            self.model.classes_ = np.arange(n_classes)
+            return
+
+        estimators = list(self.model.estimators_)
+        for j in active:
+            est = estimators[j] if j < n_old else None
+            if est is None or not hasattr(est, 'coef_'):
+                est = self._linear_estimator(n_features)
+                if j < n_old:
+                    estimators[j] = est
+                else:
+                    estimators.append(est)
+
+            if sp.issparse(est.coef_):
+                coef = est.coef_.tolil()
+                coef[0, features] = W[:, j]
+                est.coef_ = coef.tocsr()
+            else:
+                est.coef_[0, features] = W[:, j]
+            est.intercept_ = np.array([b[j]])
+
+        self.model.estimators_ = estimators
+        self.model.classes_ = self.model.label_binarizer_.classes_ = np.arange(n_classes)
+
+    @staticmethod
+    def _linear_estimator(n_features):
+        """LogisticRegression nhị phân với trọng số 0, dùng cho lớp mới hoặc lớp hết cố định"""
+        from sklearn.linear_model import LogisticRegression
+
+        est = LogisticRegression()
+        est.classes_ = np.array([0, 1])
+        est.coef_ = np.zeros((1, n_features))
+        est.intercept_ = np.zeros(1)
+        est.n_features_in_ = n_features
+        est.n_iter_ = np.zeros(1, dtype=np.int32)
+        return est
+
+    def _iter_stream_chunks(self, chunk_size, label_idx, test_every):
+        """(X_text, chỉ số bệnh, mask dòng test) cho từng chunk của dataset"""
+        offset = 0
+        for X_text, y_labels in self.data_processor.iter_text_chunks(chunk_size):
+            y = np.fromiter((label_idx[label] for label in y_labels), dtype=np.intp, count=len(y_labels))
+            rows = np.arange(offset, offset + len(y))
+            offset += len(y)
+            test_mask = rows % test_every == 0 if test_every else np.zeros(len(y), dtype=bool)
+            yield X_text, y, test_mask
+
+    def _evaluate_stream(self, chunk_size, label_idx, test_every):
+        """Accuracy và F1 (weighted) trên các dòng test, cộng dồn tp/fp/fn theo chunk"""
+        n_classes = len(label_idx)
+        tp = np.zeros(n_classes)
+        fp = np.zeros(n_classes)
+        fn = np.zeros(n_classes)
+        for X_text, y, test_mask in self._iter_stream_chunks(chunk_size, label_idx, test_every):
+            test_rows = np.flatnonzero(test_mask)
+            if test_rows.size == 0:
+                continue
+            y_true = y[test_rows]
+            y_pred = self.model.predict(self.vectorizer.transform([X_text[i] for i in test_rows]))
+            hit = y_pred == y_true
+            tp += np.bincount(y_true[hit], minlength=n_classes)
+            fp += np.bincount(y_pred[~hit], minlength=n_classes)
+            fn += np.bincount(y_true[~hit], minlength=n_classes)
+
+        support = tp + fn
+        if support.sum() == 0:
+            return {"accuracy": 0.0, "f1": 0.0}
+        denom = 2 * tp + fp + fn
+        f1 = np.divide(2 * tp, denom, out=np.zeros(n_classes), where=denom > 0)
+        return {
+            "accuracy": float(tp.sum() / support.sum()),
+            "f1": float((f1 * support).sum() / support.sum())
+        }
 
     def predict(self, symptoms_list):
-        if self.model is None:
+        return self.predict_batch([symptoms_list])[0]
+
+    def predict_batch(self, symptoms_batch):
+        """Dự đoán cho nhiều bộ triệu chứng bằng một lần transform + predict_proba"""
+        if not self.is_loaded:
+            raise ValueError("Model chưa load!")
+
+        # Chuẩn hóa để thứ tự và chữ hoa/thường không ảnh hưởng kết quả
+        normalized = [DataProcessor.normalize_symptoms(s) for s in symptoms_batch]
+
+        results = [self.cached_prediction(symptoms) for symptoms in normalized]
+        miss_idx = [i for i, r in enumerate(results) if r is None]
+        if not miss_idx:
+            return results
+
+        # Chỉ tính cho các bộ chưa có trong cache
+        scored = self.score_normalized([normalized[i] for i in miss_idx])
+        for i, predictions in zip(miss_idx, scored):
+            results[i] = predictions
+        return results
+
+    def cached_prediction(self, normalized):
+        """Kết quả trong cache dự đoán (bản sao) của bộ triệu chứng đã chuẩn hóa, None nếu chưa có"""
+        if not self.cache:
+            return None
+        cached = self.cache.get(self._cache_key(normalized))
+        return [dict(r) for r in cached] if cached is not None else None
+
+    def score_normalized(self, normalized_batch):
+        """Dự đoán (không tra cache) cho các bộ triệu chứng đã chuẩn hóa rồi lưu vào cache"""
+        if not self.is_loaded:
             raise ValueError("Model chưa load!")
 
-        # Chuẩn hóa và chuyển thành dạng TF-IDF input
-        text_input = " ".join([s.lower().strip() for s in symptoms_list])
+        # Chuyển thành dạng TF-IDF input
+        start = time.perf_counter()
+        X = self._vectorize(normalized_batch)
+        vectorized = time.perf_counter()
+        if self.engine is not None:
+            probs_matrix = self.engine.predict_proba(X)
+        else:
+            probs_matrix = self.model.predict_proba(X)
+        predicted = time.perf_counter()
+
+        results = []
+        for symptoms, probs in zip(normalized_batch, probs_matrix):
+            predictions = self._rank_predictions(probs)
+            if self.cache:
+                self.cache.put(self._cache_key(symptoms), predictions)
+            results.append([dict(r) for r in predictions])
+
+        metrics.STAGE_VECTORIZE.observe(vectorized - start)
+        metrics.STAGE_PREDICT_PROBA.observe(predicted - vectorized)
+        metrics.STAGE_RANK.observe(time.perf_counter() - predicted)
+        return results
+
+    def _vectorize(self, normalized_batch):
+        """Triệu chứng đã biết lấy feature trực tiếp từ symptom_index, còn lại dùng vectorizer"""
+        if self.symptom_index is not None:
+            return self.symptom_index.transform(normalized_batch, self.vectorizer)
+        return self.vectorizer.transform([" ".join(s) for s in normalized_batch])
+
+    def unrecognized_symptoms(self, symptoms_list):
+        """Các triệu chứng đầu vào không có trong danh sách triệu chứng của model"""
+        if self.symptom_index is None:
+            return []
+        return self.symptom_index.unknown(DataProcessor.normalize_symptoms(symptoms_list))
+
+    def _build_symptom_index(self):
+        """Tính sẵn feature TF-IDF của từng triệu chứng trong dataset"""
+        self.symptom_index = None
+        if not self.config.USE_SYMPTOM_INDEX:
+            return
+        try:
+            symptoms = self.data_processor.get_all_symptoms()
+        except FileNotFoundError:
+            return
+        self.symptom_index = SymptomFeatureIndex.build(self.vectorizer, symptoms)
 
-        X = self.vectorizer.transform([text_input])
-        probs = self.model.predict_proba(X)[0]
+    def _cache_key(self, normalized_symptoms):
+        return (self.model_version, tuple(normalized_symptoms))
 
-        classes = self.label_binarizer.classes_
-        sorted_idx = np.argsort(probs)[::-1]
+    def _set_model_version(self, version):
+        """Đổi phiên bản model và bỏ các kết quả cache của model cũ"""
+        self.model_version = version
+        if self.cache:
+            self.cache.clear()
+
+    @property
+    def min_confidence(self):
+        """Ngưỡng độ tin cậy theo số bệnh: min(MIN_CONFIDENCE, MIN_CONFIDENCE_LIFT / số bệnh)"""
+        lift = getattr(self.config, 'MIN_CONFIDENCE_LIFT', None)
+        if not lift or self.labels is None or len(self.labels) == 0:
+            return self.config.MIN_CONFIDENCE
+        return min(self.config.MIN_CONFIDENCE, lift / len(self.labels))
+
+    def _rank_predictions(self, probs):
+        """Lấy top MAX_PREDICTIONS bệnh có độ tin cậy >= min_confidence"""
+        classes = self.labels
+        top_idx = top_k_indices(probs, self.config.MAX_PREDICTIONS)
+        min_confidence = self.min_confidence
 
         results = []
-        for i in sorted_idx[:self.config.MAX_PREDICTIONS]:
-            if probs[i] >= self.config.MIN_CONFIDENCE:
+        for i in top_idx:
+            if probs[i] >= min_confidence:
                 results.append({
                     "benh": classes[i],
                     "do_tin_cay": float(round(probs[i], 3))
@@ -90,14 +720,170 @@ class DiseasePredictor:
 
         return results
 
+    def _build_engine(self):
+        """Gộp các estimator thành LinearInferenceEngine và kiểm tra với sklearn"""
+        self.engine = None
+        if not getattr(self.config, 'USE_LINEAR_ENGINE', True):
+            return
+
+        engine = LinearInferenceEngine.from_model(self.model)
+        if engine is None:
+            print("WARNING: Model không hỗ trợ linear engine, dùng predict_proba của sklearn")
+            return
+
+        # Kiểm tra trên vài dòng ngẫu nhiên trước khi dùng thay sklearn (cùng kiểu số với
+        # trọng số: sklearn không nhân hai ma trận sparse khác kiểu, vd. model đã compaction)
+        X_check = sp.random(
+            16, engine.n_features, density=0.05, format='csr',
+            dtype=engine.weights.dtype, random_state=self.config.RANDOM_STATE
+        )
+        max_err = engine.verify(self.model, X_check)
+        if max_err > self.config.LINEAR_ENGINE_TOLERANCE:
+            print(f"WARNING: Linear engine lệch {max_err:.2e} so với sklearn, bỏ qua engine")
+            return
+
+        self.engine = engine
+
     def save_model(self):
-        joblib.dump(self.model, self.config.MODEL_PATH)
-        joblib.dump(self.vectorizer, self.config.VECTORIZER_PATH)
-        joblib.dump(self.label_binarizer, self.config.LABEL_ENCODER_PATH)
-        print("Đã lưu model!")
-
-    def load_model(self):
-        self.model = joblib.load(self.config.MODEL_PATH)
-        self.vectorizer = joblib.load(self.config.VECTORIZER_PATH)
-        self.label_binarizer = joblib.load(self.config.LABEL_ENCODER_PATH)
-        print("Đã load model thành công!")
+        """Lưu model thành phiên bản mới trong MODEL_DIR/versions và chuyển CURRENT sang đó"""
+        version, staging = self.store.stage()
+        self.metadata = dict(self.metadata, version=version)
+        # Một file chứa model sklearn, vectorizer, nhãn và symptom index, kèm manifest
+        write_bundle(
+            staging / BUNDLE_FILE,
+            {
+                "model": self.model,
+                "vectorizer": self.vectorizer,
+                "label_binarizer": self.label_binarizer,
+                "symptom_index": self.symptom_index
+            },
+            self._bundle_manifest()
+        )
+        # Bản mảng phẳng để các worker load bằng mmap (MODEL_ARTIFACT_FORMAT = 'mmap')
+        write_array_artifact(
+            staging / ARRAYS_DIR, self.engine, self.vectorizer,
+            self.labels, self.model.classes_
+        )
+        if self.symptom_index is not None:
+            self.symptom_index.save(staging / SYMPTOM_INDEX_DIR)
+
+        self.model_path = self.store.commit(version, staging, self.metadata)
+        self.store.prune(self.config.MODEL_KEEP_VERSIONS)
+        self._set_model_version(version)
+        print(f"Đã lưu model! (phiên bản {version})")
+        return version
+
+    def import_bundle(self, bundle_path):
+        """Nhận file bundle (vd. copy từ máy khác) thành phiên bản mới trong MODEL_DIR và chuyển CURRENT sang đó"""
+        manifest = self._load_bundle(Path(bundle_path))
+        self.metadata = dict(manifest.get("metadata") or {}, imported_from=manifest.get("model_version"))
+        return self.save_model()
+
+    def _bundle_manifest(self):
+        vocabulary = getattr(self.vectorizer, 'vocabulary_', None)
+        return {
+            "model_version": self.metadata.get("version"),
+            "trained_at": self.metadata.get("trained_at"),
+            "mode": self.metadata.get("mode"),
+            "metrics": self.metadata.get("metrics"),
+            "n_classes": len(self.labels),
+            "vocabulary_size": len(vocabulary) if vocabulary is not None else None,
+            "metadata": self.metadata
+        }
+
+    def load_model(self, version=None, artifact_format=None):
+        """
+        Load phiên bản model đang active (hoặc phiên bản chỉ định), artifact_format mặc định
+        MODEL_ARTIFACT_FORMAT. Với 'pickle', phiên bản có bundle được load từ bundle, phiên
+        bản cũ (ba file joblib) vẫn load như trước.
+        """
+        model_file = Path(self.config.MODEL_PATH).name
+        if version is None:
+            version, path = self.store.resolve(model_file)
+        else:
+            path = self.store.version_path(version)
+
+        start = time.perf_counter()
+        arrays_path = path / ARRAYS_DIR
+        artifact_format = artifact_format or self.config.MODEL_ARTIFACT_FORMAT
+        if artifact_format == 'mmap' and (arrays_path / ARRAYS_META_FILE).exists():
+            self._load_arrays(arrays_path)
+            artifact_format = 'mmap'
+        elif (path / BUNDLE_FILE).exists():
+            self._load_bundle(path / BUNDLE_FILE)
+            artifact_format = 'bundle'
+        else:
+            import joblib
+            self.model = joblib.load(path / model_file)
+            self.vectorizer = joblib.load(path / Path(self.config.VECTORIZER_PATH).name)
+            self.label_binarizer = joblib.load(path / Path(self.config.LABEL_ENCODER_PATH).name)
+            self.labels = self.label_binarizer.classes_
+            self._build_engine()
+            artifact_format = 'pickle'
+        if artifact_format != 'bundle' or self.symptom_index is None:
+            self._load_symptom_index(path / SYMPTOM_INDEX_DIR, artifact_format)
+        load_time = time.perf_counter() - start
+        metrics.MODEL_LOAD_SECONDS.labels(artifact_format).observe(load_time)
+        self.load_stats = {
+            "format": artifact_format,
+            "load_time": round(load_time, 4)
+        }
+
+        if version == ModelStore.LEGACY_VERSION:
+            # Layout cũ không có id phiên bản, dùng mtime để phân biệt các lần train
+            version = f"{version}-{(path / model_file).stat().st_mtime_ns}"
+            self.metadata = {}
+        else:
+            self.metadata = self.store.read_metadata(version)
+        self.model_path = path
+        self._set_model_version(version)
+        print(f"Đã load model thành công! (phiên bản {version}, "
+              f"{artifact_format}, {self.load_stats['load_time']}s)")
+
+    def _load_bundle(self, bundle_path):
+        """Load model sklearn, vectorizer, nhãn và symptom index từ bundle, trả về manifest"""
+        manifest, objects = read_bundle(bundle_path, verify_hash=self.config.MODEL_BUNDLE_VERIFY)
+        self.model = objects["model"]
+        self.vectorizer = objects["vectorizer"]
+        self.label_binarizer = objects["label_binarizer"]
+        self.labels = self.label_binarizer.classes_
+
+        vocabulary = getattr(self.vectorizer, 'vocabulary_', None)
+        if (len(self.labels) != manifest.get("n_classes")
+                or (vocabulary is not None and len(vocabulary) != manifest.get("vocabulary_size"))):
+            raise ValueError(f"Nội dung bundle {bundle_path} không khớp manifest")
+
+        self.symptom_index = objects.get("symptom_index") if self.config.USE_SYMPTOM_INDEX else None
+        self._build_engine()
+        return manifest
+
+    def _load_symptom_index(self, index_path, artifact_format):
+        # Model cũ chưa có symptom_index thì tính lại từ dataset
+        if not self.config.USE_SYMPTOM_INDEX:
+            self.symptom_index = None
+        elif (index_path / 'meta.json').exists():
+            mmap_mode = 'r' if artifact_format == 'mmap' else None
+            self.symptom_index = SymptomFeatureIndex.load(index_path, mmap_mode=mmap_mode)
+        else:
+            self._build_symptom_index()
+
+    def _load_arrays(self, arrays_path):
+        """Load artifact dạng mảng bằng mmap: chỉ có engine, không có model sklearn"""
+        engine, vectorizer, labels, model_classes = read_array_artifact(arrays_path, mmap_mode='r')
+        self.model = None
+        self.engine = engine
+        self.vectorizer = vectorizer
+        self.label_binarizer = None
+        self.labels = labels
+        self._model_classes = model_classes
+
+    def get_model_info(self):
+        """Thông tin phiên bản model đang load"""
+        return {
+            "version": self.model_version,
+            "trained_at": self.metadata.get("trained_at"),
+            "metrics": self.metadata.get("metrics"),
+            "n_classes": len(self.labels) if self.labels is not None else 0,
+            "n_features": getattr(self.vectorizer, "n_features", None) or len(getattr(self.vectorizer, "vocabulary_", {})),
+            "load": self.load_stats
+        }
@@ -0,0 +1,107 @@
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+
+class ModelStore:
+    """
+    Quản lý các phiên bản model trong MODEL_DIR.
+
+    Mỗi lần lưu model tạo một thư mục mới versions/<version>/ (ghi vào
+    thư mục tạm rồi đổi tên), sau đó file CURRENT được thay thế nguyên tử
+    bằng os.replace để trỏ sang phiên bản mới. Người đọc không bao giờ thấy
+    một bộ file ghi dở. Nếu chưa có CURRENT thì dùng bộ file cũ nằm trực
+    tiếp trong MODEL_DIR (layout trước khi có phiên bản).
+    """
+
+    CURRENT_FILE = 'CURRENT'
+    VERSIONS_DIR = 'versions'
+    METADATA_FILE = 'metadata.json'
+    LEGACY_VERSION = 'legacy'
+
+    def __init__(self, model_dir):
+        self.model_dir = Path(model_dir)
+        self.versions_dir = self.model_dir / self.VERSIONS_DIR
+        self.current_file = self.model_dir / self.CURRENT_FILE
+
+    @staticmethod
+    def new_version_id():
+        return time.strftime('%Y%m%d-%H%M%S') + '-' + uuid.uuid4().hex[:6]
+
+    def version_path(self, version):
+        if version == self.LEGACY_VERSION:
+            return self.model_dir
+        return self.versions_dir / version
+
+    def current_version(self):
+        """Đọc phiên bản đang active, None nếu chưa có CURRENT"""
+        try:
+            version = self.current_file.read_text(encoding='utf-8').strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def resolve(self, legacy_marker):
+        """Trả về (version, path) của model đang active"""
+        version = self.current_version()
+        if version is not None:
+            return version, self.version_path(version)
+
+        if (self.model_dir / legacy_marker).exists():
+            return self.LEGACY_VERSION, self.model_dir
+
+        raise FileNotFoundError(f"Không tìm thấy model trong {self.model_dir}")
+
+    def stage(self):
+        """Tạo thư mục tạm để ghi artifact của phiên bản mới"""
+        version = self.new_version_id()
+        staging = self.versions_dir / f'.tmp-{version}'
+        staging.mkdir(parents=True, exist_ok=False)
+        return version, staging
+
+    def commit(self, version, staging, metadata=None):
+        """Hoàn tất thư mục phiên bản rồi chuyển CURRENT sang phiên bản đó"""
+        if metadata is not None:
+            with open(staging / self.METADATA_FILE, 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+        os.rename(staging, self.version_path(version))
+        self.publish(version)
+        return self.version_path(version)
+
+    def publish(self, version):
+        """Đổi con trỏ CURRENT một cách nguyên tử"""
+        if not self.version_path(version).is_dir():
+            raise FileNotFoundError(f"Không có phiên bản model {version}")
+
+        tmp = self.model_dir / f'.{self.CURRENT_FILE}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.current_file)
+
+    def read_metadata(self, version):
+        try:
+            with open(self.version_path(version) / self.METADATA_FILE, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def list_versions(self):
+        if not self.versions_dir.is_dir():
+            return []
+        return sorted(
+            p.name for p in self.versions_dir.iterdir()
+            if p.is_dir() and not p.name.startswith('.')
+        )
+
+    def prune(self, keep):
+        """Xóa các phiên bản cũ, luôn giữ lại phiên bản đang active"""
+        current = self.current_version()
+        old = [v for v in self.list_versions() if v != current]
+        for version in old[:max(0, len(old) - (keep - 1))]:
+            shutil.rmtree(self.version_path(version), ignore_errors=True)
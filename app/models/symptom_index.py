@@ -0,0 +1,218 @@
+import json
+
+import numpy as np
+import scipy.sparse as sp
+
+from app.models.text_features import tfidf_from_counts
+
+SYMPTOM_INDEX_DIR = 'symptom_index'
+SYMPTOM_INDEX_TOLERANCE = 1e-9
+
+
+class SymptomFeatureIndex:
+    """
+    Map mỗi triệu chứng chuẩn (từ dataset) sang các feature TF-IDF của nó.
+
+    Input của /api/predict là các triệu chứng rời rạc, nên thay vì ghép chuỗi
+    rồi tách từ lại, dòng feature được cộng trực tiếp từ số lần xuất hiện
+    unigram/bigram đã tính sẵn của từng triệu chứng, cộng thêm bigram nối
+    giữa hai triệu chứng liền nhau. Kết quả giống hệt
+    vectorizer.transform([" ".join(triệu chứng đã chuẩn hóa)]); bộ nào có
+    triệu chứng lạ thì vẫn dùng vectorizer.
+    """
+
+    def __init__(self, symptoms, indptr, indices, counts, first_tokens, last_tokens, use_bigrams):
+        self.symptoms = symptoms
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+        self.first_tokens = first_tokens
+        self.last_tokens = last_tokens
+        self.use_bigrams = use_bigrams
+
+        # Bảng tra cứu dạng object Python cho đường dự đoán: symptom -> (các cặp (feature, count), token đầu, token cuối)
+        indptr = np.asarray(indptr).tolist()
+        indices = np.asarray(indices).tolist()
+        counts = np.asarray(counts).tolist()
+        self._lookup = {
+            symptom: (
+                tuple(zip(indices[indptr[i]:indptr[i + 1]], counts[indptr[i]:indptr[i + 1]])),
+                first_tokens[i],
+                last_tokens[i]
+            )
+            for i, symptom in enumerate(symptoms)
+        }
+
+    @staticmethod
+    def supports(vectorizer):
+        """Chỉ hỗ trợ analyzer='word' với ngram_range (1, 1) hoặc (1, 2)"""
+        if not hasattr(vectorizer, 'vocabulary_') or not hasattr(vectorizer, 'build_tokenizer'):
+            return False
+        if getattr(vectorizer, 'analyzer', 'word') != 'word':
+            return False
+        if tuple(getattr(vectorizer, 'ngram_range', (1, 1))) not in ((1, 1), (1, 2)):
+            return False
+        for attr in ('stop_words', 'tokenizer', 'preprocessor', 'strip_accents'):
+            if getattr(vectorizer, attr, None) is not None:
+                return False
+        return True
+
+    @classmethod
+    def build(cls, vectorizer, symptoms):
+        """Tính sẵn feature của từng triệu chứng, None nếu vectorizer không hỗ trợ"""
+        if not cls.supports(vectorizer):
+            return None
+
+        preprocess = vectorizer.build_preprocessor()
+        tokenize = vectorizer.build_tokenizer()
+        vocabulary = vectorizer.vocabulary_
+        use_bigrams = tuple(vectorizer.ngram_range) == (1, 2)
+
+        indptr = [0]
+        indices = []
+        counts = []
+        first_tokens = []
+        last_tokens = []
+        for symptom in symptoms:
+            tokens = tokenize(preprocess(symptom))
+            terms = list(tokens)
+            if use_bigrams:
+                terms += [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+            term_counts = {}
+            for term in terms:
+                idx = vocabulary.get(term)
+                if idx is not None:
+                    term_counts[idx] = term_counts.get(idx, 0) + 1
+            for idx in sorted(term_counts):
+                indices.append(idx)
+                counts.append(term_counts[idx])
+            indptr.append(len(indices))
+            first_tokens.append(tokens[0] if tokens else '')
+            last_tokens.append(tokens[-1] if tokens else '')
+
+        index = cls(
+            list(symptoms),
+            np.asarray(indptr, dtype=np.int64),
+            np.asarray(indices, dtype=np.int32),
+            np.asarray(counts, dtype=np.int32),
+            first_tokens,
+            last_tokens,
+            use_bigrams
+        )
+        return index if index._check(vectorizer) else None
+
+    def _check(self, vectorizer, n_samples=64):
+        """So với vectorizer.transform trên các tổ hợp triệu chứng ngẫu nhiên"""
+        if not self.symptoms:
+            return False
+        rng = np.random.default_rng(0)
+        batch = [
+            sorted(set(rng.choice(self.symptoms, size=rng.integers(1, 6)).tolist()))
+            for _ in range(n_samples)
+        ]
+        expected = vectorizer.transform([" ".join(symptoms) for symptoms in batch])
+        actual = self._direct_rows(batch, vectorizer)
+        diff = abs(expected - actual)
+        return diff.max() <= SYMPTOM_INDEX_TOLERANCE if diff.nnz else True
+
+    def __contains__(self, symptom):
+        return symptom in self._lookup
+
+    def unknown(self, normalized_symptoms):
+        """Các triệu chứng không có trong danh sách triệu chứng chuẩn"""
+        return [s for s in normalized_symptoms if s not in self._lookup]
+
+    def _direct_rows(self, normalized_batch, vectorizer):
+        vocabulary = vectorizer.vocabulary_
+        lookup = self._lookup
+        count_rows = []
+        for symptoms in normalized_batch:
+            counts = {}
+            prev_last = ''
+            for symptom in symptoms:
+                features, first, last = lookup[symptom]
+                for idx, count in features:
+                    counts[idx] = counts.get(idx, 0) + count
+
+                # Bigram nối token cuối của triệu chứng trước với token đầu của triệu chứng này
+                if not first:
+                    continue
+                if self.use_bigrams and prev_last:
+                    idx = vocabulary.get(f"{prev_last} {first}")
+                    if idx is not None:
+                        counts[idx] = counts.get(idx, 0) + 1
+                prev_last = last
+            count_rows.append(counts)
+
+        return tfidf_from_counts(
+            count_rows, len(vocabulary),
+            idf=vectorizer.idf_ if getattr(vectorizer, 'use_idf', True) else None,
+            norm=vectorizer.norm,
+            sublinear_tf=vectorizer.sublinear_tf,
+            binary=vectorizer.binary,
+            dtype=vectorizer.dtype
+        )
+
+    def transform(self, normalized_batch, vectorizer):
+        """
+        Ma trận TF-IDF cho các bộ triệu chứng đã chuẩn hóa (sắp xếp, bỏ trùng).
+        Bộ nào có triệu chứng lạ thì tính bằng vectorizer.transform.
+        """
+        direct = []
+        fallback = []
+        for r, symptoms in enumerate(normalized_batch):
+            if all(s in self._lookup for s in symptoms):
+                direct.append(r)
+            else:
+                fallback.append(r)
+
+        if not fallback:
+            return self._direct_rows(normalized_batch, vectorizer)
+        if not direct:
+            return vectorizer.transform([" ".join(s) for s in normalized_batch])
+
+        X_direct = self._direct_rows([normalized_batch[r] for r in direct], vectorizer)
+        X_fallback = vectorizer.transform([" ".join(normalized_batch[r]) for r in fallback])
+        X = sp.vstack([X_direct, X_fallback], format='csr')
+
+        # Đưa các dòng về đúng thứ tự ban đầu
+        order = np.empty(len(normalized_batch), dtype=np.intp)
+        order[direct + fallback] = np.arange(len(normalized_batch))
+        return X[order]
+
+    def __reduce__(self):
+        # Pickle (bundle model) chỉ chứa các mảng, bảng tra cứu được tạo lại khi unpickle
+        return (self.__class__, (
+            self.symptoms, self.indptr, self.indices, self.counts,
+            self.first_tokens, self.last_tokens, self.use_bigrams
+        ))
+
+    def save(self, directory):
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / 'symptoms.npy', np.array(self.symptoms, dtype=str))
+        np.save(directory / 'indptr.npy', self.indptr)
+        np.save(directory / 'indices.npy', self.indices)
+        np.save(directory / 'counts.npy', self.counts)
+        np.save(directory / 'first_tokens.npy', np.array(self.first_tokens, dtype=str))
+        np.save(directory / 'last_tokens.npy', np.array(self.last_tokens, dtype=str))
+        with open(directory / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump({'use_bigrams': self.use_bigrams}, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode=None):
+        with open(directory / 'meta.json', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        def load(name):
+            return np.load(directory / name, mmap_mode=mmap_mode)
+
+        return cls(
+            load('symptoms.npy').tolist(),
+            load('indptr.npy'),
+            load('indices.npy'),
+            load('counts.npy'),
+            load('first_tokens.npy').tolist(),
+            load('last_tokens.npy').tolist(),
+            meta['use_bigrams']
+        )
@@ -0,0 +1,197 @@
+import re
+from collections.abc import Mapping
+
+import numpy as np
+import scipy.sparse as sp
+
+
+class TermIndex(Mapping):
+    """
+    Vocabulary (term -> chỉ số feature) dạng hai mảng: term đã sắp xếp và chỉ
+    số feature tương ứng. Tra cứu bằng np.searchsorted nên hai mảng có thể mở
+    bằng mmap và dùng chung page giữa các worker, không worker nào phải dựng
+    dict riêng cho vocabulary.
+    """
+
+    def __init__(self, sorted_terms, feature_idx):
+        self.sorted_terms = sorted_terms
+        self.feature_idx = feature_idx
+
+    @classmethod
+    def from_terms(cls, terms):
+        """Tạo từ danh sách term theo thứ tự chỉ số feature"""
+        terms = np.array(terms, dtype=str)
+        order = np.argsort(terms, kind='stable')
+        return cls(terms[order], order.astype(np.int32))
+
+    def lookup(self, terms):
+        """Chỉ số feature của từng term (một lần searchsorted cho cả danh sách), -1 nếu không có"""
+        if not terms or not len(self.sorted_terms):
+            return np.full(len(terms), -1, dtype=np.int32)
+        terms = np.array(terms, dtype=self.sorted_terms.dtype)
+        pos = np.searchsorted(self.sorted_terms, terms)
+        pos[pos == len(self.sorted_terms)] = 0
+        found = self.sorted_terms[pos] == terms
+        return np.where(found, self.feature_idx[pos], -1)
+
+    def __getitem__(self, term):
+        pos = int(self.sorted_terms.searchsorted(term))
+        if pos < len(self.sorted_terms) and self.sorted_terms[pos] == term:
+            return int(self.feature_idx[pos])
+        raise KeyError(term)
+
+    def __len__(self):
+        return len(self.sorted_terms)
+
+    def __iter__(self):
+        return iter(self.sorted_terms.tolist())
+
+    def items(self):
+        return zip(self.sorted_terms.tolist(), self.feature_idx.tolist())
+
+
+class CompiledTfidfVectorizer:
+    """
+    Phần transform của TfidfVectorizer (analyzer='word') dùng khi phục vụ dự đoán.
+
+    Chỉ cần vocabulary (dict hoặc TermIndex) + idf đã fit nên process phục vụ
+    không phải import sklearn. Kết quả được so với TfidfVectorizer gốc khi lưu model
+    (xem artifacts.write_array_artifact).
+    """
+
+    # Các tham số mà bản rút gọn này xử lý giống hệt sklearn
+    SUPPORTED_DEFAULTS = {
+        'analyzer': 'word',
+        'input': 'content',
+        'preprocessor': None,
+        'tokenizer': None,
+        'stop_words': None,
+        'strip_accents': None
+    }
+
+    def __init__(self, vocabulary, idf, ngram_range=(1, 1), lowercase=True,
+                 token_pattern=r"(?u)\b\w\w+\b", norm='l2', use_idf=True,
+                 sublinear_tf=False, binary=False, dtype=np.float64):
+        self.vocabulary_ = vocabulary
+        self.idf_ = idf
+        self.ngram_range = tuple(ngram_range)
+        self.lowercase = lowercase
+        self.norm = norm
+        self.use_idf = use_idf
+        self.sublinear_tf = sublinear_tf
+        self.binary = binary
+        self.dtype = dtype
+
+        pattern = re.compile(token_pattern)
+        if pattern.groups > 1:
+            raise ValueError("token_pattern chỉ được có tối đa một nhóm")
+        self._findall = pattern.findall
+
+    @classmethod
+    def from_params(cls, params, vocabulary, idf):
+        """Tạo từ get_params() của TfidfVectorizer, None nếu có tham số không hỗ trợ"""
+        for key, value in cls.SUPPORTED_DEFAULTS.items():
+            if params.get(key, value) != value:
+                return None
+        if params.get('norm') not in ('l1', 'l2', None):
+            return None
+
+        return cls(
+            vocabulary, idf,
+            ngram_range=params.get('ngram_range', (1, 1)),
+            lowercase=params.get('lowercase', True),
+            token_pattern=params.get('token_pattern', r"(?u)\b\w\w+\b"),
+            norm=params.get('norm', 'l2'),
+            use_idf=params.get('use_idf', True),
+            sublinear_tf=params.get('sublinear_tf', False),
+            binary=params.get('binary', False),
+            dtype=params.get('dtype', np.float64)
+        )
+
+    def build_preprocessor(self):
+        return str.lower if self.lowercase else (lambda doc: doc)
+
+    def build_tokenizer(self):
+        return self._findall
+
+    def _analyze(self, doc):
+        if self.lowercase:
+            doc = doc.lower()
+        tokens = self._findall(doc)
+
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+
+        ngrams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            for i in range(len(tokens) - n + 1):
+                ngrams.append(" ".join(tokens[i:i + n]))
+        return ngrams
+
+    def transform(self, raw_documents):
+        """Chuyển danh sách văn bản thành ma trận TF-IDF dạng CSR"""
+        vocabulary = self.vocabulary_
+        docs = [self._analyze(doc) for doc in raw_documents]
+        if isinstance(vocabulary, TermIndex):
+            ids = iter(vocabulary.lookup([term for terms in docs for term in terms]).tolist())
+        else:
+            ids = iter([vocabulary.get(term, -1) for terms in docs for term in terms])
+
+        count_rows = []
+        for terms in docs:
+            counts = {}
+            for _ in terms:
+                idx = next(ids)
+                if idx >= 0:
+                    counts[idx] = counts.get(idx, 0) + 1
+            count_rows.append(counts)
+
+        return tfidf_from_counts(
+            count_rows, len(vocabulary),
+            idf=self.idf_ if self.use_idf else None,
+            norm=self.norm,
+            sublinear_tf=self.sublinear_tf,
+            binary=self.binary,
+            dtype=self.dtype
+        )
+
+
+def tfidf_from_counts(count_rows, n_features, idf=None, norm='l2',
+                      sublinear_tf=False, binary=False, dtype=np.float64):
+    """
+    Tạo ma trận TF-IDF dạng CSR từ số lần xuất hiện của từng feature mỗi dòng
+    (list các dict feature_index -> count), cùng công thức với TfidfTransformer.
+    """
+    indices = []
+    values = []
+    indptr = [0]
+    for counts in count_rows:
+        for idx in sorted(counts):
+            indices.append(idx)
+            values.append(counts[idx])
+        indptr.append(len(indices))
+
+    n_rows = len(indptr) - 1
+    data = np.asarray(values, dtype=dtype)
+    indices = np.asarray(indices, dtype=np.int32)
+    indptr = np.asarray(indptr, dtype=np.int32)
+
+    if binary:
+        data[:] = 1
+    if sublinear_tf:
+        np.log(data, out=data)
+        data += 1
+    if idf is not None:
+        data *= idf[indices]
+
+    if norm is not None and data.size:
+        row_ids = np.repeat(np.arange(n_rows), np.diff(indptr))
+        if norm == 'l2':
+            norms = np.sqrt(np.bincount(row_ids, weights=data * data, minlength=n_rows))
+        else:
+            norms = np.bincount(row_ids, weights=np.abs(data), minlength=n_rows)
+        norms[norms == 0] = 1
+        data /= norms[row_ids]
+
+    return sp.csr_matrix((data, indices, indptr), shape=(n_rows, n_features))
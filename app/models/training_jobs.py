@@ -0,0 +1,232 @@
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có flock, giới hạn job chỉ tính trong từng process
+    fcntl = None
+
+from app.utils import metrics
+
+JOBS_DIR = 'jobs'
+_JOB_ID = re.compile(r'[0-9a-f]{32}')
+
+
+class JobStore:
+    """
+    Trạng thái job train dạng file JSON MODEL_DIR/jobs/<job_id>.json.
+
+    Mỗi lần ghi là file tạm rồi os.replace (như CURRENT của ModelStore) nên
+    mọi worker gunicorn và process train đều đọc được bản ghi đầy đủ: worker
+    nhận POST ghi 'queued', process train ghi 'running' khi bắt đầu và kết quả
+    khi xong.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def _path(self, job_id):
+        return self.directory / f'{job_id}.json'
+
+    def write(self, job):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.directory / f".{job['job_id']}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path(job['job_id']))
+
+    def read(self, job_id):
+        """Bản ghi job, None nếu không có (job_id không hợp lệ cũng là không có)"""
+        if not _JOB_ID.fullmatch(job_id or ''):
+            return None
+        try:
+            with open(self._path(job_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def update(self, job_id, **fields):
+        job = self.read(job_id)
+        if job is not None:
+            job.update(fields)
+            self.write(job)
+        return job
+
+    def prune(self, keep):
+        """Chỉ giữ lại keep job gần nhất đã kết thúc"""
+        if not self.directory.is_dir():
+            return
+        finished = []
+        for path in self.directory.glob('*.json'):
+            job = self.read(path.stem)
+            if job is not None and job['state'] in ('succeeded', 'failed'):
+                finished.append(job)
+        finished.sort(key=lambda j: j['submitted_at'])
+        for job in finished[:max(0, len(finished) - keep)]:
+            try:
+                self._path(job['job_id']).unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _acquire_training_slot(directory, n_slots, poll_interval=1.0):
+    """
+    Chờ đến khi giữ được một trong n_slots khóa flock trong directory. Các khóa
+    dùng chung cho mọi worker trên máy, nên số job train chạy đồng thời là
+    TRAINING_WORKERS cho cả server chứ không phải cho từng worker. Trả về file
+    đang giữ khóa (đóng file là nhả khóa), None nếu không có flock.
+    """
+    if fcntl is None:
+        return None
+    directory.mkdir(parents=True, exist_ok=True)
+    while True:
+        for slot in range(max(1, n_slots)):
+            f = open(directory / f'.slot-{slot}.lock', 'a')
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return f
+            except BlockingIOError:
+                f.close()
+        time.sleep(poll_interval)
+
+
+def _run_training_job(job_id, mode=None):
+    """Chạy trong process riêng: chờ slot train, train + lưu model, ghi trạng thái vào JobStore"""
+    from app.config import Config
+    from app.models.ml_model import DiseasePredictor
+
+    config = Config()
+    config.init_app(None)
+    store = JobStore(Path(config.MODEL_DIR) / JOBS_DIR)
+
+    slot = _acquire_training_slot(store.directory, config.TRAINING_WORKERS)
+    try:
+        started_at = time.time()
+        store.update(job_id, state='running', started_at=started_at)
+        try:
+            predictor = DiseasePredictor(config)
+            metrics = predictor.train(mode)
+            predictor.save_model()
+        except Exception as e:
+            store.update(job_id, state='failed', error=f'{type(e).__name__}: {e}', finished_at=time.time())
+            raise
+
+        training_time = round(time.time() - started_at, 2)
+        store.update(
+            job_id, state='succeeded', metrics=metrics,
+            training_time=training_time, finished_at=time.time()
+        )
+        return {'metrics': metrics, 'training_time': training_time}
+    finally:
+        if slot is not None:
+            slot.close()
+
+
+class TrainingJobManager:
+    """
+    Quản lý các job train model chạy nền trong process riêng.
+
+    Worker phục vụ request chỉ submit job và trả job_id ngay, việc train
+    không chiếm worker. Trạng thái job nằm trong JobStore (MODEL_DIR/jobs)
+    nên worker nào cũng trả lời được GET /api/train/<job_id>. Khi job thành
+    công, worker đã submit gọi on_success (ví dụ để load lại model đang
+    phục vụ), các worker khác nhận model mới qua CURRENT.
+    """
+
+    def __init__(self, jobs_dir, max_workers=1, max_history=50, on_success=None):
+        self.store = JobStore(jobs_dir)
+        self.max_workers = max_workers
+        self.max_history = max_history
+        self.on_success = on_success
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Tạo executor theo từng process (an toàn khi gunicorn fork worker)
+        broken = self._executor is not None and getattr(self._executor, '_broken', False)
+        if self._executor is None or broken or self._executor_pid != os.getpid():
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def submit(self, mode=None):
+        """Đưa một job train vào hàng đợi, trả về job_id (mode None = TRAINING_MODE)"""
+        job_id = uuid.uuid4().hex
+        self.store.write({
+            'job_id': job_id,
+            'state': 'queued',
+            'mode': mode,
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'metrics': None,
+            'training_time': None,
+            'error': None
+        })
+
+        with self._lock:
+            future = self._get_executor().submit(_run_training_job, job_id, mode)
+        self.store.prune(self.max_history)
+
+        future.add_done_callback(lambda f: self._on_done(job_id, mode, f))
+        return job_id
+
+    def _on_done(self, job_id, mode, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            print(f"Job train {job_id} thất bại:")
+            traceback.print_exception(type(e), e, e.__traceback__)
+            # Process train chết giữa chừng (vd. BrokenProcessPool) thì chưa kịp ghi trạng thái
+            job = self.store.read(job_id)
+            if job is not None and job['state'] not in ('succeeded', 'failed'):
+                self.store.update(job_id, state='failed', error=error, finished_at=time.time())
+        else:
+            error = None
+            print(f"Job train {job_id} hoàn tất sau {result['training_time']}s")
+
+        mode = mode or 'default'
+        metrics.TRAINING_JOBS.labels(mode, 'failed' if error else 'succeeded').inc()
+        if error is None:
+            metrics.TRAINING_DURATION.labels(mode).observe(result['training_time'])
+
+        if error is None and self.on_success is not None:
+            try:
+                self.on_success()
+            except Exception as e:
+                print(f"WARNING: Không thể load model mới sau job {job_id}: {e}")
+
+    def get(self, job_id):
+        """Trạng thái job: queued, running, succeeded, failed (None nếu không có)"""
+        job = self.store.read(job_id)
+        if job is None:
+            return None
+
+        end = job['finished_at'] or time.time()
+        return {
+            'job_id': job['job_id'],
+            'state': job['state'],
+            'mode': job['mode'],
+            'submitted_at': job['submitted_at'],
+            'started_at': job['started_at'],
+            'finished_at': job['finished_at'],
+            'elapsed': round(end - job['submitted_at'], 2),
+            'training_time': job['training_time'],
+            'metrics': job['metrics'],
+            'error': job['error']
+        }
@@ -1,27 +1,301 @@
 from flask import Blueprint, request, jsonify, current_app
-from app.models import DiseasePredictor
-from app.utils import DiseaseInfo
+from app.models import DiseasePredictor, MicroBatcher
+from app.models.model_store import ModelStore
+from app.utils import DataProcessor, DiseaseInfo, PredictionLogger, SymptomSearchIndex
+from app.utils.response_encoding import PredictionResponseEncoder
+from app.utils.http_cache import CachedPayload
+from app.utils import metrics
 from app.config import Config
+import os
+import threading
+import time
 
 prediction_bp = Blueprint('prediction', __name__)
 
-# Khởi tạo predictor (sẽ được load khi app start)
+# Khởi tạo predictor (sẽ được load khi app start).
+# Chỉ được thay bằng một phép gán sang predictor mới đã load xong, không sửa tại chỗ:
+# request đang chạy giữ tham chiếu cũ và hoàn tất trên model cũ, phía đọc không cần khóa.
 predictor = None
 
+# Chỉ phía ghi (load model mới) cần khóa
+_reload_lock = threading.Lock()
+_watcher_pid = None
+
+# Response tĩnh đã serialize sẵn theo phiên bản model: name -> (model_version, CachedPayload)
+_static_payloads = {}
+
+# Index gợi ý triệu chứng theo phiên bản model: (model_version, SymptomSearchIndex)
+_symptom_search = None
+
+# Đoạn JSON tính sẵn cho response dự đoán theo phiên bản model: (model_version, PredictionResponseEncoder)
+_response_encoder = None
+
+# Request có khóa này trong environ không được ghi log audit (request warmup nội bộ)
+SKIP_PREDICTION_LOG = 'disease_api.skip_prediction_log'
+
+
+def _create_prediction_log():
+    if not Config.PREDICTION_LOG:
+        return None
+    return PredictionLogger(
+        Config.PREDICTION_LOG_DIR,
+        max_queue=Config.PREDICTION_LOG_QUEUE_SIZE,
+        policy=Config.PREDICTION_LOG_FULL_POLICY,
+        batch_size=Config.PREDICTION_LOG_BATCH_SIZE,
+        flush_interval=Config.PREDICTION_LOG_FLUSH_INTERVAL,
+        max_bytes=Config.PREDICTION_LOG_MAX_BYTES,
+        backup_count=Config.PREDICTION_LOG_BACKUP_COUNT,
+        block_timeout=Config.PREDICTION_LOG_BLOCK_TIMEOUT
+    )
+
+
+# Log audit đầu vào/kết quả dự đoán, None nếu PREDICTION_LOG tắt
+prediction_log = _create_prediction_log()
+
+# Gom các request /api/predict đồng thời, None nếu MICRO_BATCH tắt
+micro_batcher = MicroBatcher(
+    Config.MICRO_BATCH_WINDOW_MS / 1000, Config.MICRO_BATCH_MAX_SIZE, Config.MICRO_BATCH_TIMEOUT_MS / 1000
+) if Config.MICRO_BATCH else None
+
+
+def _create_predictor():
+    # Tạo config object
+    config = Config()
+    config.init_app(None)
+    return DiseasePredictor(config)
+
 
 def init_predictor():
-    """Khởi tạo predictor khi app start"""
+    """Khởi tạo predictor khi app start, trả về predictor đang phục vụ"""
     global predictor
-    if predictor is None:
-        # Tạo config object
-        config = Config()
-        config.init_app(None)
-        
-        predictor = DiseasePredictor(config)
+    current = predictor
+    if current is not None:
+        return current
+
+    with _reload_lock:
+        if predictor is None:
+            new_predictor = _create_predictor()
+            try:
+                new_predictor.load_model()
+            except FileNotFoundError:
+                print("WARNING: Model chưa được train. Hãy chạy train_model.py trước.")
+            predictor = new_predictor
+            _record_model_info(new_predictor)
+            if new_predictor.is_loaded:
+                _get_response_encoder(new_predictor)
+        return predictor
+
+
+def reload_predictor(version=None):
+    """Load model mới (cache dự đoán của model cũ bị bỏ) rồi thay predictor bằng một phép gán"""
+    global predictor
+    with _reload_lock:
+        new_predictor = _create_predictor()
+        new_predictor.load_model(version)
+        predictor = new_predictor
+        _record_model_info(new_predictor)
+        _get_response_encoder(new_predictor)
+    return new_predictor
+
+
+def _record_model_info(current):
+    """Gauge phiên bản model đang phục vụ cho /metrics"""
+    metrics.MODEL_INFO.clear()
+    if current.is_loaded:
+        metrics.MODEL_INFO.labels(current.model_version, current.load_stats.get('format', '')).set(1)
+
+
+def warmup(app, n_requests=20):
+    """
+    Gửi vài request dự đoán qua test client trước khi worker nhận traffic
+    (load model, engine, payload tĩnh, JSON provider...). Trả về số giây đã chạy.
+    """
+    start = time.perf_counter()
+    current = init_predictor()
+    if current is None or not current.is_loaded or n_requests <= 0:
+        return 0.0
+
+    symptoms = current.data_processor.get_all_symptoms()
+    client = app.test_client()
+    client.environ_base[SKIP_PREDICTION_LOG] = True
+    client.get('/api/symptoms')
+    client.get('/api/diseases')
+    client.get('/api/symptoms/search', query_string={'q': symptoms[0] if symptoms else 'sốt'})
+    for i in range(n_requests):
+        start_idx = (i * 3) % max(1, len(symptoms))
+        client.post('/api/predict', json={'trieu_chung': symptoms[start_idx:start_idx + 3] or ['sốt']})
+    return time.perf_counter() - start
+
+
+@prediction_bp.before_app_request
+def _ensure_model_watcher():
+    """
+    Chạy thread theo dõi CURRENT trong process hiện tại (mỗi worker một thread).
+    Chỉ bắt đầu ở request đầu tiên (warmup trong post_fork) chứ không lúc
+    create_app(): với preload_app, create_app() chạy trong master gunicorn,
+    master không phục vụ request nên không cần thread này.
+    """
+    global _watcher_pid
+    if _watcher_pid == os.getpid() or Config.MODEL_RELOAD_INTERVAL <= 0:
+        return
+    _watcher_pid = os.getpid()
+    threading.Thread(target=_watch_model_version, name='model-watcher', daemon=True).start()
+
+
+def _watch_model_version():
+    """Load ở nền phiên bản model mới khi CURRENT thay đổi"""
+    store = ModelStore(Config.MODEL_DIR)
+    failed_version = None
+    while True:
+        time.sleep(Config.MODEL_RELOAD_INTERVAL)
+        version = None
         try:
-            predictor.load_model()
-        except FileNotFoundError:
-            print("WARNING: Model chưa được train. Hãy chạy train_model.py trước.")
+            version = store.current_version()
+            current = predictor
+            if version is None or version == failed_version:
+                continue
+            if current is None or current.model_version != version:
+                reload_predictor(version)
+        except Exception as e:
+            failed_version = version
+            print(f"WARNING: Không thể load phiên bản model {version}: {e}")
+
+
+def _get_static_payload(current, name, build):
+    """Lấy payload đã serialize sẵn cho phiên bản model hiện tại, build lại khi đổi model"""
+    version = current.model_version
+    cached = _static_payloads.get(name)
+    if cached is None or cached[0] != version:
+        gzip_min_size = Config.GZIP_MIN_SIZE if Config.ENABLE_GZIP else None
+        cached = (version, CachedPayload.from_json(build(), gzip_min_size))
+        _static_payloads[name] = cached
+    return cached[1]
+
+
+def _get_symptom_search(current):
+    """Lấy index gợi ý triệu chứng cho phiên bản model hiện tại, build lại khi đổi model"""
+    global _symptom_search
+    version = current.model_version
+    cached = _symptom_search
+    if cached is None or cached[0] != version:
+        index = SymptomSearchIndex(
+            current.data_processor.get_all_symptoms(),
+            max_edits=Config.SYMPTOM_SEARCH_MAX_EDITS
+        )
+        cached = (version, index)
+        _symptom_search = cached
+    return cached[1]
+
+
+def _validate_symptoms(data):
+    """Kiểm tra body của một yêu cầu dự đoán, trả về (symptoms, error)"""
+    if not data or not isinstance(data, dict) or 'trieu_chung' not in data:
+        return None, 'Thiếu trường "trieu_chung" trong request'
+
+    symptoms = data['trieu_chung']
+
+    if not isinstance(symptoms, list) or len(symptoms) == 0:
+        return None, 'Trường "trieu_chung" phải là mảng và không được rỗng'
+
+    if not all(isinstance(s, str) for s in symptoms):
+        return None, 'Các phần tử của "trieu_chung" phải là chuỗi'
+
+    return symptoms, None
+
+
+def _get_response_encoder(current):
+    """Encoder response dự đoán của phiên bản model hiện tại (tạo khi load model)"""
+    global _response_encoder
+    cached = _response_encoder
+    if cached is None or cached[0] != current.model_version:
+        cached = (current.model_version, PredictionResponseEncoder(current.labels, Config.JSON_ENCODER))
+        _response_encoder = cached
+    return cached[1]
+
+
+def _prediction_body(current, predictions, unknown_symptoms=None):
+    """JSON (bytes) của một kết quả dự đoán, giống _build_prediction_response + jsonify khi không debug"""
+    encoder = _get_response_encoder(current)
+    if predictions:
+        return encoder.encode_prediction(predictions, unknown_symptoms)
+    return encoder.dumps(_build_prediction_response(predictions, unknown_symptoms))
+
+
+def _json_response(body):
+    return current_app.response_class(body + b'\n', mimetype='application/json')
+
+
+def _predict_one(current, symptoms):
+    """Dự đoán một bộ triệu chứng, qua micro_batcher nếu bật (kết quả đã có trong cache thì trả ngay)"""
+    if micro_batcher is None:
+        return current.predict(symptoms)
+    normalized = DataProcessor.normalize_symptoms(symptoms)
+    cached = current.cached_prediction(normalized)
+    if cached is not None:
+        return cached
+    return micro_batcher.predict(current, normalized)
+
+
+def _log_prediction(current, body, symptoms, predictions, started, batch=False):
+    """
+    Đưa record audit vào hàng đợi của prediction_log, việc ghi file chạy ở thread nền.
+    symptoms là triệu chứng chưa chuẩn hóa (batch: danh sách theo từng phần tử, None
+    nếu không hợp lệ), chỉ được chuẩn hóa khi log đang bật.
+    """
+    if prediction_log is None or request.environ.get(SKIP_PREDICTION_LOG):
+        return
+    if batch:
+        symptoms = [None if s is None else DataProcessor.normalize_symptoms(s) for s in symptoms]
+    else:
+        symptoms = DataProcessor.normalize_symptoms(symptoms)
+    prediction_log.log({
+        'timestamp': round(time.time(), 3),
+        'method': request.method,
+        'path': request.path,
+        'body': body,
+        'model_version': current.model_version,
+        'symptoms': symptoms,
+        'predictions': predictions,
+        'latency_ms': round((time.perf_counter() - started) * 1000, 3)
+    })
+
+
+def _build_prediction_response(predictions, unknown_symptoms=None):
+    """Tạo response cho một kết quả dự đoán"""
+    if not predictions:
+        response = {
+            'success': False,
+            'message': 'Không thể dự đoán bệnh với các triệu chứng này',
+            'khuyen_cao': 'Vui lòng bổ sung thêm triệu chứng hoặc đi khám bác sĩ'
+        }
+        if unknown_symptoms:
+            response['trieu_chung_khong_nhan_dien'] = unknown_symptoms
+        return response
+
+    # Lấy thông tin chi tiết cho dự đoán chính
+    main_prediction = predictions[0]
+    disease_name = main_prediction['benh']
+    disease_details = DiseaseInfo.get_info(disease_name)
+
+    response = {
+        'success': True,
+        'du_doan': {
+            'benh': disease_name,
+            'do_tin_cay': main_prediction['do_tin_cay'],
+            'mo_ta': disease_details['mo_ta'],
+            'khuyen_cao': disease_details['khuyen_cao']
+        }
+    }
+
+    # Thêm các dự đoán phụ nếu có
+    if len(predictions) > 1:
+        response['cac_benh_khac'] = predictions[1:]
+
+    # Các triệu chứng không có trong danh sách /api/symptoms
+    if unknown_symptoms:
+        response['trieu_chung_khong_nhan_dien'] = unknown_symptoms
+
+    return response
 
 
 @prediction_bp.route('/predict', methods=['POST'])
@@ -36,60 +310,144 @@ def predict():
     """
     try:
         # Khởi tạo predictor nếu chưa có
-        init_predictor()
+        started = start = time.perf_counter()
+        current = init_predictor()
+        metrics.STAGE_INIT.observe(time.perf_counter() - start)
         
-        if predictor is None or predictor.model is None:
+        if current is None or not current.is_loaded:
             return jsonify({
                 'success': False,
                 'error': 'Model chưa được train. Vui lòng liên hệ admin.'
             }), 503
         
         # Validate request
-        data = request.get_json()
-        if not data or 'trieu_chung' not in data:
+        start = time.perf_counter()
+        # Body không phải JSON hợp lệ -> None, trả 400 như body thiếu trường
+        data = request.get_json(silent=True)
+        parsed = time.perf_counter()
+        symptoms, error = _validate_symptoms(data)
+        metrics.STAGE_PARSE.observe(parsed - start)
+        metrics.STAGE_VALIDATION.observe(time.perf_counter() - parsed)
+        if error:
             return jsonify({
                 'success': False,
-                'error': 'Thiếu trường "trieu_chung" trong request'
+                'error': error
             }), 400
         
-        symptoms = data['trieu_chung']
+        # Dự đoán
+        predictions = _predict_one(current, symptoms)
+        
+        start = time.perf_counter()
+        unknown = current.unrecognized_symptoms(symptoms)
+        if current_app.debug:
+            # Debug: jsonify thụt lề cho dễ đọc
+            response = jsonify(_build_prediction_response(predictions, unknown))
+        else:
+            response = _json_response(_prediction_body(current, predictions, unknown))
+        metrics.STAGE_RESPONSE.observe(time.perf_counter() - start)
+        _log_prediction(current, data, symptoms, predictions, started)
+        return response, 200
         
-        if not isinstance(symptoms, list) or len(symptoms) == 0:
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Lỗi server: {str(e)}'
+        }), 500
+
+
+@prediction_bp.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    API dự đoán bệnh cho nhiều bộ triệu chứng trong một lần gọi
+    
+    Body:
+    {
+        "danh_sach": [
+            {"trieu_chung": ["sốt", "ho", "đau đầu"]},
+            {"trieu_chung": ["đau bụng", "buồn nôn"]}
+        ]
+    }
+    
+    Mỗi phần tử của "ket_qua" có cùng dạng với response của /api/predict,
+    phần tử không hợp lệ được báo lỗi tại chỗ mà không làm hỏng cả batch.
+    """
+    try:
+        started = start = time.perf_counter()
+        current = init_predictor()
+        metrics.STAGE_INIT.observe(time.perf_counter() - start)
+        
+        if current is None or not current.is_loaded:
             return jsonify({
                 'success': False,
-                'error': 'Trường "trieu_chung" phải là mảng và không được rỗng'
-            }), 400
+                'error': 'Model chưa được train. Vui lòng liên hệ admin.'
+            }), 503
         
-        # Dự đoán
-        predictions = predictor.predict(symptoms)
+        start = time.perf_counter()
+        # Body không phải JSON hợp lệ -> None, trả 400 như body thiếu trường
+        data = request.get_json(silent=True)
+        metrics.STAGE_PARSE.observe(time.perf_counter() - start)
+        if not isinstance(data, dict) or not isinstance(data.get('danh_sach'), list) or len(data['danh_sach']) == 0:
+            return jsonify({
+                'success': False,
+                'error': 'Trường "danh_sach" phải là mảng và không được rỗng'
+            }), 400
         
-        if not predictions:
+        items = data['danh_sach']
+        if len(items) > Config.MAX_BATCH_SIZE:
             return jsonify({
                 'success': False,
-                'message': 'Không thể dự đoán bệnh với các triệu chứng này',
-                'khuyen_cao': 'Vui lòng bổ sung thêm triệu chứng hoặc đi khám bác sĩ'
-            }), 200
+                'error': f'Tối đa {Config.MAX_BATCH_SIZE} phần tử mỗi batch'
+            }), 400
         
-        # Lấy thông tin chi tiết cho dự đoán chính
-        main_prediction = predictions[0]
-        disease_name = main_prediction['benh']
-        disease_details = DiseaseInfo.get_info(disease_name)
+        # Validate từng phần tử, chỉ dự đoán cho các phần tử hợp lệ
+        start = time.perf_counter()
+        results = [None] * len(items)
+        valid_idx = []
+        valid_symptoms = []
+        for i, item in enumerate(items):
+            symptoms, error = _validate_symptoms(item)
+            if error:
+                results[i] = {'success': False, 'error': error}
+            else:
+                valid_idx.append(i)
+                valid_symptoms.append(symptoms)
+        metrics.STAGE_VALIDATION.observe(time.perf_counter() - start)
         
-        response = {
-            'success': True,
-            'du_doan': {
-                'benh': disease_name,
-                'do_tin_cay': main_prediction['do_tin_cay'],
-                'mo_ta': disease_details['mo_ta'],
-                'khuyen_cao': disease_details['khuyen_cao']
-            }
-        }
+        # Dự đoán cả batch bằng một lần gọi model
+        batch_predictions = current.predict_batch(valid_symptoms)
         
-        # Thêm các dự đoán phụ nếu có
-        if len(predictions) > 1:
-            response['cac_benh_khac'] = predictions[1:]
+        start = time.perf_counter()
+        if current_app.debug:
+            for i, symptoms, predictions in zip(valid_idx, valid_symptoms, batch_predictions):
+                unknown = current.unrecognized_symptoms(symptoms)
+                results[i] = _build_prediction_response(predictions, unknown)
+            response = jsonify({
+                'success': True,
+                'ket_qua': results,
+                'so_luong': len(results)
+            })
+        else:
+            # Ghép từ JSON của từng phần tử, key theo thứ tự như jsonify: ket_qua, so_luong, success
+            encoder = _get_response_encoder(current)
+            bodies = [None] * len(items)
+            for i, result in enumerate(results):
+                if result is not None:
+                    bodies[i] = encoder.dumps(result)
+            for i, symptoms, predictions in zip(valid_idx, valid_symptoms, batch_predictions):
+                bodies[i] = _prediction_body(current, predictions, current.unrecognized_symptoms(symptoms))
+            response = _json_response(
+                b'{"ket_qua":[' + b','.join(bodies) + b'],"so_luong":' + str(len(bodies)).encode('ascii') + b',"success":true}'
+            )
+        metrics.STAGE_RESPONSE.observe(time.perf_counter() - start)
         
-        return jsonify(response), 200
+        # Log theo thứ tự của "danh_sach", phần tử không hợp lệ là None
+        logged_symptoms = [None] * len(items)
+        logged_predictions = [None] * len(items)
+        for i, symptoms, predictions in zip(valid_idx, valid_symptoms, batch_predictions):
+            logged_symptoms[i] = symptoms
+            logged_predictions[i] = predictions
+        _log_prediction(current, data, logged_symptoms, logged_predictions, started, batch=True)
+        return response, 200
         
     except Exception as e:
         return jsonify({
@@ -105,20 +463,68 @@ def get_symptoms():
     """
     try:
         # Khởi tạo predictor nếu chưa có
-        init_predictor()
+        current = init_predictor()
         
-        if predictor is None:
+        if current is None:
+            return jsonify({
+                'success': False,
+                'error': 'Chưa thể lấy danh sách triệu chứng'
+            }), 503
+        
+        def build():
+            symptoms = current.data_processor.get_all_symptoms()
+            return {
+                'success': True,
+                'trieu_chung': symptoms,
+                'so_luong': len(symptoms)
+            }
+        
+        return _get_static_payload(current, 'symptoms', build).to_response(request)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Lỗi server: {str(e)}'
+        }), 500
+
+
+@prediction_bp.route('/symptoms/search', methods=['GET'])
+def search_symptoms():
+    """
+    API gợi ý triệu chứng theo tiền tố, không phân biệt dấu, có sửa lỗi gõ
+    
+    Query: ?q=sot&limit=10
+    """
+    try:
+        current = init_predictor()
+        
+        if current is None:
             return jsonify({
                 'success': False,
                 'error': 'Chưa thể lấy danh sách triệu chứng'
             }), 503
         
-        symptoms = predictor.data_processor.get_all_symptoms()
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({
+                'success': False,
+                'error': 'Thiếu tham số "q"'
+            }), 400
+        
+        limit = request.args.get('limit', Config.SYMPTOM_SEARCH_LIMIT, type=int)
+        if limit is None or limit < 1 or limit > Config.SYMPTOM_SEARCH_MAX_LIMIT:
+            return jsonify({
+                'success': False,
+                'error': f'"limit" phải từ 1 đến {Config.SYMPTOM_SEARCH_MAX_LIMIT}'
+            }), 400
+        
+        suggestions = _get_symptom_search(current).search(query, limit)
         
         return jsonify({
             'success': True,
-            'trieu_chung': symptoms,
-            'so_luong': len(symptoms)
+            'q': query,
+            'goi_y': suggestions,
+            'so_luong': len(suggestions)
         }), 200
         
     except Exception as e:
@@ -134,29 +540,60 @@ def get_diseases():
     API lấy danh sách tất cả bệnh có trong hệ thống
     """
     try:
-        init_predictor()
+        current = init_predictor()
         
-        if predictor is None or predictor.model is None:
+        if current is None or not current.is_loaded:
             return jsonify({
                 'success': False,
                 'error': 'Model chưa sẵn sàng'
             }), 503
         
-        diseases = predictor.model.classes_.tolist()
+        def build():
+            # Tên bệnh đã giải mã (model_classes là chỉ số lớp của classifier)
+            diseases = [str(disease) for disease in current.labels]
+            
+            # Thêm thông tin chi tiết cho mỗi bệnh
+            diseases_info = []
+            for disease in diseases:
+                info = DiseaseInfo.get_info(disease)
+                diseases_info.append({
+                    'ten_benh': disease,
+                    'mo_ta': info['mo_ta']
+                })
+            
+            return {
+                'success': True,
+                'benh': diseases_info,
+                'so_luong': len(diseases)
+            }
         
-        # Thêm thông tin chi tiết cho mỗi bệnh
-        diseases_info = []
-        for disease in diseases:
-            info = DiseaseInfo.get_info(disease)
-            diseases_info.append({
-                'ten_benh': disease,
-                'mo_ta': info['mo_ta']
-            })
+        return _get_static_payload(current, 'diseases', build).to_response(request)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Lỗi server: {str(e)}'
+        }), 500
+
+
+@prediction_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """
+    API lấy thống kê cache dự đoán (hit/miss/eviction)
+    """
+    try:
+        current = init_predictor()
+        
+        if current is None or current.cache is None:
+            return jsonify({
+                'success': False,
+                'error': 'Cache dự đoán đang tắt'
+            }), 404
         
         return jsonify({
             'success': True,
-            'benh': diseases_info,
-            'so_luong': len(diseases)
+            'model_version': current.model_version,
+            'cache': current.cache.stats()
         }), 200
         
     except Exception as e:
@@ -1,19 +1,42 @@
 from flask import Blueprint, request, jsonify, current_app
 from app.models import DiseasePredictor
+from app.models.training_jobs import TrainingJobManager, JOBS_DIR
+from app.utils import DataProcessor, FeedbackLog
 from app.config import Config
-import time
 
 training_bp = Blueprint('training', __name__)
 
+TRAINING_MODES = ('batch', 'streaming', 'search', 'incremental')
+
+
+def _reload_serving_model():
+    # Import trễ để tránh import vòng giữa các blueprint
+    from app.routes.prediction import reload_predictor
+    reload_predictor()
+
+
+# Job train chạy nền trong process riêng, worker phục vụ dự đoán không bị chặn;
+# trạng thái job lưu trong MODEL_DIR/jobs để mọi worker gunicorn đều tra cứu được
+training_jobs = TrainingJobManager(
+    Config.MODEL_DIR / JOBS_DIR,
+    max_workers=Config.TRAINING_WORKERS,
+    max_history=Config.TRAINING_JOB_HISTORY,
+    on_success=_reload_serving_model
+)
+
 
 @training_bp.route('/train', methods=['POST'])
 def train_model():
     """
     API để train lại model (chỉ admin)
     
+    Job train chạy nền, API trả về job_id ngay lập tức.
+    Theo dõi tiến trình qua GET /api/train/<job_id>.
+    
     Body:
     {
-        "admin_key": "your-secret-key"
+        "admin_key": "your-secret-key",
+        "mode": "batch" | "streaming" | "search" | "incremental"   (tùy chọn, mặc định TRAINING_MODE)
     }
     """
     try:
@@ -33,31 +56,145 @@ def train_model():
                 'error': 'Admin key không hợp lệ'
             }), 403
         
-        # Train model
-        print("Bắt đầu train model...")
-        start_time = time.time()
+        mode = data.get('mode')
+        if mode is not None and mode not in TRAINING_MODES:
+            return jsonify({
+                'success': False,
+                'error': f'"mode" phải là một trong: {", ".join(TRAINING_MODES)}'
+            }), 400
         
-        predictor = DiseasePredictor(config)
-        metrics = predictor.train()
-        predictor.save_model()
+        # Đưa job train vào hàng đợi
+        job_id = training_jobs.submit(mode)
+        print(f"Đã tạo job train {job_id} (mode {mode or config.TRAINING_MODE})")
+        
+        return jsonify({
+            'success': True,
+            'message': 'Đã tạo job train model',
+            'job_id': job_id,
+            'status_url': f'/api/train/{job_id}'
+        }), 202
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Lỗi khi train model: {str(e)}'
+        }), 500
+
+
+def _validate_case(item):
+    """Kiểm tra một ca feedback, trả về (case, error)"""
+    if not isinstance(item, dict):
+        return None, 'Mỗi ca phải là object {"trieu_chung": [...], "benh": "..."}'
+
+    benh = item.get('benh')
+    if not isinstance(benh, str) or not benh.strip():
+        return None, 'Trường "benh" phải là chuỗi và không được rỗng'
+
+    symptoms = item.get('trieu_chung')
+    if not isinstance(symptoms, list) or not symptoms or not all(isinstance(s, str) for s in symptoms):
+        return None, 'Trường "trieu_chung" phải là mảng chuỗi và không được rỗng'
+    if any(';' in s for s in symptoms):
+        return None, 'Triệu chứng không được chứa ký tự ";"'
+
+    normalized = DataProcessor.normalize_symptoms(symptoms)
+    if not normalized:
+        return None, 'Trường "trieu_chung" không có triệu chứng hợp lệ'
+
+    return {'trieu_chung': normalized, 'benh': benh.strip()}, None
+
+
+@training_bp.route('/feedback', methods=['POST'])
+def add_feedback():
+    """
+    API ghi nhận các ca bệnh đã được bác sĩ xác nhận (chỉ admin)
+    
+    Các ca được ghi thêm vào FEEDBACK_LOG_PATH. Model chỉ học các ca này khi
+    chạy /api/train với mode "incremental" (chỉ các ca mới) hoặc train lại toàn bộ.
+    
+    Body:
+    {
+        "admin_key": "your-secret-key",
+        "danh_sach": [
+            {"trieu_chung": ["sốt", "ho", "đau đầu"], "benh": "Cảm cúm"}
+        ]
+    }
+    """
+    try:
+        data = request.get_json()
+        if not data or 'admin_key' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Thiếu admin_key'
+            }), 401
+        
+        if data['admin_key'] != Config.ADMIN_KEY:
+            return jsonify({
+                'success': False,
+                'error': 'Admin key không hợp lệ'
+            }), 403
         
-        training_time = time.time() - start_time
+        items = data.get('danh_sach')
+        if not isinstance(items, list) or len(items) == 0:
+            return jsonify({
+                'success': False,
+                'error': 'Trường "danh_sach" phải là mảng và không được rỗng'
+            }), 400
         
-        # Reload predictor trong prediction route
-        from app.routes.prediction import init_predictor
-        init_predictor()
+        if len(items) > Config.FEEDBACK_MAX_CASES:
+            return jsonify({
+                'success': False,
+                'error': f'Tối đa {Config.FEEDBACK_MAX_CASES} ca mỗi request'
+            }), 400
+        
+        # Cả request bị từ chối nếu có ca không hợp lệ, log không có ca ghi dở
+        cases = []
+        for i, item in enumerate(items):
+            case, error = _validate_case(item)
+            if error:
+                return jsonify({
+                    'success': False,
+                    'error': f'danh_sach[{i}]: {error}'
+                }), 400
+            cases.append(case)
+        
+        offset = FeedbackLog(Config.FEEDBACK_LOG_PATH).append(cases)
         
         return jsonify({
             'success': True,
-            'message': 'Model đã được train thành công',
-            'metrics': metrics,
-            'training_time': round(training_time, 2)
+            'message': 'Đã ghi nhận feedback',
+            'so_luong': len(cases),
+            'feedback_offset': offset
+        }), 201
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Lỗi server: {str(e)}'
+        }), 500
+
+
+@training_bp.route('/train/<job_id>', methods=['GET'])
+def get_training_job(job_id):
+    """
+    API lấy trạng thái job train: queued, running, succeeded, failed
+    """
+    try:
+        job = training_jobs.get(job_id)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': 'Không tìm thấy job train'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'job': job
         }), 200
         
     except Exception as e:
         return jsonify({
             'success': False,
-            'error': f'Lỗi khi train model: {str(e)}'
+            'error': f'Lỗi server: {str(e)}'
         }), 500
 
 
@@ -79,7 +216,7 @@ def get_model_info():
             return jsonify({
                 'success': True,
                 'model_info': model_info,
-                'model_path': str(config.MODEL_PATH)
+                'model_path': str(predictor.model_path)
             }), 200
             
         except FileNotFoundError:
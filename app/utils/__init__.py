@@ -1,3 +1,7 @@
 from .data_processor import DataProcessor, DiseaseInfo
+from .feedback_log import FeedbackLog
+from .prediction_cache import PredictionCache
+from .prediction_logger import PredictionLogger
+from .symptom_search import SymptomSearchIndex
 
-__all__ = ['DataProcessor', 'DiseaseInfo']
\ No newline at end of file
+__all__ = ['DataProcessor', 'DiseaseInfo', 'FeedbackLog', 'PredictionCache', 'PredictionLogger', 'SymptomSearchIndex']
\ No newline at end of file
@@ -1,20 +1,79 @@
-import pandas as pd
+import csv
 import numpy as np
-from sklearn.preprocessing import MultiLabelBinarizer
 from pathlib import Path
 
+from app.utils.dataset_cache import DatasetCache, file_digest
+
 
 class DataProcessor:
     """Class xử lý dữ liệu cho model"""
+
+    # Mỗi biến thể: lấy ngẫu nhiên ratio số triệu chứng (tối thiểu min_subset),
+    # tạo copies bản cho các dòng có ít nhất min_symptoms triệu chứng
+    DEFAULT_AUGMENT_VARIANTS = (
+        {'ratio': 0.8, 'copies': 3, 'min_symptoms': 4},
+        {'ratio': 0.6, 'copies': 2, 'min_symptoms': 5}
+    )
     
-    def __init__(self, dataset_path):
+    def __init__(self, dataset_path, augment_variants=None, min_subset=3, seed=42,
+                 feedback_log=None, cache_dir=None, cache_keep=3):
         self.dataset_path = Path(dataset_path)
-        self.mlb = MultiLabelBinarizer()
+        self.augment_variants = (
+            self.DEFAULT_AUGMENT_VARIANTS if augment_variants is None else augment_variants
+        )
+        self.min_subset = min_subset
+        self.seed = seed
+        # Các ca feedback (FeedbackLog) được thêm vào sau các dòng của dataset
+        self.feedback_log = feedback_log
+        self._feedback = None
+        # Dataset đã parse lưu trong cache_dir (PROCESSED_DATA_DIR), None = luôn parse CSV
+        self.cache = DatasetCache(cache_dir, keep=cache_keep) if cache_dir else None
+        self._digest = None
+        # pandas/sklearn chỉ import khi train, process phục vụ không cần
+        self.mlb = None
 
-    def prepare_data_text_format(self):
-        """Chuẩn hóa dữ liệu thành dạng text để dùng cho mô hình NLP"""
-        df = self.load_data()
+    def feedback_records(self):
+        """
+        (các ca feedback, offset đã đọc tới). Chỉ đọc log một lần cho mỗi
+        DataProcessor để các bước của một lần train thấy cùng một tập ca.
+        """
+        if self._feedback is None:
+            if self.feedback_log is None:
+                self._feedback = ([], 0)
+            else:
+                self._feedback = self.feedback_log.read()
+        return self._feedback
+
+    @property
+    def feedback_offset(self):
+        return self.feedback_records()[1]
+
+    def _feedback_frame(self):
+        import pandas as pd
+        records = self.feedback_records()[0]
+        return pd.DataFrame({
+            "benh": [r["benh"] for r in records],
+            "trieu_chung": [";".join(r["trieu_chung"]) for r in records]
+        })
+
+    def prepare_data_text_format(self, return_groups=False):
+        """
+        Chuẩn hóa dữ liệu thành dạng text để dùng cho mô hình NLP, gồm các dòng
+        gốc và các biến thể tăng cường. return_groups=True trả thêm chỉ số dòng
+        gốc của từng dòng (để chia train/test không bị lẫn biến thể của cùng một dòng).
+        """
+        ids, lengths, vocabulary, labels = self.encoded_dataset()
+        sources, rows = self.augment(ids, lengths)
 
+        X_text = self._to_text(rows, vocabulary)
+        y_labels = labels[sources].tolist()
+
+        if return_groups:
+            return X_text, y_labels, sources
+        return X_text, y_labels
+
+    @staticmethod
+    def _to_text_format(df):
         # Chuẩn hóa triệu chứng
         df["symptoms_list"] = df["trieu_chung"].apply(
             lambda x: [s.strip().lower() for s in x.split(";")]
@@ -28,86 +87,233 @@ class DataProcessor:
 
         return X_text, y_labels
 
+    def _read_chunks(self, chunksize, columns):
+        import pandas as pd
+        try:
+            return pd.read_csv(
+                self.dataset_path, chunksize=chunksize, usecols=columns,
+                dtype=str, keep_default_na=False
+            )
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Không tìm thấy file dataset: {self.dataset_path}")
+
+    def iter_text_chunks(self, chunksize):
+        """Đọc dataset theo từng chunk, mỗi chunk trả về (X_text, y_labels) như prepare_data_text_format"""
+        with self._read_chunks(chunksize, ["benh", "trieu_chung"]) as reader:
+            for df in reader:
+                yield self._to_text_format(df)
+        feedback = self._feedback_frame()
+        if len(feedback):
+            yield self._to_text_format(feedback)
+
+    def scan_labels(self, chunksize):
+        """Danh sách bệnh (đã sắp xếp) trong dataset, chỉ đọc cột "benh" theo từng chunk"""
+        labels = set()
+        with self._read_chunks(chunksize, ["benh"]) as reader:
+            for df in reader:
+                labels.update(df["benh"].tolist())
+        labels.update(r["benh"] for r in self.feedback_records()[0])
+        return sorted(labels)
 
-        
     def load_data(self):
         """Đọc dữ liệu từ CSV"""
+        import pandas as pd
         try:
             df = pd.read_csv(self.dataset_path)
-            return df
         except FileNotFoundError:
             raise FileNotFoundError(f"Không tìm thấy file dataset: {self.dataset_path}")
+
+        feedback = self._feedback_frame()
+        if len(feedback):
+            df = pd.concat([df, feedback], ignore_index=True)
+        return df
     
     def prepare_data(self):
-        """Chuẩn bị dữ liệu cho training"""
-        df = self.load_data()
-        
-        # Tách triệu chứng thành list
-        df['trieu_chung_list'] = df['trieu_chung'].apply(
-            lambda x: [s.strip().lower() for s in x.split(';')]
-        )
-        
-        # Tạo tập hợp tất cả triệu chứng
-        all_symptoms = set()
-        for symptoms in df['trieu_chung_list']:
-            all_symptoms.update(symptoms)
+        """Chuẩn bị dữ liệu cho training: ma trận triệu chứng nhị phân (CSR) gồm cả các biến thể"""
+        from sklearn.preprocessing import MultiLabelBinarizer
+
+        ids, lengths, vocabulary, labels = self.encoded_dataset()
         
-        print(f"Tổng số triệu chứng: {len(all_symptoms)}")
-        print(f"Tổng số bệnh: {len(df)}")
+        print(f"Tổng số triệu chứng: {len(vocabulary)}")
+        print(f"Tổng số bệnh: {len(labels)}")
         
         # Mở rộng dữ liệu bằng cách tạo các tổ hợp triệu chứng
-        expanded_data = []
-        
-        for _, row in df.iterrows():
-            benh = row['benh']
-            symptoms_list = row['trieu_chung_list']
-            
-            # Thêm bản ghi với tất cả triệu chứng
-            expanded_data.append({
-                'benh': benh,
-                'trieu_chung_list': symptoms_list
-            })
-            
-            # Tạo nhiều biến thể để đảm bảo đủ dữ liệu cho stratified split
-            # Tạo tổ hợp 80% triệu chứng
-            if len(symptoms_list) >= 4:
-                n_symptoms_80 = max(3, int(len(symptoms_list) * 0.8))
-                for _ in range(3):
-                    subset = list(np.random.choice(symptoms_list, n_symptoms_80, replace=False))
-                    expanded_data.append({
-                        'benh': benh,
-                        'trieu_chung_list': subset
-                    })
-            
-            # Tạo tổ hợp 60% triệu chứng
-            if len(symptoms_list) >= 5:
-                n_symptoms_60 = max(3, int(len(symptoms_list) * 0.6))
-                for _ in range(2):
-                    subset = list(np.random.choice(symptoms_list, n_symptoms_60, replace=False))
-                    expanded_data.append({
-                        'benh': benh,
-                        'trieu_chung_list': subset
-                    })
+        sources, rows = self.augment(ids, lengths)
         
-        expanded_df = pd.DataFrame(expanded_data)
+        # Cột theo thứ tự vocabulary (đã sắp xếp), giống MultiLabelBinarizer
+        self.mlb = MultiLabelBinarizer(classes=vocabulary).fit([])
+        X = self._to_sparse(rows, len(vocabulary))
+        y = labels[sources]
         
-        # Chuyển đổi triệu chứng thành vector
-        X = self.mlb.fit_transform(expanded_df['trieu_chung_list'])
-        y = expanded_df['benh'].values
-        
-        return X, y, list(all_symptoms)
+        return X, y, vocabulary
+
+    def _dataset_key(self):
+        """Key cache: hash nội dung CSV (tính lại khi kích thước/mtime đổi) + các ca feedback"""
+        stat = self.dataset_path.stat()
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if self._digest is None or self._digest[0] != signature:
+            self._digest = (signature, file_digest(self.dataset_path))
+        feedback = [[r["benh"], r["trieu_chung"]] for r in self.feedback_records()[0]]
+        return self.cache.key('dataset', self._digest[1], feedback)
+
+    def encoded_dataset(self):
+        """
+        Dataset (gồm các ca feedback) đã mã hóa: (ma trận id triệu chứng, số
+        triệu chứng mỗi dòng, vocabulary, nhãn bệnh từng dòng). Lấy từ cache
+        khi hash của CSV và feedback khớp, nếu không thì parse CSV rồi ghi cache.
+        """
+        key = None
+        if self.cache is not None:
+            try:
+                key = self._dataset_key()
+            except FileNotFoundError:
+                raise FileNotFoundError(f"Không tìm thấy file dataset: {self.dataset_path}")
+            cached = self.cache.load('dataset', key)
+            if cached is not None:
+                return self._unpack_dataset(cached)
+
+        df = self.load_data()
+        ids, lengths, vocabulary = self._encode_symptoms(df)
+        labels = df["benh"].to_numpy()
+        if key is not None:
+            self.cache.save('dataset', key, self._pack_dataset(ids, lengths, vocabulary, labels))
+        return ids, lengths, vocabulary, labels
+
+    @staticmethod
+    def _pack_dataset(ids, lengths, vocabulary, labels):
+        # Lưu id phẳng (bỏ ô trống) và nhãn dạng mã + danh sách nhãn cho gọn
+        mask = np.arange(ids.shape[1]) < lengths[:, None]
+        label_names, label_codes = np.unique(labels.astype(str), return_inverse=True)
+        return {
+            'codes': ids[mask].astype(np.int32),
+            'lengths': lengths.astype(np.int32),
+            'vocabulary': np.array(vocabulary, dtype=str),
+            'label_codes': label_codes.astype(np.int32),
+            'label_names': label_names
+        }
+
+    @staticmethod
+    def _unpack_dataset(cached):
+        lengths = cached['lengths'].astype(np.int64)
+        ids = np.full((len(lengths), max(1, lengths.max(initial=0))), -1, dtype=np.int64)
+        ids[np.arange(ids.shape[1]) < lengths[:, None]] = cached['codes']
+        labels = cached['label_names'].astype(object)[cached['label_codes']]
+        return ids, lengths, cached['vocabulary'].tolist(), labels
+
+    @staticmethod
+    def _encode_symptoms(df):
+        """
+        Mã hóa triệu chứng (đã strip + lower) thành id theo vocabulary sắp xếp.
+        Trả về (ma trận id (n_dòng, số triệu chứng tối đa) với -1 là ô trống,
+        số triệu chứng mỗi dòng, vocabulary).
+        """
+        import pandas as pd
+
+        exploded = df["trieu_chung"].reset_index(drop=True).str.split(";").explode()
+        codes, vocabulary = pd.factorize(exploded.str.strip().str.lower(), sort=True)
+
+        row_of = exploded.index.to_numpy()
+        lengths = np.bincount(row_of, minlength=len(df))
+        starts = np.cumsum(lengths) - lengths
+        cols = np.arange(len(codes)) - starts[row_of]
+
+        ids = np.full((len(df), max(1, lengths.max(initial=0))), -1, dtype=np.int64)
+        ids[row_of, cols] = codes
+        return ids, lengths, vocabulary.tolist()
+
+    def augment(self, ids, lengths):
+        """
+        Tạo các biến thể tập con triệu chứng cho cả dataset cùng lúc bằng
+        numpy.random.Generator (seed cố định nên chạy lại cho cùng kết quả).
+
+        Với mỗi biến thể: gán khóa ngẫu nhiên cho từng ô, các ô trống nhận khóa
+        lớn nhất, argsort theo dòng rồi giữ k ô có khóa nhỏ nhất (giữ nguyên thứ
+        tự triệu chứng ban đầu). Trả về (chỉ số dòng gốc, ma trận id) gồm các
+        dòng gốc trước rồi đến các biến thể.
+        """
+        rng = np.random.default_rng(self.seed)
+        n_rows, width = ids.shape
+        columns = np.arange(width)
+
+        sources = [np.arange(n_rows)]
+        blocks = [ids]
+        for variant in self.augment_variants:
+            eligible = np.flatnonzero(lengths >= variant['min_symptoms'])
+            rows = np.repeat(eligible, variant['copies'])
+            if rows.size == 0:
+                continue
+
+            row_lengths = lengths[rows]
+            k = np.maximum(self.min_subset, (row_lengths * variant['ratio']).astype(np.int64))
+            k = np.minimum(k, row_lengths)
+
+            keys = rng.random((rows.size, width))
+            keys[columns >= row_lengths[:, None]] = 2.0
+            order = np.argsort(keys, axis=1)
+
+            # Vị trí không được chọn đẩy về cuối (width), sắp lại để giữ thứ tự gốc
+            order[columns >= k[:, None]] = width
+            order.sort(axis=1)
+            padded = np.hstack([ids[rows], np.full((rows.size, 1), -1, dtype=ids.dtype)])
+            blocks.append(np.take_along_axis(padded, order, axis=1))
+            sources.append(rows)
+
+        return np.concatenate(sources), np.vstack(blocks)
+
+    @staticmethod
+    def _to_sparse(rows, n_features):
+        """Ma trận id -> ma trận nhị phân CSR (n_dòng, n_features)"""
+        import scipy.sparse as sp
+
+        mask = rows >= 0
+        indptr = np.concatenate([[0], np.cumsum(mask.sum(axis=1))])
+        indices = rows[mask]
+        X = sp.csr_matrix(
+            (np.ones(len(indices), dtype=np.int64), indices, indptr),
+            shape=(rows.shape[0], n_features)
+        )
+        X.sum_duplicates()
+        X.data[:] = 1
+        return X
+
+    @staticmethod
+    def _to_text(rows, vocabulary):
+        """Ma trận id -> các chuỗi triệu chứng nối bằng " ; " như _to_text_format"""
+        return [
+            " ; ".join([vocabulary[i] for i in row if i >= 0])
+            for row in rows.tolist()
+        ]
     
     def get_all_symptoms(self):
-        """Lấy danh sách tất cả triệu chứng"""
-        df = self.load_data()
-        all_symptoms = set()
+        """Lấy danh sách tất cả triệu chứng (từ cache nếu có, nếu không đọc CSV bằng module csv, không cần pandas)"""
+        if self.cache is not None:
+            try:
+                cached = self.cache.load('dataset', self._dataset_key(), fields=['vocabulary'])
+            except FileNotFoundError:
+                cached = None
+            if cached is not None:
+                return cached['vocabulary'].tolist()
+
+        try:
+            with open(self.dataset_path, encoding='utf-8', newline='') as f:
+                rows = list(csv.DictReader(f))
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Không tìm thấy file dataset: {self.dataset_path}")
         
-        for symptoms_str in df['trieu_chung']:
+        all_symptoms = set()
+        for symptoms_str in (row['trieu_chung'] for row in rows):
             symptoms = [s.strip().lower() for s in symptoms_str.split(';')]
             all_symptoms.update(symptoms)
+        for record in self.feedback_records()[0]:
+            all_symptoms.update(s.strip().lower() for s in record['trieu_chung'])
         
         return sorted(list(all_symptoms))
     
+    @staticmethod
+    def normalize_symptoms(symptoms_list):
+        """Chuẩn hóa bộ triệu chứng: bỏ khoảng trắng, chữ thường, bỏ trùng, sắp xếp"""
+        return sorted({s.strip().lower() for s in symptoms_list if s.strip()})
+    
     def transform_symptoms(self, symptoms_list):
         """Chuyển đổi danh sách triệu chứng thành vector"""
         # Chuẩn hóa triệu chứng
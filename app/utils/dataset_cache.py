@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+# Tăng khi đổi cách parse/chuẩn hóa dataset để các file cache cũ không còn khớp
+CACHE_FORMAT_VERSION = 1
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 nội dung file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DatasetCache:
+    """
+    Cache dataset đã parse trong PROCESSED_DATA_DIR, mỗi mục là một file .npz
+    (mảng numpy, không pickle) tên <name>-<key>.npz.
+
+    Key là hash của nội dung dữ liệu gốc và cài đặt tiền xử lý (xem key()),
+    nên dataset đổi thì key đổi và mục cũ không bao giờ được đọc nhầm. File
+    được ghi vào file tạm rồi os.replace, chỉ giữ lại keep mục gần nhất mỗi name.
+    """
+
+    def __init__(self, cache_dir, keep=3):
+        self.cache_dir = Path(cache_dir)
+        self.keep = keep
+
+    @staticmethod
+    def key(*parts):
+        """Hash của các thành phần (chuỗi, số, list, dict serialize được bằng JSON)"""
+        payload = json.dumps([CACHE_FORMAT_VERSION, *parts], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def path(self, name, key):
+        return self.cache_dir / f'{name}-{key}.npz'
+
+    def load(self, name, key, fields=None):
+        """Các mảng đã lưu (dict, chỉ đọc fields nếu có), None nếu chưa có hoặc file hỏng"""
+        path = self.path(name, key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return {k: data[k] for k in (fields or data.files)}
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"WARNING: Bỏ qua file cache hỏng {path}: {e}")
+            return None
+
+    def save(self, name, key, arrays):
+        """Ghi các mảng, lỗi ghi (thư mục chỉ đọc...) chỉ cảnh báo vì cache không bắt buộc"""
+        path = self.path(name, key)
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"WARNING: Không ghi được cache dataset {path}: {e}")
+            tmp.unlink(missing_ok=True)
+            return
+        self._prune(name, path)
+
+    def _prune(self, name, latest):
+        # Process khác có thể đang xóa cùng lúc, file biến mất giữa chừng thì bỏ qua
+        entries = []
+        for p in self.cache_dir.glob(f'{name}-*.npz'):
+            try:
+                if p != latest:
+                    entries.append((p.stat().st_mtime, p))
+            except FileNotFoundError:
+                pass
+        entries.sort(reverse=True)
+        for _, old in entries[max(0, self.keep - 1):]:
+            old.unlink(missing_ok=True)
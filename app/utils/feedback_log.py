@@ -0,0 +1,82 @@
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có flock, O_APPEND vẫn ghi cả dòng một lần
+    fcntl = None
+
+
+class FeedbackLog:
+    """
+    Log các ca bệnh đã được bác sĩ xác nhận, dạng JSONL chỉ ghi thêm.
+
+    Mỗi dòng là {"id", "trieu_chung", "benh", "created_at"}. Mỗi lần ghi là
+    một write() vào file mở ở chế độ append (khóa flock nếu có) rồi fsync,
+    nên nhiều worker ghi cùng lúc không chèn lẫn dòng và ca đã nhận không
+    bị mất khi process chết. Vị trí đọc là offset byte: model lưu offset
+    đã dùng (feedback_offset) để lần cập nhật sau chỉ đọc các ca mới.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def size(self):
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def append(self, cases):
+        """Ghi các ca {"trieu_chung": [...], "benh": "..."}, trả về offset cuối log sau khi ghi"""
+        created_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        lines = []
+        for case in cases:
+            record = {
+                'id': uuid.uuid4().hex,
+                'trieu_chung': list(case['trieu_chung']),
+                'benh': case['benh'],
+                'created_at': created_at
+            }
+            lines.append(json.dumps(record, ensure_ascii=False) + '\n')
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'ab') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                f.write(''.join(lines).encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+                return f.tell()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def read(self, start=0):
+        """Đọc các ca từ offset start, trả về (danh sách ca, offset ngay sau dòng đầy đủ cuối cùng)"""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if start > f.tell():
+                    print(f"WARNING: Feedback log {self.path} ngắn hơn offset {start}, đọc lại từ đầu")
+                    start = 0
+                f.seek(start)
+                data = f.read()
+        except FileNotFoundError:
+            return [], start
+
+        # Bỏ dòng cuối chưa ghi xong (chưa có '\n'), lần đọc sau sẽ lấy
+        complete = data[:data.rfind(b'\n') + 1]
+        records = []
+        for line in complete.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                print(f"WARNING: Bỏ qua dòng feedback không hợp lệ: {line[:100]!r}")
+        return records, start + len(complete)
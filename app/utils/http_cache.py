@@ -0,0 +1,47 @@
+import gzip
+import hashlib
+
+from flask import Response, current_app
+
+
+class CachedPayload:
+    """
+    Response JSON được serialize sẵn một lần, kèm ETag mạnh và bản gzip.
+
+    Dùng cho các API trả dữ liệu tĩnh theo phiên bản model
+    (/api/symptoms, /api/diseases).
+    """
+
+    def __init__(self, body, gzip_min_size=1024):
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.gzip_body = None
+        self.gzip_etag = self.etag + '-gz'
+        if gzip_min_size is not None and len(body) >= gzip_min_size:
+            self.gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+
+    @classmethod
+    def from_json(cls, obj, gzip_min_size=1024):
+        """Serialize giống hệt jsonify của app hiện tại"""
+        body = current_app.json.response(obj).get_data()
+        return cls(body, gzip_min_size)
+
+    def to_response(self, request):
+        """Trả 304 nếu client đã có bản mới nhất, ngược lại trả body (gzip nếu được)"""
+        use_gzip = self.gzip_body is not None and request.accept_encodings['gzip'] > 0
+        etag = self.gzip_etag if use_gzip else self.etag
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(
+                self.gzip_body if use_gzip else self.body,
+                mimetype='application/json'
+            )
+            if use_gzip:
+                response.headers['Content-Encoding'] = 'gzip'
+
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        response.vary.add('Accept-Encoding')
+        return response
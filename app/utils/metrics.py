@@ -0,0 +1,378 @@
+import atexit
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+from app.utils import request_timing
+
+# Bucket mặc định (giây) cho độ trễ request và từng bước dự đoán
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bucket (giây) cho các việc chậm: load model, train
+SLOW_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+# Bucket cho số request trong một micro-batch
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{_escape(v)}"' for n, v in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramChild:
+    """Số lần rơi vào từng bucket (không cộng dồn) trong list cấp phát sẵn, cộng dồn khi xuất"""
+
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # _children: nhãn (chuỗi) -> child; _lookup: giá trị đã truyền vào labels() -> child
+        self._children = {}
+        self._lookup = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Child cho bộ nhãn, nên giữ lại child ở nơi gọi thường xuyên thay vì gọi labels() mỗi lần"""
+        child = self._lookup.get(values)
+        if child is None:
+            key = tuple(str(v) for v in values)
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} cần nhãn {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+                self._lookup[values] = child
+        return child
+
+    def clear(self):
+        with self._lock:
+            self._children = {}
+            self._lookup = {}
+
+    def snapshot(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def snapshot(self):
+        return [[list(k), c.value] for k, c in list(self._children.items())]
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def snapshot(self):
+        return [[list(k), c.value] for k, c in list(self._children.items())]
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def snapshot(self):
+        return [[list(k), {'counts': list(c.counts), 'sum': c.sum}] for k, c in list(self._children.items())]
+
+
+class MetricsRegistry:
+    """
+    Tập các metric của process, xuất theo định dạng text của Prometheus.
+
+    Khi có multiprocess_dir (gunicorn nhiều worker), mỗi process định kỳ
+    ghi snapshot của mình ra <dir>/<pid>.json; /metrics cộng counter và
+    histogram của tất cả các file (kể cả worker đã thoát, để counter không
+    giảm) với số liệu đang có trong process, gauge thì lấy từ các process
+    còn sống và thêm nhãn pid.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self.multiprocess_dir = None
+        self.sync_interval = 5.0
+        self._sync_pid = None
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def configure(self, multiprocess_dir=None, sync_interval=5.0):
+        self.multiprocess_dir = Path(multiprocess_dir) if multiprocess_dir else None
+        self.sync_interval = sync_interval
+
+    def snapshot(self):
+        return {m.name: m.snapshot() for m in self._metrics}
+
+    # --- Nhiều process ---
+
+    def ensure_sync(self):
+        """Chạy thread ghi snapshot trong process hiện tại (mỗi worker sau khi fork một thread)"""
+        if self.multiprocess_dir is None or self._sync_pid == os.getpid():
+            return
+        self._sync_pid = os.getpid()
+        self.multiprocess_dir.mkdir(parents=True, exist_ok=True)
+        threading.Thread(target=self._sync_loop, name='metrics-sync', daemon=True).start()
+        atexit.register(self.write_snapshot)
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(self.sync_interval)
+            try:
+                self.write_snapshot()
+            except OSError as e:
+                print(f"WARNING: Không ghi được snapshot metrics: {e}")
+
+    def write_snapshot(self):
+        if self.multiprocess_dir is None or self._sync_pid != os.getpid():
+            return
+        path = self.multiprocess_dir / f'{os.getpid()}.json'
+        tmp = path.with_name(f'.{path.name}.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def _other_snapshots(self):
+        """(pid, còn sống, snapshot) của các process khác trong multiprocess_dir"""
+        if self.multiprocess_dir is None or not self.multiprocess_dir.is_dir():
+            return []
+        result = []
+        for path in self.multiprocess_dir.glob('*.json'):
+            try:
+                pid = int(path.stem)
+            except ValueError:
+                continue
+            if pid == os.getpid():
+                continue
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            result.append((pid, _pid_alive(pid), data))
+        return result
+
+    # --- Xuất ---
+
+    def render(self):
+        """Text exposition format của Prometheus"""
+        local = self.snapshot()
+        others = self._other_snapshots()
+        multiprocess = self.multiprocess_dir is not None
+
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+
+            if metric.type_name == 'gauge':
+                sources = [(os.getpid(), local[metric.name])]
+                sources += [(pid, data.get(metric.name, [])) for pid, alive, data in others if alive]
+                for pid, samples in sources:
+                    extra = (('pid', pid),) if multiprocess else ()
+                    for labels, value in samples:
+                        lines.append(f'{metric.name}{_format_labels(metric.labelnames, labels, extra)} {_format_value(value)}')
+                continue
+
+            merged = {}
+            for samples in [local[metric.name]] + [data.get(metric.name, []) for _, _, data in others]:
+                for labels, value in samples:
+                    key = tuple(labels)
+                    if metric.type_name == 'counter':
+                        merged[key] = merged.get(key, 0.0) + value
+                    else:
+                        total = merged.setdefault(key, {'counts': [0] * (len(metric.bounds) + 1), 'sum': 0.0})
+                        if len(value['counts']) != len(total['counts']):
+                            continue
+                        total['counts'] = [a + b for a, b in zip(total['counts'], value['counts'])]
+                        total['sum'] += value['sum']
+
+            for key in sorted(merged):
+                value = merged[key]
+                if metric.type_name == 'counter':
+                    lines.append(f'{metric.name}_total{_format_labels(metric.labelnames, key)} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.bounds + (math.inf,), value['counts']):
+                    cumulative += count
+                    labels = _format_labels(metric.labelnames, key, (('le', _format_value(bound)),))
+                    lines.append(f'{metric.name}_bucket{labels} {cumulative}')
+                labels = _format_labels(metric.labelnames, key)
+                lines.append(f'{metric.name}_sum{labels} {_format_value(value["sum"])}')
+                lines.append(f'{metric.name}_count{labels} {cumulative}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Registry dùng chung của service
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'disease_api_http_requests', 'Số request theo endpoint, method và mã HTTP',
+    ('endpoint', 'method', 'status')
+)
+HTTP_ERRORS = REGISTRY.counter(
+    'disease_api_http_errors', 'Số request lỗi server (HTTP 5xx hoặc exception)',
+    ('endpoint', 'method')
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    'disease_api_http_request_duration_seconds', 'Thời gian xử lý request theo endpoint',
+    ('endpoint', 'method')
+)
+PREDICTION_STAGE_LATENCY = REGISTRY.histogram(
+    'disease_api_prediction_stage_duration_seconds',
+    'Thời gian từng bước dự đoán: init, parse, validation, queue_wait, vectorize, predict_proba, rank, response',
+    ('stage',)
+)
+MODEL_LOAD_SECONDS = REGISTRY.histogram(
+    'disease_api_model_load_duration_seconds', 'Thời gian load model theo định dạng artifact',
+    ('format',), buckets=SLOW_BUCKETS
+)
+MODEL_INFO = REGISTRY.gauge(
+    'disease_api_model_info', 'Phiên bản model đang phục vụ (giá trị luôn là 1)',
+    ('version', 'format')
+)
+TRAINING_DURATION = REGISTRY.histogram(
+    'disease_api_training_duration_seconds', 'Thời gian train của các job train thành công',
+    ('mode',), buckets=SLOW_BUCKETS
+)
+TRAINING_JOBS = REGISTRY.counter(
+    'disease_api_training_jobs', 'Số job train đã kết thúc theo mode và trạng thái',
+    ('mode', 'state')
+)
+MICRO_BATCH_SIZE = REGISTRY.histogram(
+    'disease_api_micro_batch_size', 'Số request /api/predict được tính chung trong một micro-batch',
+    buckets=BATCH_SIZE_BUCKETS
+)
+PREDICTION_LOG_RECORDS = REGISTRY.counter(
+    'disease_api_prediction_log_records', 'Số record log dự đoán theo trạng thái: written, dropped (hàng đợi đầy), failed (lỗi ghi file)',
+    ('state',)
+)
+PREDICTION_LOG_WRITTEN = PREDICTION_LOG_RECORDS.labels('written')
+PREDICTION_LOG_DROPPED = PREDICTION_LOG_RECORDS.labels('dropped')
+PREDICTION_LOG_FAILED = PREDICTION_LOG_RECORDS.labels('failed')
+
+
+class _Stage:
+    """Một bước dự đoán: ghi vào histogram và vào Server-Timing của request (nếu đang bật đo)"""
+
+    __slots__ = ('name', '_child')
+
+    def __init__(self, name):
+        self.name = name
+        # Child tạo sẵn để không phải tra nhãn mỗi request
+        self._child = PREDICTION_STAGE_LATENCY.labels(name)
+
+    def observe(self, seconds):
+        self._child.observe(seconds)
+        request_timing.record(self.name, seconds)
+
+
+STAGE_INIT = _Stage('init')
+STAGE_PARSE = _Stage('parse')
+STAGE_VALIDATION = _Stage('validation')
+STAGE_QUEUE_WAIT = _Stage('queue_wait')
+STAGE_VECTORIZE = _Stage('vectorize')
+STAGE_PREDICT_PROBA = _Stage('predict_proba')
+STAGE_RANK = _Stage('rank')
+STAGE_RESPONSE = _Stage('response')
@@ -0,0 +1,222 @@
+import atexit
+import json
+import os
+import queue
+import re
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có flock, mỗi process chỉ xóa file của chính mình
+    fcntl = None
+
+from app.utils import metrics
+
+# Đặt vào hàng đợi để thread ghi xử lý ngay phần đang gom (xem flush())
+_FLUSH = object()
+# predictions-<ngày>-<giờ>-<pid>[-<số thứ tự>].jsonl
+_LOG_FILE = re.compile(r'predictions-\d{8}-\d{6}-(\d+)(?:-\d+)?\.jsonl')
+
+
+class PredictionLogger:
+    """
+    Ghi log audit các lần dự đoán ra file JSONL mà không chặn request: log() chỉ
+    đưa record (dict) vào hàng đợi giới hạn max_queue, thread nền gom tối đa
+    batch_size record hoặc chờ flush_interval giây rồi serialize và ghi một lần.
+
+    Mỗi process ghi file riêng <log_dir>/predictions-<thời gian>-<pid>.jsonl,
+    sang file mới khi vượt max_bytes và chỉ giữ backup_count file gần nhất.
+    Process đang ghi giữ khóa flock chia sẻ trên file của mình nên không
+    process nào xóa file đang được ghi (không có flock: chỉ xóa file của
+    chính process).
+    Record có method, path, body, timestamp như log của benchmarks.replay
+    nên phát lại được trực tiếp.
+
+    Hàng đợi đầy (đĩa chậm hơn lưu lượng): policy 'drop' bỏ record ngay,
+    'block' chờ tối đa block_timeout giây rồi mới bỏ. Record bị bỏ được đếm
+    trong stats() và metric disease_api_prediction_log_records.
+    """
+
+    POLICIES = ('drop', 'block')
+
+    def __init__(self, log_dir, max_queue=10000, policy='drop', batch_size=500,
+                 flush_interval=1.0, max_bytes=50 * 1024 * 1024, backup_count=20, block_timeout=1.0):
+        if policy not in self.POLICIES:
+            raise ValueError(f"policy phải là một trong {self.POLICIES}")
+        self.log_dir = Path(log_dir)
+        self.max_queue = max_queue
+        self.policy = policy
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.block_timeout = block_timeout
+
+        self._pid = None
+        self._queue = None
+        self._start_lock = threading.Lock()
+        self._count_lock = threading.Lock()
+        self._file = None
+        self._path = None
+        self._size = 0
+        self._failing = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def _ensure_writer(self):
+        """Tạo hàng đợi và thread ghi trong process hiện tại (mỗi worker sau khi fork một thread)"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.max_queue)
+            self._file = None
+            self._path = None
+            threading.Thread(target=self._run, args=(self._queue,), name='prediction-log', daemon=True).start()
+            atexit.register(self.flush)
+            self._pid = os.getpid()
+
+    def log(self, record):
+        """Đưa record vào hàng đợi, trả về False nếu record bị bỏ vì hàng đợi đầy"""
+        self._ensure_writer()
+        try:
+            if self.policy == 'block':
+                self._queue.put(record, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            with self._count_lock:
+                self.dropped += 1
+            metrics.PREDICTION_LOG_DROPPED.inc()
+            return False
+        return True
+
+    def flush(self, timeout=5.0):
+        """Chờ ghi xong các record đang đợi (khi process thoát), False nếu hết timeout"""
+        if self._pid != os.getpid():
+            return True
+        q = self._queue
+        try:
+            q.put(_FLUSH, timeout=timeout)
+        except queue.Full:
+            return False
+        deadline = time.monotonic() + timeout
+        with q.all_tasks_done:
+            while q.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                q.all_tasks_done.wait(remaining)
+        return True
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize() if self._pid == os.getpid() else 0,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'file': str(self._path) if self._path else None
+        }
+
+    # --- Thread ghi ---
+
+    def _run(self, q):
+        while True:
+            batch = []
+            flush_requested = False
+            item = q.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _FLUSH:
+                    flush_requested = True
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(batch)
+            # _FLUSH cũng là một task để flush() chờ đến khi phần đã gom được ghi xong
+            for _ in range(len(batch) + flush_requested):
+                q.task_done()
+
+    def _write(self, batch):
+        data = ''.join(json.dumps(r, ensure_ascii=False, default=str) + '\n' for r in batch).encode('utf-8')
+        try:
+            if self._file is None or (self._size > 0 and self._size + len(data) > self.max_bytes):
+                self._open_new_file()
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+        except OSError as e:
+            if not self._failing:
+                print(f"WARNING: Không ghi được log dự đoán vào {self.log_dir}: {e}")
+            self._failing = True
+            self.failed += len(batch)
+            metrics.PREDICTION_LOG_FAILED.inc(len(batch))
+            self._close_file()
+            return
+        self._failing = False
+        self.written += len(batch)
+        metrics.PREDICTION_LOG_WRITTEN.inc(len(batch))
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+        self._file = None
+
+    def _open_new_file(self):
+        self._close_file()
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"predictions-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        path = self.log_dir / f'{stem}.jsonl'
+        seq = 1
+        while path.exists():
+            path = self.log_dir / f'{stem}-{seq}.jsonl'
+            seq += 1
+        self._file = open(path, 'ab')
+        if fcntl is not None:
+            # Giữ đến khi đóng file: báo cho các worker khác là file đang được ghi
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_SH)
+        self._path = path
+        self._size = 0
+        self._prune()
+
+    def _prune(self):
+        # Các worker cùng xóa file cũ: file biến mất giữa chừng thì bỏ qua
+        entries = []
+        for p in self.log_dir.glob('predictions-*.jsonl'):
+            try:
+                if p != self._path:
+                    entries.append((p.stat().st_mtime, p))
+            except FileNotFoundError:
+                pass
+        entries.sort(reverse=True)
+        for _, old in entries[max(0, self.backup_count - 1):]:
+            if self._can_delete(old):
+                old.unlink(missing_ok=True)
+
+    @staticmethod
+    def _can_delete(path):
+        """File không còn process nào ghi: lấy được khóa độc quyền (không có flock: file của process này)"""
+        if fcntl is None:
+            match = _LOG_FILE.fullmatch(path.name)
+            return match is not None and int(match.group(1)) == os.getpid()
+        try:
+            with open(path, 'rb') as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+        except (BlockingIOError, FileNotFoundError):
+            return False
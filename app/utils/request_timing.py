@@ -0,0 +1,113 @@
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+# Danh sách (bước, giây) của request hiện tại, None khi không đo (mặc định)
+_timings = ContextVar('request_timings', default=None)
+
+
+def start():
+    """Bắt đầu ghi thời gian các bước cho request hiện tại, trả về token để stop()"""
+    return _timings.set([])
+
+
+def stop(token):
+    """Kết thúc ghi, trả về danh sách (bước, giây)"""
+    timings = _timings.get()
+    _timings.reset(token)
+    return timings or []
+
+
+def record(stage, seconds):
+    """Ghi thời gian một bước nếu request đang bật đo, không bật thì chỉ tốn một lần ContextVar.get()"""
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+def server_timing_header(timings):
+    """Giá trị header Server-Timing (ms), bước lặp lại (ví dụ trong batch) được cộng dồn"""
+    totals = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ', '.join(f'{stage};dur={seconds * 1000:.3f}' for stage, seconds in totals.items())
+
+
+class RequestProfiler:
+    """
+    Chạy cProfile cho một phần sample_rate request, gộp số liệu theo endpoint
+    và ghi ra <output_dir>/<endpoint>-<pid>.prof (định dạng pstats, xem bằng
+    python -m pstats hoặc snakeviz) mỗi dump_interval giây.
+
+    Mỗi lúc chỉ profile một request trong process (cProfile chỉ cho một
+    profiler hoạt động từ Python 3.12), request khác đến cùng lúc thì bỏ qua.
+    """
+
+    def __init__(self, sample_rate, output_dir, dump_interval=60):
+        self.sample_rate = sample_rate
+        self.output_dir = Path(output_dir)
+        self.dump_interval = dump_interval
+        self._active = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+        self._dirty = set()
+        self._last_dump = time.monotonic()
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    def maybe_start(self):
+        """Profile request hiện tại với xác suất sample_rate, trả về profiler hoặc None"""
+        if random.random() >= self.sample_rate or not self._active.acquire(blocking=False):
+            return None
+        import cProfile
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Công cụ profile khác đang chạy
+            self._active.release()
+            return None
+        return profile
+
+    def finish(self, profile, endpoint):
+        """Dừng profile, gộp vào số liệu của endpoint và ghi file nếu đến lúc"""
+        import pstats
+
+        profile.disable()
+        self._active.release()
+
+        with self._stats_lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                self._stats[endpoint] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            self._dirty.add(endpoint)
+
+            if time.monotonic() - self._last_dump >= self.dump_interval:
+                self._dump_locked()
+
+    def dump(self):
+        with self._stats_lock:
+            self._dump_locked()
+
+    def _dump_locked(self):
+        self._last_dump = time.monotonic()
+        if not self._dirty:
+            return
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            for endpoint in self._dirty:
+                path = self.output_dir / f'{endpoint}-{os.getpid()}.prof'
+                tmp = path.with_name(f'.{path.name}.tmp')
+                self._stats[endpoint].dump_stats(tmp)
+                os.replace(tmp, path)
+        except OSError as e:
+            print(f"WARNING: Không ghi được profile: {e}")
+            return
+        self._dirty.clear()
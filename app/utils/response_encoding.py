@@ -0,0 +1,90 @@
+import json
+
+from app.utils.data_processor import DiseaseInfo
+
+ENCODERS = ('json', 'orjson')
+
+
+def get_dumps(name='json'):
+    """
+    Hàm obj -> bytes theo thứ tự key đã sắp xếp, không khoảng trắng.
+    'json': thư viện chuẩn, giống hệt jsonify của Flask khi không debug (ensure_ascii).
+    'orjson': nhanh hơn, chuỗi tiếng Việt giữ nguyên UTF-8 thay vì \\uXXXX; chưa cài thì dùng 'json'.
+    """
+    if name not in ENCODERS:
+        raise ValueError(f"JSON encoder phải là một trong {ENCODERS}")
+    if name == 'orjson':
+        try:
+            import orjson
+        except ImportError:
+            print("WARNING: Chưa cài orjson, dùng json của thư viện chuẩn")
+        else:
+            option = orjson.OPT_SORT_KEYS
+
+            def dumps_orjson(obj):
+                return orjson.dumps(obj, option=option)
+            return dumps_orjson
+
+    encoder = json.JSONEncoder(ensure_ascii=True, sort_keys=True, separators=(',', ':'))
+
+    def dumps_json(obj):
+        return encoder.encode(obj).encode('ascii')
+    return dumps_json
+
+
+def _encode_float(value):
+    # json và orjson đều ghi float bằng biểu diễn ngắn nhất (repr)
+    return repr(float(value)).encode('ascii')
+
+
+class PredictionResponseEncoder:
+    """
+    Serialize response dự đoán từ các đoạn JSON tính sẵn cho từng bệnh.
+
+    Mô tả và khuyến cáo của mỗi bệnh không đổi theo phiên bản model, nên phần
+    "du_doan" (trừ do_tin_cay) và phần tử của "cac_benh_khac" được serialize
+    một lần khi load model; mỗi request chỉ còn ghi độ tin cậy và các triệu
+    chứng không nhận diện. Với encoder 'json', kết quả giống từng byte với
+    jsonify(_build_prediction_response(...)) (key sắp xếp, không khoảng trắng).
+    """
+
+    def __init__(self, disease_names, encoder='json'):
+        self.dumps = get_dumps(encoder)
+        # benh -> (phần trước do_tin_cay, phần sau) của "du_doan"
+        self._main = {}
+        # benh -> phần trước do_tin_cay của một phần tử "cac_benh_khac"
+        self._other = {}
+        for name in disease_names:
+            self._add(name)
+
+    def _add(self, name):
+        info = DiseaseInfo.get_info(name)
+        encoded_name = self.dumps(name)
+        self._main[name] = (
+            b'"du_doan":{"benh":' + encoded_name + b',"do_tin_cay":',
+            b',"khuyen_cao":' + self.dumps(info['khuyen_cao']) + b',"mo_ta":' + self.dumps(info['mo_ta']) + b'}'
+        )
+        self._other[name] = b'{"benh":' + encoded_name + b',"do_tin_cay":'
+
+    def encode_prediction(self, predictions, unknown_symptoms=None):
+        """Body của một kết quả dự đoán có ít nhất một bệnh (success = true)"""
+        main = predictions[0]
+        if main['benh'] not in self._main:
+            self._add(main['benh'])
+        prefix, suffix = self._main[main['benh']]
+
+        parts = []
+        if len(predictions) > 1:
+            others = []
+            for p in predictions[1:]:
+                fragment = self._other.get(p['benh'])
+                if fragment is None:
+                    self._add(p['benh'])
+                    fragment = self._other[p['benh']]
+                others.append(fragment + _encode_float(p['do_tin_cay']) + b'}')
+            parts.append(b'"cac_benh_khac":[' + b','.join(others) + b']')
+        parts.append(prefix + _encode_float(main['do_tin_cay']) + suffix)
+        parts.append(b'"success":true')
+        if unknown_symptoms:
+            parts.append(b'"trieu_chung_khong_nhan_dien":' + self.dumps(unknown_symptoms))
+        return b'{' + b','.join(parts) + b'}'
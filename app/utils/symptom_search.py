@@ -0,0 +1,152 @@
+import bisect
+import re
+import unicodedata
+from itertools import combinations
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fold_diacritics(text):
+    """Bỏ dấu tiếng Việt và chuẩn hóa khoảng trắng: "Sốt cao" -> "sot cao" """
+    text = text.lower().replace('đ', 'd')
+    text = ''.join(
+        c for c in unicodedata.normalize('NFD', text)
+        if not unicodedata.combining(c)
+    )
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def _deletes(text, max_edits):
+    """Tất cả chuỗi thu được khi xóa tối đa max_edits ký tự (kể cả chính nó)"""
+    variants = {text}
+    for n in range(1, min(max_edits, len(text)) + 1):
+        for positions in combinations(range(len(text)), n):
+            variants.add(''.join(c for i, c in enumerate(text) if i not in positions))
+    return variants
+
+
+def prefix_edit_distance(query, text, max_edits):
+    """
+    Khoảng cách Levenshtein nhỏ nhất giữa query và một tiền tố của text.
+    Chỉ tính dải |i - j| <= max_edits của bảng quy hoạch động, dừng sớm và
+    trả về max_edits + 1 khi vượt ngưỡng.
+    """
+    # Tiền tố dài hơn len(query) + max_edits chắc chắn vượt ngưỡng
+    text = text[:len(query) + max_edits]
+    limit = max_edits + 1
+    previous = [min(j, limit) for j in range(len(text) + 1)]
+    for i, qc in enumerate(query, 1):
+        current = [limit] * (len(text) + 1)
+        current[0] = min(i, limit)
+        row_min = current[0]
+        for j in range(max(1, i - max_edits), min(len(text), i + max_edits) + 1):
+            value = previous[j - 1] + (qc != text[j - 1])
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_edits:
+            return limit
+        previous = current
+    return min(min(previous), limit)
+
+
+class SymptomSearchIndex:
+    """
+    Index gợi ý triệu chứng theo tiền tố, không phân biệt dấu, có sửa lỗi gõ.
+
+    - Tiền tố: mảng khóa đã sắp xếp (chuỗi bỏ dấu bắt đầu từ mỗi từ của
+      triệu chứng) + bisect, "dau d" khớp "đau đầu", "dau" khớp "đau bụng"
+      và "nhức đầu" khớp từ thứ hai khi gõ "dau".
+    - Sửa lỗi gõ: bảng symmetric-delete trên các tiền tố của khóa, sau đó
+      kiểm tra lại bằng khoảng cách chỉnh sửa có giới hạn.
+    """
+
+    # Độ dài tiền tố tối đa dùng cho bảng sửa lỗi gõ
+    FUZZY_PREFIX_LEN = 8
+
+    def __init__(self, symptoms, max_edits=2):
+        self.symptoms = [s for s in symptoms if s]
+        self.folded = [fold_diacritics(s) for s in self.symptoms]
+        self.max_edits = max_edits
+
+        # Khóa = phần chuỗi bỏ dấu bắt đầu từ mỗi từ: (khóa, id, vị trí từ)
+        keys = []
+        for sid, folded in enumerate(self.folded):
+            words = folded.split(' ')
+            for w in range(len(words)):
+                keys.append((' '.join(words[w:]), sid, w))
+        keys.sort()
+        self._keys = [k[0] for k in keys]
+        self._key_ids = [k[1] for k in keys]
+        self._key_words = [k[2] for k in keys]
+
+        # Biến thể xóa ký tự của tiền tố khóa -> vị trí các khóa trong self._keys
+        self._deletes = {}
+        if max_edits > 0:
+            for pos, key in enumerate(self._keys):
+                for length in range(1, min(len(key), self.FUZZY_PREFIX_LEN) + 1):
+                    for variant in _deletes(key[:length], max_edits):
+                        self._deletes.setdefault(variant, set()).add(pos)
+
+    def allowed_edits(self, query):
+        """Truy vấn càng dài càng cho phép nhiều lỗi gõ"""
+        if len(query) <= 3:
+            return 0
+        if len(query) <= 6:
+            return min(1, self.max_edits)
+        return self.max_edits
+
+    def _prefix_matches(self, query, max_candidates):
+        matches = {}
+        start = bisect.bisect_left(self._keys, query)
+        for pos in range(start, len(self._keys)):
+            if not self._keys[pos].startswith(query) or len(matches) >= max_candidates:
+                break
+            sid = self._key_ids[pos]
+            word = self._key_words[pos]
+            if sid not in matches or word < matches[sid]:
+                matches[sid] = word
+        return matches
+
+    def _fuzzy_matches(self, query, edits, exclude):
+        probe = query[:self.FUZZY_PREFIX_LEN]
+        candidates = set()
+        for variant in _deletes(probe, edits):
+            candidates.update(self._deletes.get(variant, ()))
+
+        matches = {}
+        for pos in candidates:
+            sid = self._key_ids[pos]
+            if sid in exclude:
+                continue
+            distance = prefix_edit_distance(query, self._keys[pos], edits)
+            if distance <= edits and distance < matches.get(sid, edits + 1):
+                matches[sid] = distance
+        return matches
+
+    def search(self, query, limit=10):
+        """Trả về tối đa limit triệu chứng phù hợp nhất với query"""
+        raw = _WHITESPACE.sub(' ', query.lower()).strip()
+        folded = fold_diacritics(query)
+        if not folded or limit <= 0:
+            return []
+
+        # Thứ tự: khớp đầu chuỗi < khớp đầu một từ < sửa lỗi gõ,
+        # cùng mức thì ưu tiên khớp cả dấu, ít lỗi, triệu chứng ngắn
+        ranked = {}
+        for sid, word in self._prefix_matches(folded, max(limit * 20, 200)).items():
+            tier = 0 if word == 0 else 1
+            exact = 0 if raw in self.symptoms[sid] else 1
+            ranked[sid] = (tier, exact, 0, word, len(self.symptoms[sid]), self.symptoms[sid])
+
+        edits = self.allowed_edits(folded)
+        if edits > 0 and len(ranked) < limit:
+            for sid, distance in self._fuzzy_matches(folded, edits, ranked).items():
+                ranked[sid] = (2, 1, distance, 0, len(self.symptoms[sid]), self.symptoms[sid])
+
+        best = sorted(ranked.values())[:limit]
+        return [item[-1] for item in best]
@@ -0,0 +1,90 @@
+"""
+Sinh dataset tổng hợp cùng định dạng data/raw/disease_symptoms.csv để benchmark ở quy mô lớn
+Chạy: python -m benchmarks.datasets --rows 100000 --diseases 10000 --output data/processed/synthetic.csv
+"""
+
+import argparse
+import csv
+from pathlib import Path
+
+import numpy as np
+
+from app.config import Config
+from app.utils.data_processor import DataProcessor
+
+# Ghép vào triệu chứng thật để tạo thêm triệu chứng khi vocabulary cần lớn hơn dataset gốc
+QUALIFIERS = [
+    'nhẹ', 'nặng', 'kéo dài', 'về đêm', 'buổi sáng', 'từng cơn', 'liên tục',
+    'bên trái', 'bên phải', 'hai bên', 'khi vận động', 'sau ăn', 'đột ngột',
+    'tái phát', 'mạn tính', 'cấp tính', 'dữ dội', 'âm ỉ', 'lan rộng', 'thoáng qua'
+]
+
+
+def build_vocabulary(base_symptoms, size):
+    """Danh sách size triệu chứng: triệu chứng gốc trước, sau đó ghép thêm từ bổ nghĩa"""
+    vocabulary = list(base_symptoms[:size])
+    j = 0
+    while len(vocabulary) < size:
+        base = base_symptoms[j % len(base_symptoms)]
+        qualifier = QUALIFIERS[(j // len(base_symptoms)) % len(QUALIFIERS)]
+        group = j // (len(base_symptoms) * len(QUALIFIERS))
+        vocabulary.append(f"{base} {qualifier}" + (f" nhóm {group}" if group else ""))
+        j += 1
+    return vocabulary
+
+
+def generate_dataset(output_path, n_rows, n_diseases, seed=42, base_path=None,
+                     symptoms_per_disease=(6, 10), symptoms_per_row=(3, 8)):
+    """
+    Ghi CSV (benh, trieu_chung) gồm n_rows dòng của n_diseases bệnh.
+
+    Mỗi bệnh có một bộ triệu chứng đặc trưng chọn ngẫu nhiên từ vocabulary,
+    mỗi dòng lấy một tập con của bộ đó, nên bài toán vẫn học được. Cùng seed
+    thì cùng dataset.
+    """
+    rng = np.random.default_rng(seed)
+    base_symptoms = DataProcessor(base_path or Config.DATASET_PATH).get_all_symptoms()
+    vocab_size = max(len(base_symptoms), n_diseases * 2)
+    vocabulary = build_vocabulary(base_symptoms, vocab_size)
+
+    low, high = symptoms_per_disease
+    profiles = [
+        rng.choice(vocab_size, size=min(vocab_size, int(rng.integers(low, high + 1))), replace=False)
+        for _ in range(n_diseases)
+    ]
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['benh', 'trieu_chung'])
+        # Mỗi bệnh xuất hiện ít nhất một lần, các dòng còn lại chọn bệnh ngẫu nhiên
+        diseases = np.concatenate([
+            np.arange(min(n_rows, n_diseases)),
+            rng.integers(0, n_diseases, size=max(0, n_rows - n_diseases))
+        ])
+        for disease in diseases:
+            profile = profiles[disease]
+            k = min(len(profile), int(rng.integers(symptoms_per_row[0], symptoms_per_row[1] + 1)))
+            symptoms = rng.choice(profile, size=k, replace=False)
+            writer.writerow([
+                f"Bệnh tổng hợp {disease}",
+                ";".join(vocabulary[s] for s in symptoms)
+            ])
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sinh dataset tổng hợp cho benchmark')
+    parser.add_argument('--rows', type=int, required=True)
+    parser.add_argument('--diseases', type=int, required=True)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', required=True)
+    args = parser.parse_args()
+
+    path = generate_dataset(args.output, args.rows, args.diseases, seed=args.seed)
+    print(f"Đã ghi {args.rows} dòng, {args.diseases} bệnh vào {path}")
+
+
+if __name__ == '__main__':
+    main()
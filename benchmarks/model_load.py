@@ -0,0 +1,98 @@
+"""
+So sánh thời gian load và bộ nhớ mỗi worker giữa artifact pickle và mmap
+Chạy: python -m benchmarks.model_load --workers 4
+(cần train model trước: python train_model.py)
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+
+def read_memory():
+    """RSS/PSS/private (MB) của process hiện tại từ /proc/self/smaps_rollup (Linux)"""
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) / 1024
+    except FileNotFoundError:
+        import resource
+        return {'rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+    return {
+        'rss_mb': round(fields.get('Rss', 0), 1),
+        'pss_mb': round(fields.get('Pss', 0), 1),
+        'private_mb': round(fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0), 1)
+    }
+
+
+def _worker(artifact_format, barrier, results):
+    os.environ['MODEL_ARTIFACT_FORMAT'] = artifact_format
+    start = time.perf_counter()
+
+    from app.config import Config
+    from app.models import DiseasePredictor
+
+    predictor = DiseasePredictor(Config())
+    predictor.load_model()
+    boot_time = time.perf_counter() - start
+
+    # Dự đoán một lần để chạm vào toàn bộ ma trận trọng số
+    predictor.predict(['sốt', 'ho', 'đau đầu'])
+
+    # Đợi tất cả worker load xong rồi mới đo, để thấy page được dùng chung
+    barrier.wait()
+    results.put(dict(
+        read_memory(),
+        format=predictor.load_stats['format'],
+        load_time=predictor.load_stats['load_time'],
+        boot_time=round(boot_time, 4)
+    ))
+    barrier.wait()
+
+
+def measure(artifact_format, workers):
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(artifact_format, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    summary = {'requested_format': artifact_format, 'workers': workers}
+    for key in rows[0]:
+        if key == 'format':
+            summary[key] = rows[0][key]
+        else:
+            summary[key] = round(sum(r[key] for r in rows) / len(rows), 4)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='So sánh load model pickle và mmap')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--output', help='Ghi kết quả ra file JSON')
+    args = parser.parse_args()
+
+    results = [measure(fmt, args.workers) for fmt in ('pickle', 'mmap')]
+
+    print(f"{'format':<8} {'load_s':>8} {'boot_s':>8} {'rss_mb':>8} {'pss_mb':>8} {'private_mb':>10}")
+    for r in results:
+        print(f"{r['format']:<8} {r['load_time']:>8} {r['boot_time']:>8} "
+              f"{r.get('rss_mb', '-'):>8} {r.get('pss_mb', '-'):>8} {r.get('private_mb', '-'):>10}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+"""
+Phát lại log request dạng JSONL để tái hiện hình dạng lưu lượng thật trước khi rollout
+Chạy: python -m benchmarks.replay traffic.jsonl --concurrency 8 --speed 10
+      python -m benchmarks.replay traffic.jsonl --url http://localhost:5000 --rate 200
+
+Mỗi dòng một request:
+    {"method": "POST", "path": "/api/predict", "body": {"trieu_chung": ["sốt"]}, "timestamp": 1760000000.25}
+"timestamp" (giây epoch hoặc chuỗi ISO 8601) và "headers" là tùy chọn, dòng không có
+"path" bị bỏ qua. Request có timestamp được gửi theo đúng khoảng cách trong log chia
+cho --speed; --rate gửi đều N request/giây; --speed 0 hoặc log không có timestamp thì
+gửi liên tục bằng --concurrency luồng. Mặc định chạy trong process qua test client của
+create_app(), --url để bắn vào server đang chạy.
+
+Tạo log mẫu từ dataset: python -m benchmarks.replay traffic.jsonl --generate 2000
+"""
+
+import argparse
+import http.client
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote, urlsplit
+
+
+def _parse_timestamp(value):
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def load_records(path, limit=None):
+    """Các request hợp lệ trong file và số dòng bị bỏ qua"""
+    records, skipped = [], 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                raw = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            if not isinstance(raw, dict) or not isinstance(raw.get('path'), str):
+                skipped += 1
+                continue
+            records.append({
+                'method': str(raw.get('method') or 'GET').upper(),
+                'path': raw['path'] if raw['path'].startswith('/') else '/' + raw['path'],
+                'body': raw.get('body'),
+                'headers': raw.get('headers') or {},
+                'timestamp': _parse_timestamp(raw.get('timestamp', raw.get('ts')))
+            })
+            if limit and len(records) >= limit:
+                break
+    return records, skipped
+
+
+def schedule(records, rate=None, speed=1.0):
+    """Thời điểm gửi (giây kể từ lúc bắt đầu) của từng request, None = gửi ngay khi có luồng rảnh"""
+    if rate:
+        return [i / rate for i in range(len(records))]
+    timestamps = [r['timestamp'] for r in records]
+    if speed <= 0 or not timestamps or None in timestamps:
+        return None
+    t0 = min(timestamps)
+    return [(t - t0) / speed for t in timestamps]
+
+
+class InProcessTarget:
+    """Gửi request qua test client của create_app(), không cần chạy server"""
+
+    def __init__(self, config_name='production'):
+        from app import create_app
+        self.app = create_app(config_name)
+        self._local = threading.local()
+
+    def send(self, record):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        kwargs = {'json': record['body']} if record['body'] is not None else {}
+        response = client.open(record['path'], method=record['method'], headers=record['headers'], **kwargs)
+        response.get_data()
+        response.close()
+        return response.status_code
+
+
+class HttpTarget:
+    """Gửi request tới server đang chạy, mỗi luồng giữ một kết nối keep-alive"""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = self._local.conn = cls(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def send(self, record):
+        headers = dict(record['headers'])
+        data = None
+        if record['body'] is not None:
+            data = json.dumps(record['body'], ensure_ascii=False).encode('utf-8')
+            headers.setdefault('Content-Type', 'application/json')
+
+        # Query có tiếng Việt (/api/symptoms/search?q=sốt) phải được percent-encode
+        path = quote(self.prefix + record['path'], safe="/?&=%:+,;@")
+
+        # Kết nối keep-alive có thể đã bị server đóng: thử lại một lần với kết nối mới
+        for attempt in (0, 1):
+            conn = self._connection()
+            try:
+                conn.request(record['method'], path, body=data, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, ConnectionError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+
+def replay(records, target, concurrency=4, offsets=None):
+    """
+    Gửi các request với concurrency luồng, trả về (kết quả từng request, thời gian chạy).
+    Mỗi kết quả gồm status (None nếu exception), latency (giây) và lag: request bắt đầu
+    chậm bao lâu so với lịch (tất cả luồng đều bận), để thấy khi nào target không theo kịp.
+    """
+    results = [None] * len(records)
+    pending = queue.Queue(maxsize=concurrency * 2)
+
+    def worker():
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            i, due = item
+            start = time.perf_counter()
+            error = None
+            try:
+                status = target.send(records[i])
+            except Exception as e:
+                status, error = None, f'{type(e).__name__}: {e}'
+            results[i] = {
+                'status': status,
+                'latency': time.perf_counter() - start,
+                'lag': max(0.0, start - due) if due is not None else 0.0,
+                'error': error
+            }
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+
+    started = time.perf_counter()
+    for i in range(len(records)):
+        due = None
+        if offsets is not None:
+            due = started + offsets[i]
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        pending.put((i, due))
+    for _ in threads:
+        pending.put(None)
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - started
+
+
+def summarize(records, results, wall_time):
+    """Percentile độ trễ (ms), tỉ lệ lỗi và throughput, tổng và theo từng endpoint"""
+    import numpy as np
+
+    groups = {'all': list(range(len(records)))}
+    for i, record in enumerate(records):
+        groups.setdefault(f"{record['method']} {record['path'].split('?')[0]}", []).append(i)
+
+    report = {}
+    for name, idx in groups.items():
+        ms = np.array([results[i]['latency'] for i in idx]) * 1000
+        statuses = [results[i]['status'] for i in idx]
+        server_errors = sum(1 for s in statuses if s is None or s >= 500)
+        report[name] = {
+            'requests': len(idx),
+            'p50_ms': round(float(np.percentile(ms, 50)), 3),
+            'p90_ms': round(float(np.percentile(ms, 90)), 3),
+            'p95_ms': round(float(np.percentile(ms, 95)), 3),
+            'p99_ms': round(float(np.percentile(ms, 99)), 3),
+            'max_ms': round(float(ms.max()), 3),
+            'error_rate': round(server_errors / len(idx), 4),
+            'client_error_rate': round(sum(1 for s in statuses if s is not None and 400 <= s < 500) / len(idx), 4),
+            'requests_per_sec': round(len(idx) / wall_time, 1) if wall_time > 0 else None
+        }
+
+    lag_ms = np.array([r['lag'] for r in results]) * 1000
+    report['all']['lag_p99_ms'] = round(float(np.percentile(lag_ms, 99)), 3)
+    report['all']['lag_max_ms'] = round(float(lag_ms.max()), 3)
+    return report
+
+
+def generate(path, n, rate, seed):
+    """Log mẫu: chủ yếu /api/predict, xen batch và tra cứu triệu chứng, thời điểm đến theo phân phối Poisson"""
+    import numpy as np
+    from app.config import Config
+    from benchmarks.run_benchmarks import _prediction_bodies
+
+    rng = np.random.default_rng(seed)
+    bodies = _prediction_bodies(Config.DATASET_PATH, n, seed)
+    t = time.time()
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(n):
+            t += float(rng.exponential(1 / rate))
+            kind = rng.random()
+            symptoms = bodies[i]['trieu_chung']
+            if kind < 0.8:
+                record = {'method': 'POST', 'path': '/api/predict', 'body': bodies[i]}
+            elif kind < 0.9:
+                size = int(rng.integers(2, 21))
+                picks = rng.integers(0, n, size=size)
+                record = {'method': 'POST', 'path': '/api/predict/batch',
+                          'body': {'danh_sach': [{'trieu_chung': bodies[j]['trieu_chung']} for j in picks]}}
+            elif kind < 0.97:
+                record = {'method': 'GET', 'path': f'/api/symptoms/search?q={symptoms[0][:3]}'}
+            else:
+                record = {'method': 'GET', 'path': '/api/symptoms'}
+            record['timestamp'] = round(t, 3)
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def print_report(report):
+    print(f"{'endpoint':<32} {'req':>6} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'max_ms':>9} {'err%':>6} {'req/s':>8}")
+    for name, r in report.items():
+        print(f"{name[:32]:<32} {r['requests']:>6} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} "
+              f"{r['max_ms']:>9} {100 * r['error_rate']:>6.2f} {r['requests_per_sec']:>8}")
+    total = report['all']
+    print(f"\nTrễ so với lịch: p99 {total['lag_p99_ms']} ms, max {total['lag_max_ms']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Phát lại log request JSONL và đo độ trễ, lỗi, throughput')
+    parser.add_argument('log', help='File JSONL các request')
+    parser.add_argument('--url', help='Gửi tới server này (ví dụ http://localhost:5000) thay vì test client')
+    parser.add_argument('--config', default='production', help='Cấu hình create_app() khi chạy trong process')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, help='Gửi đều N request/giây, bỏ qua timestamp trong log')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Nén thời gian theo timestamp (10 = nhanh gấp 10 lần, 0 = gửi liên tục)')
+    parser.add_argument('--limit', type=int, help='Chỉ phát lại N request đầu')
+    parser.add_argument('--repeat', type=int, default=1, help='Phát lại cả log nhiều lần liên tiếp')
+    parser.add_argument('--output', help='Ghi kết quả ra file JSON')
+    parser.add_argument('--generate', type=int, metavar='N', help='Tạo log mẫu N request từ dataset rồi thoát')
+    parser.add_argument('--generate-rate', type=float, default=50.0, help='Số request/giây trung bình của log mẫu')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.generate:
+        generate(args.log, args.generate, args.generate_rate, args.seed)
+        print(f"Đã ghi {args.generate} request vào {args.log}")
+        return
+
+    records, skipped = load_records(args.log, args.limit)
+    if skipped:
+        print(f"Bỏ qua {skipped} dòng không phải request (thiếu \"path\" hoặc không phải JSON)")
+    if not records:
+        parser.error(f'{args.log} không có request nào để phát lại')
+
+    offsets = schedule(records, args.rate, args.speed)
+    if offsets is not None:
+        # Log gộp từ nhiều worker có thể không theo thứ tự thời gian
+        order = sorted(range(len(records)), key=offsets.__getitem__)
+        records = [records[i] for i in order]
+        offsets = [offsets[i] for i in order]
+    if args.repeat > 1:
+        if offsets is not None:
+            # Lần lặp sau bắt đầu sau request cuối một khoảng bằng khoảng cách trung bình
+            gap = offsets[-1] / (len(offsets) - 1) if len(offsets) > 1 else 0.0
+            offsets = [o + k * (offsets[-1] + gap) for k in range(args.repeat) for o in offsets]
+        records = records * args.repeat
+
+    target = HttpTarget(args.url) if args.url else InProcessTarget(args.config)
+    mode = 'liên tục' if offsets is None else f'theo lịch, {offsets[-1]:.1f}s'
+    print(f"Phát lại {len(records)} request ({mode}, {args.concurrency} luồng) tới {args.url or 'test client'}...")
+
+    results, wall_time = replay(records, target, args.concurrency, offsets)
+    report = summarize(records, results, wall_time)
+    print_report(report)
+
+    errors = [r['error'] for r in results if r['error']]
+    if errors:
+        print(f"Ví dụ exception: {errors[0]}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'log': str(args.log),
+                'target': args.url or 'test_client',
+                'settings': {'concurrency': args.concurrency, 'rate': args.rate, 'speed': args.speed,
+                             'repeat': args.repeat},
+                'wall_time_s': round(wall_time, 3),
+                'endpoints': report
+            }, f, ensure_ascii=False, indent=2)
+        print(f"Đã ghi kết quả: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
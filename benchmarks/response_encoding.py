@@ -0,0 +1,110 @@
+"""
+So sánh thời gian serialize response /api/predict: dict + jsonify so với ghép đoạn JSON tính sẵn
+Chạy: python -m benchmarks.response_encoding --responses 2000
+
+Dùng model trong MODEL_DIR và các bộ triệu chứng lấy từ dataset. Kiểm tra encoder
+'json' cho ra đúng từng byte như jsonify, 'orjson' (nếu đã cài) cho ra cùng dữ liệu JSON.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+
+def _time_per_response(encode, cases, repeat):
+    """Thời gian trung vị (µs) để serialize một response"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for predictions, unknown in cases:
+            encode(predictions, unknown)
+        samples.append((time.perf_counter() - start) / len(cases) * 1e6)
+    return round(statistics.median(samples), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Đo thời gian serialize response dự đoán')
+    parser.add_argument('--responses', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Ghi kết quả ra file JSON')
+    args = parser.parse_args()
+
+    from flask import jsonify
+    from app import create_app
+    from app.config import Config
+    from app.routes import prediction
+    from app.utils.response_encoding import PredictionResponseEncoder
+    from benchmarks.run_benchmarks import _prediction_bodies
+
+    app = create_app('production')
+    current = prediction.init_predictor()
+    if current is None or not current.is_loaded:
+        sys.exit('Chưa có model, hãy chạy train_model.py trước')
+
+    symptoms = [b['trieu_chung'] for b in _prediction_bodies(Config.DATASET_PATH, args.responses, args.seed)]
+    # Thêm triệu chứng lạ để có cả trường "trieu_chung_khong_nhan_dien"
+    symptoms = [s + ['triệu chứng lạ'] if i % 4 == 0 else s for i, s in enumerate(symptoms)]
+    cases = list(zip(current.predict_batch(symptoms), (current.unrecognized_symptoms(s) for s in symptoms)))
+
+    encoders = {'json': prediction._get_response_encoder(current)}
+    try:
+        import orjson  # noqa: F401
+        encoders['orjson'] = PredictionResponseEncoder(current.labels, 'orjson')
+    except ImportError:
+        print("orjson chưa được cài, bỏ qua")
+
+    with app.test_request_context():
+        def baseline(predictions, unknown):
+            return jsonify(prediction._build_prediction_response(predictions, unknown)).get_data()
+
+        def baseline_body(predictions, unknown):
+            return app.json.dumps(prediction._build_prediction_response(predictions, unknown), separators=(',', ':'))
+
+        def fragments_body(encoder):
+            def encode(predictions, unknown):
+                if predictions:
+                    return encoder.encode_prediction(predictions, unknown)
+                return encoder.dumps(prediction._build_prediction_response(predictions, unknown))
+            return encode
+
+        def fragments(encoder):
+            encode_body = fragments_body(encoder)
+
+            def encode(predictions, unknown):
+                return prediction._json_response(encode_body(predictions, unknown)).get_data()
+            return encode
+
+        # Kiểm tra kết quả trước khi đo
+        for predictions, unknown in cases:
+            expected = baseline(predictions, unknown)
+            if fragments(encoders['json'])(predictions, unknown) != expected:
+                sys.exit(f'Encoder json khác jsonify: {predictions}')
+            if 'orjson' in encoders and json.loads(fragments(encoders['orjson'])(predictions, unknown)) != json.loads(expected):
+                sys.exit(f'Encoder orjson khác dữ liệu của jsonify: {predictions}')
+
+        # body: chỉ serialize; response: cả tạo Response như trong route
+        results = {
+            'responses': len(cases),
+            'body_us': {'jsonify': _time_per_response(baseline_body, cases, args.repeat)},
+            'response_us': {'jsonify': _time_per_response(baseline, cases, args.repeat)}
+        }
+        for name, encoder in encoders.items():
+            results['body_us'][f'fragments_{name}'] = _time_per_response(fragments_body(encoder), cases, args.repeat)
+            results['response_us'][f'fragments_{name}'] = _time_per_response(fragments(encoder), cases, args.repeat)
+
+    print(f"{'cách serialize':<20} {'body µs':>9} {'nhanh hơn':>10} {'response µs':>12} {'nhanh hơn':>10}")
+    body, response = results['body_us'], results['response_us']
+    for name in body:
+        print(f"{name:<20} {body[name]:>9} {body['jsonify'] / body[name]:>9.2f}x "
+              f"{response[name]:>12} {response['jsonify'] / response[name]:>9.2f}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
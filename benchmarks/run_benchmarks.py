@@ -0,0 +1,314 @@
+"""
+Benchmark độ trễ, throughput của API và thời gian train ở nhiều quy mô dataset
+Chạy: python -m benchmarks.run_benchmarks --scales current,10000x1000 --requests 500
+
+Mỗi quy mô chạy trong một process riêng (MODEL_DIR, DATASET_PATH trỏ vào thư mục
+tạm): train DiseasePredictor, lưu model, rồi gửi request qua test client của
+create_app(). Kết quả ghi ra JSON, dùng --compare để so với một lần chạy trước.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = BASE_DIR / 'benchmarks' / 'results'
+ENDPOINTS = ('predict', 'symptoms', 'diseases')
+
+
+class PeakMemorySampler:
+    """Lấy mẫu RSS của process ở nền để ghi nhận đỉnh bộ nhớ (MB) trong một đoạn code"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def rss_mb():
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+        except (FileNotFoundError, ValueError, OSError):
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.rss_mb())
+
+    def __enter__(self):
+        self.baseline = self.rss_mb()
+        self.peak = self.baseline
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.rss_mb())
+
+
+def summarize(durations, wall_time):
+    """p50/p95/p99 (ms) và số request mỗi giây"""
+    import numpy as np
+    ms = np.asarray(durations) * 1000
+    return {
+        'requests': len(durations),
+        'p50_ms': round(float(np.percentile(ms, 50)), 4),
+        'p95_ms': round(float(np.percentile(ms, 95)), 4),
+        'p99_ms': round(float(np.percentile(ms, 99)), 4),
+        'mean_ms': round(float(ms.mean()), 4),
+        'requests_per_sec': round(len(durations) / wall_time, 1) if wall_time > 0 else None
+    }
+
+
+def _measure(send, n_requests, n_warmup):
+    for i in range(n_warmup):
+        send(i)
+
+    durations = []
+    start = time.perf_counter()
+    for i in range(n_requests):
+        t = time.perf_counter()
+        response = send(i)
+        durations.append(time.perf_counter() - t)
+        if response.status_code != 200:
+            raise RuntimeError(f"Request lỗi {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return summarize(durations, time.perf_counter() - start)
+
+
+def _prediction_bodies(dataset_path, n, seed):
+    """Các bộ triệu chứng lấy từ dataset (tập con của một dòng ngẫu nhiên)"""
+    import csv
+    import numpy as np
+
+    with open(dataset_path, encoding='utf-8', newline='') as f:
+        rows = [row['trieu_chung'].split(';') for row in csv.DictReader(f)]
+
+    rng = np.random.default_rng(seed)
+    bodies = []
+    for r in rng.integers(0, len(rows), size=n):
+        symptoms = rows[r]
+        k = int(rng.integers(1, len(symptoms) + 1))
+        bodies.append({'trieu_chung': rng.choice(symptoms, size=k, replace=False).tolist()})
+    return bodies
+
+
+def run_scale(n_requests, n_warmup, seed):
+    """Chạy trong process con: train, lưu, rồi đo các endpoint"""
+    from app.config import Config
+    from app.models import DiseasePredictor
+
+    result = {}
+    predictor = DiseasePredictor(Config())
+
+    # Bỏ output của train() (classification_report rất dài ở quy mô lớn)
+    with PeakMemorySampler() as memory, redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        metrics = predictor.train()
+        train_time = time.perf_counter() - start
+    result['train'] = {
+        'train_time_s': round(train_time, 4),
+        'peak_rss_mb': round(memory.peak, 1),
+        'peak_rss_delta_mb': round(memory.peak - memory.baseline, 1),
+        'metrics': metrics,
+        'mode': predictor.metadata.get('mode'),
+        'n_classes': len(predictor.labels),
+        'n_features': predictor.get_model_info()['n_features']
+    }
+
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        predictor.save_model()
+    result['train']['save_time_s'] = round(time.perf_counter() - start, 4)
+    del predictor
+
+    from app import create_app
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        app = create_app('production')
+        result['create_app_s'] = round(time.perf_counter() - start, 4)
+    client = app.test_client()
+
+    bodies = _prediction_bodies(Config.DATASET_PATH, n_requests + n_warmup, seed)
+    senders = {
+        'predict': lambda i: client.post('/api/predict', json=bodies[i % len(bodies)]),
+        'symptoms': lambda i: client.get('/api/symptoms'),
+        'diseases': lambda i: client.get('/api/diseases')
+    }
+    result['endpoints'] = {
+        name: _measure(senders[name], n_requests, n_warmup) for name in ENDPOINTS
+    }
+    return result
+
+
+def parse_scale(spec):
+    """'current' = dataset gốc, 'ROWSxDISEASES' = dataset tổng hợp"""
+    if spec == 'current':
+        return {'name': spec, 'rows': None, 'diseases': None}
+    try:
+        rows, diseases = (int(v) for v in spec.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Quy mô không hợp lệ: {spec} (dùng 'current' hoặc ROWSxDISEASES)")
+    return {'name': spec, 'rows': rows, 'diseases': diseases}
+
+
+def benchmark_scale(scale, args, work_dir):
+    from app.config import Config
+    from benchmarks.datasets import generate_dataset
+
+    scale_dir = work_dir / scale['name']
+    if scale['rows'] is None:
+        dataset_path = Config.DATASET_PATH
+    else:
+        start = time.perf_counter()
+        dataset_path = generate_dataset(
+            scale_dir / 'dataset.csv', scale['rows'], scale['diseases'], seed=args.seed
+        )
+        print(f"  Sinh dataset: {time.perf_counter() - start:.2f}s")
+
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(BASE_DIR),
+        DATASET_PATH=str(dataset_path),
+        MODEL_DIR=str(scale_dir / 'models'),
+        PROCESSED_DATA_DIR=str(scale_dir / 'processed'),
+        PREDICTION_LOG_DIR=str(scale_dir / 'prediction_logs'),
+        # Train đầy đủ đọc cả log feedback: không lẫn ca thật vào dataset tổng hợp
+        FEEDBACK_LOG_PATH=str(scale_dir / 'feedback.jsonl'),
+        MODEL_RELOAD_INTERVAL='0',
+        MODEL_ARTIFACT_FORMAT=args.artifact_format,
+        TRAINING_MODE=args.training_mode,
+        PREDICTION_CACHE_SIZE=os.environ.get('PREDICTION_CACHE_SIZE', '10000') if args.prediction_cache else '0'
+    )
+    out = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.run_benchmarks', '--worker',
+         '--requests', str(args.requests), '--warmup', str(args.warmup), '--seed', str(args.seed)],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True
+    )
+    if out.returncode != 0:
+        raise RuntimeError(f"Benchmark quy mô {scale['name']} lỗi:\n{out.stderr[-2000:]}")
+
+    with open(dataset_path, encoding='utf-8', newline='') as f:
+        diseases = [row['benh'] for row in csv.DictReader(f)]
+    result = dict(scale, rows=len(diseases), **json.loads(out.stdout.strip().splitlines()[-1]))
+    # Model phải có đúng một lớp cho mỗi bệnh, nếu không số đo không phản ánh quy mô đang đo
+    if result['train']['n_classes'] != len(set(diseases)):
+        raise RuntimeError(
+            f"Benchmark quy mô {scale['name']}: model có {result['train']['n_classes']} lớp "
+            f"nhưng dataset có {len(set(diseases))} bệnh"
+        )
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, previous=None):
+    baseline = {}
+    if previous:
+        for s in previous.get('scales', []):
+            baseline[s['name']] = s
+
+    for s in report['scales']:
+        train = s['train']
+        print(f"\n[{s['name']}] {s['rows']} dòng, {train['n_classes']} lớp, {train['n_features']} feature")
+        print(f"  train: {train['train_time_s']}s, peak RSS {train['peak_rss_mb']} MB "
+              f"(+{train['peak_rss_delta_mb']} MB), f1 {train['metrics']['f1']:.4f}")
+        print(f"  {'endpoint':<10} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'req/s':>9}")
+        for name in ENDPOINTS:
+            e = s['endpoints'][name]
+            line = f"  {name:<10} {e['p50_ms']:>9} {e['p95_ms']:>9} {e['p99_ms']:>9} {e['requests_per_sec']:>9}"
+            old = baseline.get(s['name'], {}).get('endpoints', {}).get(name)
+            if old and old['p50_ms']:
+                line += f"   p50 {100 * (e['p50_ms'] / old['p50_ms'] - 1):+.1f}%"
+            print(line)
+        old = baseline.get(s['name'], {}).get('train')
+        if old and old['train_time_s']:
+            print(f"  train time so với lần trước: {100 * (train['train_time_s'] / old['train_time_s'] - 1):+.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark API dự đoán và thời gian train')
+    parser.add_argument('--scales', default='current,1000x200,10000x1000',
+                        help="Danh sách quy mô, ví dụ current,100000x10000,1000000x100000")
+    parser.add_argument('--requests', type=int, default=500, help='Số request đo cho mỗi endpoint')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--artifact-format', choices=('pickle', 'mmap'), default='pickle')
+    parser.add_argument('--training-mode', choices=('batch', 'streaming', 'search'), default='batch')
+    parser.add_argument('--prediction-cache', action='store_true',
+                        help='Bật cache dự đoán (mặc định tắt để đo đường tính toán của model)')
+    parser.add_argument('--output', help='File JSON kết quả (mặc định benchmarks/results/<thời gian>.json)')
+    parser.add_argument('--compare', help='File JSON của một lần chạy trước để so sánh')
+    parser.add_argument('--work-dir', help='Thư mục chứa dataset/model tạm (mặc định thư mục tạm, xóa sau khi chạy)')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_scale(args.requests, args.warmup, args.seed)))
+        return
+
+    scales = [parse_scale(s.strip()) for s in args.scales.split(',') if s.strip()]
+    work_dir = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix='disease-bench-'))
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'seed': args.seed,
+            'artifact_format': args.artifact_format,
+            'training_mode': args.training_mode,
+            'prediction_cache': args.prediction_cache
+        },
+        'scales': []
+    }
+    try:
+        for scale in scales:
+            print(f"Đang chạy quy mô {scale['name']}...")
+            report['scales'].append(benchmark_scale(scale, args, work_dir))
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+    print_report(report, previous)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nĐã ghi kết quả: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Đo thời gian khởi động lạnh của server (import + create_app + request dự đoán đầu tiên)
+Chạy: python -m benchmarks.startup --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Chạy trong process mới để đo đúng thời gian import từ đầu
+_PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app('production')
+created = time.perf_counter()
+app.test_client().post('/api/predict', json={'trieu_chung': ['sốt', 'ho', 'đau đầu']})
+first = time.perf_counter()
+heavy = ('sklearn', 'pandas', 'joblib', 'scipy.special')
+print(json.dumps({
+    'import_app': imported - start,
+    'create_app': created - start,
+    'first_predict': first - start,
+    'modules': len(sys.modules),
+    'heavy_modules': [m for m in heavy if m in sys.modules]
+}))
+"""
+
+
+def measure(artifact_format, runs, app_dir):
+    # Request đo không phải dự đoán thật, không ghi vào log audit
+    env = dict(os.environ, MODEL_ARTIFACT_FORMAT=artifact_format, PYTHONPATH=str(app_dir), PREDICTION_LOG='false')
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, '-c', _PROBE], cwd=app_dir, env=env,
+            capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+
+    result = {'format': artifact_format, 'runs': runs}
+    for key in ('import_app', 'create_app', 'first_predict'):
+        result[key] = round(statistics.median(s[key] for s in samples), 4)
+    result['modules'] = samples[-1]['modules']
+    result['heavy_modules'] = samples[-1]['heavy_modules']
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Đo thời gian khởi động lạnh của server')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--app-dir', default=str(BASE_DIR), help='Thư mục code cần đo (để so sánh hai phiên bản code)')
+    parser.add_argument('--output', help='Ghi kết quả ra file JSON')
+    args = parser.parse_args()
+
+    results = [measure(fmt, args.runs, args.app_dir) for fmt in ('pickle', 'mmap')]
+
+    print(f"{'format':<8} {'create_app_s':>12} {'first_predict_s':>15} {'modules':>8}  heavy")
+    for r in results:
+        print(f"{r['format']:<8} {r['create_app']:>12} {r['first_predict']:>15} {r['modules']:>8}  "
+              f"{','.join(r['heavy_modules']) or '-'}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Cấu hình gunicorn cho production
+Chạy: gunicorn -c gunicorn.conf.py wsgi:app  (hoặc python run_production.py)
+
+Các biến môi trường:
+    PORT / GUNICORN_BIND   : địa chỉ lắng nghe (mặc định 0.0.0.0:5000)
+    WEB_CONCURRENCY        : số worker process (mặc định 2 x CPU + 1)
+    GUNICORN_THREADS       : số thread mỗi worker (mặc định 4)
+    GUNICORN_TIMEOUT       : timeout mỗi request, giây (mặc định 30)
+    WARMUP_REQUESTS        : số request dự đoán chạy thử trước khi worker nhận traffic (mặc định 20)
+    MODEL_ARTIFACT_FORMAT  : mặc định 'mmap' (không import sklearn/pandas khi phục vụ)
+    METRICS_DIR            : thư mục snapshot metrics của các worker (mặc định thư mục tạm theo cổng)
+"""
+
+import multiprocessing
+import os
+import tempfile
+from pathlib import Path
+
+port = os.environ.get('PORT', '5000')
+
+# Phải đặt trước khi preload app (Config đọc biến môi trường lúc import)
+os.environ.setdefault('MODEL_ARTIFACT_FORMAT', 'mmap')
+# /metrics cộng số liệu của tất cả worker qua thư mục này
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f'disease-api-metrics-{port}'))
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{port}")
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Load app (và model) một lần trong master trước khi fork, các worker dùng chung page copy-on-write
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+warmup_requests = int(os.environ.get('WARMUP_REQUESTS', 20))
+
+
+def on_starting(server):
+    """Xóa snapshot metrics của lần chạy trước, counter bắt đầu lại từ 0"""
+    metrics_dir = Path(os.environ['METRICS_DIR'])
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    for path in metrics_dir.glob('*.json'):
+        path.unlink(missing_ok=True)
+
+
+def when_ready(server):
+    server.log.info("Model đã load trong master, bắt đầu fork %s worker x %s thread", workers, threads)
+
+
+def post_fork(server, worker):
+    """Warmup trong worker vừa fork, trước khi worker nhận request đầu tiên"""
+    from wsgi import app
+    from app.routes.prediction import warmup
+
+    elapsed = warmup(app, warmup_requests)
+    worker.log.info("Worker %s warmup %s request trong %.3fs", worker.pid, warmup_requests, elapsed)
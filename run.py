@@ -1,6 +1,7 @@
 """
-File chạy Flask API server
+File chạy Flask API server (development)
 Chạy: python run.py
+Production: python run_production.py (gunicorn, xem gunicorn.conf.py)
 """
 
 import os
@@ -23,10 +24,15 @@ if __name__ == '__main__':
     print("  - GET  /              : API info")
     print("  - GET  /health        : Health check")
     print("  - POST /api/predict   : Dự đoán bệnh")
+    print("  - POST /api/predict/batch: Dự đoán nhiều bộ triệu chứng")
     print("  - GET  /api/symptoms  : Danh sách triệu chứng")
+    print("  - GET  /api/symptoms/search?q=: Gợi ý triệu chứng")
     print("  - GET  /api/diseases  : Danh sách bệnh")
     print("  - POST /api/train     : Train model (admin)")
+    print("  - POST /api/feedback  : Ghi nhận ca bệnh đã xác nhận (admin)")
     print("  - GET  /api/model-info: Thông tin model")
+    print("  - GET  /api/cache/stats: Thống kê cache dự đoán")
+    print("  - GET  /metrics       : Metrics Prometheus")
     print("="*60)
     print("\nĐang khởi động server...\n")
     
@@ -0,0 +1,30 @@
+"""
+Chạy Flask API server bằng gunicorn (production)
+Chạy: python run_production.py
+Cấu hình qua biến môi trường, xem gunicorn.conf.py
+"""
+
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def main():
+    try:
+        from gunicorn.app.wsgiapp import run
+    except ImportError:
+        print("Không tìm thấy gunicorn (không hỗ trợ Windows). Dùng: python run.py")
+        sys.exit(1)
+
+    sys.argv = [
+        'gunicorn',
+        '--config', str(BASE_DIR / 'gunicorn.conf.py'),
+        '--chdir', str(BASE_DIR),
+        'wsgi:app'
+    ] + sys.argv[1:]
+    run()
+
+
+if __name__ == '__main__':
+    main()
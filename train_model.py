@@ -1,12 +1,23 @@
 """
 Script để train model Disease Prediction
-Chạy: python train_model.py
+Chạy: python train_model.py [--mode batch|streaming|search|incremental]
+     python train_model.py --import-bundle model.bundle
 """
 
+import argparse
+
 from app.config import Config
 from app.models import DiseasePredictor
 
 def main():
+    parser = argparse.ArgumentParser(description='Train model dự đoán bệnh')
+    parser.add_argument('--mode', choices=('batch', 'streaming', 'search', 'incremental'),
+                        help='batch: toàn bộ dataset trong bộ nhớ; streaming: đọc CSV theo chunk; search: grid search + cross-validation; '
+                             'incremental: cập nhật model hiện tại bằng các ca feedback mới (mặc định TRAINING_MODE)')
+    parser.add_argument('--import-bundle', metavar='FILE',
+                        help='Không train, nhận file model.bundle (vd. copy từ máy khác) thành phiên bản model mới')
+    args = parser.parse_args()
+
     print("="*60)
     print("DISEASE PREDICTION MODEL TRAINING")
     print("="*60)
@@ -17,22 +28,41 @@ def main():
     
     # Khởi tạo predictor
     predictor = DiseasePredictor(config)
+
+    if args.import_bundle:
+        version = predictor.import_bundle(args.import_bundle)
+        print(f"\nModel đã được lưu tại: {predictor.model_path} (phiên bản {version})")
+        return
     
     # Train model
     print("\nBắt đầu quá trình training...\n")
-    metrics = predictor.train()
+    metrics = predictor.train(args.mode)
     
     # Lưu model
     print("\nĐang lưu model...")
-    predictor.save_model()
+    version = predictor.save_model()
     
     print("\n" + "="*60)
     print("TRAINING HOÀN TẤT!")
     print("="*60)
     print(f"Accuracy: {metrics['accuracy']:.4f}")
     print(f"F1-Score: {metrics['f1']:.4f}")
+    if 'n_cases' in metrics:
+        print(f"(trên {metrics['n_cases']} ca feedback mới, trước khi cập nhật: "
+              f"accuracy {metrics['accuracy_before']:.4f}, F1 {metrics['f1_before']:.4f})")
+
+    compaction = metrics.get('compaction')
+    if compaction and 'features_after' in compaction:
+        print(f"Compaction: {compaction['features_before']} -> {compaction['features_after']} feature, "
+              f"{'đã dùng model thu gọn' if compaction['promoted'] else 'giữ model gốc'}")
+
+    if 'candidates' in metrics:
+        print(f"\n{'rank':>4} {'cv_f1':>7} {'std':>7} {'fit_s':>8}  tham số")
+        for row in metrics['candidates']:
+            print(f"{row['rank']:>4} {row['mean_score']:>7} {row['std_score']:>7} "
+                  f"{row['mean_fit_time']:>8}  {row['params']}")
 
-    print(f"\nModel đã được lưu tại: {config.MODEL_PATH}")
+    print(f"\nModel đã được lưu tại: {predictor.model_path} (phiên bản {version})")
     print("\nBạn có thể chạy API server bằng lệnh: python run.py")
     print("="*60)
 
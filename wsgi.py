@@ -0,0 +1,9 @@
+"""
+WSGI entry point cho production
+Chạy: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import os
+from app import create_app
+
+app = create_app(os.getenv('FLASK_ENV', 'production'))